@@ -5,6 +5,7 @@ Webserver Python con console, log, file manager e gestione multipli server
 """
 
 import os
+import sys
 import json
 import subprocess
 import threading
@@ -17,13 +18,20 @@ import shutil
 import urllib.parse
 import base64
 import tempfile
+import copy
+import hashlib
+import stat
+import random
 from datetime import datetime, timedelta, timezone
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, abort, session
+from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, abort, session, g
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import logging
 import re
 import html
+import fnmatch
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 app = Flask(__name__)
 app.secret_key = 'mineboard_secret_key_2024'
@@ -83,6 +91,313 @@ UPDATE_PAGE_URL = os.environ.get('MINEBOARD_UPDATE_PAGE', 'https://github.com/Sc
 for directory in [SERVER_DIR, LOG_DIR, UPLOAD_FOLDER, BACKUP_DIR, VERSIONS_DIR]:
     os.makedirs(directory, exist_ok=True)
 
+# ===================== METRICS REGISTRY =====================
+# Esportazione Prometheus: il token di scrape è separato dalla sessione web.
+# Se non configurato l'endpoint /metrics resta disabilitato.
+METRICS_TOKEN = os.environ.get('MINEBOARD_METRICS_TOKEN', '').strip()
+METRICS_SAMPLE_INTERVAL = float(os.environ.get('MINEBOARD_METRICS_INTERVAL', '10'))
+METRICS_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_BACKUP_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+# nome -> (tipo, descrizione)
+METRICS_HELP = {
+    'mineboard_server_up': ('gauge', 'Whether the server process is running (1) or not (0).'),
+    'mineboard_server_uptime_seconds': ('gauge', 'Seconds since the server process was started.'),
+    'mineboard_server_players_online': ('gauge', 'Players currently online according to the server log.'),
+    'mineboard_server_cpu_percent': ('gauge', 'CPU usage of the server process tree (100 = one core).'),
+    'mineboard_server_rss_bytes': ('gauge', 'Resident memory of the server process tree.'),
+    'mineboard_server_processes': ('gauge', 'Number of processes in the server process tree.'),
+    'mineboard_server_starts_total': ('counter', 'Server starts (including restarts) since MineBoard started.'),
+    'mineboard_server_crashes_total': ('counter', 'Unexpected server exits since MineBoard started.'),
+    'mineboard_backup_duration_seconds': ('histogram', 'Time spent creating backups.'),
+    'mineboard_backup_last_size_bytes': ('gauge', 'Size of the most recent backup archive.'),
+    'mineboard_download_bytes_total': ('counter', 'Bytes downloaded from upstream sources.'),
+    'mineboard_webhook_sent_total': ('counter', 'Webhooks delivered successfully.'),
+    'mineboard_webhook_failures_total': ('counter', 'Webhooks that failed to be delivered.'),
+    'mineboard_http_requests_total': ('counter', 'HTTP requests handled by MineBoard.'),
+    'mineboard_http_request_duration_seconds': ('histogram', 'Latency of HTTP requests handled by MineBoard.'),
+    'mineboard_http_response_size_bytes': ('histogram', 'Size of HTTP response bodies.'),
+    'mineboard_http_requests_in_flight': ('gauge', 'HTTP requests currently being handled.'),
+    'mineboard_http_slow_requests_total': ('counter', 'HTTP requests slower than MINEBOARD_SLOW_REQUEST_MS.'),
+    'mineboard_jvm_gc_pause_seconds': ('summary', 'JVM GC pause times over the recent window, from the GC log.'),
+    'mineboard_jvm_gc_collections_total': ('counter', 'GC cycles parsed from the GC log.'),
+    'mineboard_jvm_gc_allocation_rate_bytes_per_second': ('gauge', 'Allocation rate estimated between GC cycles.'),
+    'mineboard_jvm_gc_per_minute': ('gauge', 'GC cycles per minute over the recent window.'),
+    'mineboard_jvm_heap_after_gc_bytes': ('gauge', 'Heap occupancy after the last GC cycle.'),
+    'mineboard_metrics_sample_duration_seconds': ('gauge', 'Time spent collecting the last metrics sample.'),
+    'mineboard_metrics_last_sample_timestamp_seconds': ('gauge', 'Unix time of the last metrics sample.'),
+}
+
+metrics_lock = threading.Lock()
+metrics_counters = {}    # (nome, labels) -> valore
+metrics_gauges = {}      # (nome, labels) -> valore
+metrics_histograms = {}  # (nome, labels) -> {'bounds', 'buckets', 'sum', 'count'}
+
+def _metric_key(name, labels):
+    return name, tuple(sorted((labels or {}).items()))
+
+def metrics_inc(name, labels=None, value=1):
+    key = _metric_key(name, labels)
+    with metrics_lock:
+        metrics_counters[key] = metrics_counters.get(key, 0) + value
+
+def metrics_set(name, value, labels=None):
+    key = _metric_key(name, labels)
+    with metrics_lock:
+        metrics_gauges[key] = value
+
+def metrics_observe(name, value, labels=None, buckets=METRICS_DURATION_BUCKETS):
+    key = _metric_key(name, labels)
+    with metrics_lock:
+        h = metrics_histograms.get(key)
+        if h is None:
+            h = {'bounds': buckets, 'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            metrics_histograms[key] = h
+        for i, bound in enumerate(h['bounds']):
+            if value <= bound:
+                h['buckets'][i] += 1
+                break
+        h['sum'] += value
+        h['count'] += 1
+
+# ===================== REQUEST INSTRUMENTATION =====================
+SLOW_REQUEST_THRESHOLD = float(os.environ.get('MINEBOARD_SLOW_REQUEST_MS', '1000')) / 1000.0
+METRICS_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+_SENSITIVE_PARAMS = ('token', 'password', 'secret', 'file_data')
+
+class RequestMetricsMiddleware:
+    """Middleware WSGI attorno a Flask: latenza per route, richieste in corso,
+    dimensione risposte, status code e log delle richieste lente.
+
+    La latenza misura il tempo di gestione fino all'inizio della risposta; per
+    le risposte in streaming la dimensione viene contata alla chiusura.
+    """
+
+    def __init__(self, wsgi_app, slow_threshold=SLOW_REQUEST_THRESHOLD, slow_log_size=100):
+        self.wsgi_app = wsgi_app
+        self.slow_threshold = slow_threshold
+        self.slow_requests = deque(maxlen=slow_log_size)
+        self.in_flight = 0
+        self.in_flight_peak = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.in_flight_peak = max(self.in_flight_peak, self.in_flight)
+            current = self.in_flight
+        metrics_set('mineboard_http_requests_in_flight', current)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+            current = self.in_flight
+        metrics_set('mineboard_http_requests_in_flight', current)
+
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        captured = {'status': '500', 'size': None}
+
+        def _start_response(status, headers, exc_info=None):
+            captured['status'] = status.split(' ', 1)[0]
+            for k, v in headers:
+                if k.lower() == 'content-length':
+                    try:
+                        captured['size'] = int(v)
+                    except ValueError:
+                        pass
+            return start_response(status, headers, exc_info)
+
+        self._enter()
+        try:
+            result = self.wsgi_app(environ, _start_response)
+        except Exception:
+            self._record(environ, captured, time.perf_counter() - started)
+            raise
+        finally:
+            self._leave()
+        elapsed = time.perf_counter() - started
+        if captured['size'] is not None:
+            self._record(environ, captured, elapsed)
+            return result
+        # Dimensione ignota (streaming): conta i byte senza bufferizzare
+        return _CountingIterable(result, lambda size: self._record(environ, dict(captured, size=size), elapsed))
+
+    def _record(self, environ, captured, elapsed):
+        route = environ.get('mineboard.route', 'unmatched')
+        method = environ.get('REQUEST_METHOD', 'GET')
+        metrics_observe('mineboard_http_request_duration_seconds', elapsed, {'endpoint': route, 'method': method})
+        metrics_inc('mineboard_http_requests_total', {'endpoint': route, 'method': method, 'status': captured['status']})
+        if captured['size'] is not None:
+            metrics_observe('mineboard_http_response_size_bytes', captured['size'],
+                            {'endpoint': route, 'method': method}, buckets=METRICS_SIZE_BUCKETS)
+        # I long-poll (es. snapshot dashboard) sono lenti per scelta
+        if elapsed >= self.slow_threshold and not environ.get('mineboard.long_poll'):
+            params = dict(environ.get('mineboard.view_args') or {})
+            for k, v in urllib.parse.parse_qsl(environ.get('QUERY_STRING', ''), keep_blank_values=True):
+                params[k] = v
+            for k in list(params):
+                if any(s in k.lower() for s in _SENSITIVE_PARAMS):
+                    params[k] = '***'
+            entry = {
+                'time': datetime.now(timezone.utc).isoformat(),
+                'method': method,
+                'route': route,
+                'path': environ.get('PATH_INFO', ''),
+                'params': params,
+                'status': captured['status'],
+                'duration_ms': round(elapsed * 1000, 1),
+            }
+            self.slow_requests.append(entry)
+            metrics_inc('mineboard_http_slow_requests_total', {'endpoint': route, 'method': method})
+            print(f"[SLOW] {method} {route} {entry['duration_ms']}ms status={captured['status']} params={params}")
+
+class _CountingIterable:
+    def __init__(self, iterable, on_close):
+        self._iterable = iterable
+        self._on_close = on_close
+        self._size = 0
+
+    def __iter__(self):
+        for chunk in self._iterable:
+            self._size += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self._iterable, 'close'):
+                self._iterable.close()
+        finally:
+            self._on_close(self._size)
+
+request_metrics = RequestMetricsMiddleware(app.wsgi_app)
+app.wsgi_app = request_metrics
+
+# ===================== HTTP CLIENT =====================
+# Tutte le chiamate verso l'esterno (Spiget, MCUtils, PaperMC, CentroJars,
+# webhook Discord, controllo versione, download) passano da qui: una Session
+# condivisa con pool di connessioni keep-alive per host, retry con backoff e
+# jitter su errori di rete e 429/5xx, e una scadenza totale per chiamata
+# (retry e attese comprese, fino alla ricezione del corpo per le risposte non
+# in streaming). Latenza ed errori per host finiscono in /metrics.
+HTTP_POOL_MAXSIZE = int(os.environ.get('MINEBOARD_HTTP_POOL_SIZE', '10'))  # connessioni per host
+HTTP_RETRIES = int(os.environ.get('MINEBOARD_HTTP_RETRIES', '2'))
+HTTP_DEADLINE = float(os.environ.get('MINEBOARD_HTTP_DEADLINE', '30'))     # secondi per chiamata
+HTTP_TIMEOUT = (5, 20)  # connessione, lettura (per singola lettura dal socket)
+HTTP_BACKOFF_BASE = 0.5
+HTTP_BACKOFF_MAX = 8.0
+HTTP_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+HTTP_IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+HTTP_BODY_CHUNK = 64 * 1024
+
+METRICS_HELP.update({
+    'mineboard_upstream_requests_total': ('counter', 'Outbound HTTP requests by upstream host and status class.'),
+    'mineboard_upstream_request_duration_seconds': ('histogram', 'Latency of outbound HTTP requests until response headers.'),
+    'mineboard_upstream_errors_total': ('counter', 'Outbound HTTP requests that failed (timeout, connection, deadline).'),
+    'mineboard_upstream_retries_total': ('counter', 'Outbound HTTP requests retried.'),
+})
+
+class HttpDeadlineExceeded(requests.Timeout):
+    pass
+
+def _build_http_session():
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    # Retry gestiti da http_request (per rispettare la scadenza totale), non da urllib3
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = f'MineBoard/{APP_VERSION}'
+    return session
+
+http_session = _build_http_session()
+
+def _http_retry_delay(attempt, response=None):
+    if response is not None:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return float(retry_after)
+    cap = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, cap)  # full jitter
+
+def http_request(method, url, timeout=None, deadline=HTTP_DEADLINE, retries=None, stream=False, **kwargs):
+    """requests.request sulla Session condivisa, con retry e scadenza totale.
+
+    `deadline=None` disattiva la scadenza (download lunghi in streaming: resta
+    il timeout di lettura). I metodi non idempotenti (POST) vengono ritentati
+    solo se la richiesta non è partita (timeout di connessione) o su 429.
+    """
+    method = method.upper()
+    retries = HTTP_RETRIES if retries is None else retries
+    connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout or HTTP_TIMEOUT[0], timeout or HTTP_TIMEOUT[1])
+    host = urllib.parse.urlsplit(url).hostname or 'unknown'
+    started = time.monotonic()
+    idempotent = method in HTTP_IDEMPOTENT_METHODS
+    attempt = 0
+
+    def remaining():
+        return None if deadline is None else deadline - (time.monotonic() - started)
+
+    def fail(reason):
+        metrics_inc('mineboard_upstream_errors_total', {'host': host, 'reason': reason})
+
+    while True:
+        left = remaining()
+        if left is not None and left <= 0:
+            fail('deadline')
+            raise HttpDeadlineExceeded(f"{method} {url}: scadenza di {deadline:.0f}s superata")
+        call_timeout = (connect_timeout, read_timeout) if left is None else (min(connect_timeout, left), min(read_timeout, left))
+        t0 = time.monotonic()
+        try:
+            r = http_session.request(method, url, timeout=call_timeout, stream=True, **kwargs)
+        except requests.RequestException as e:
+            metrics_observe('mineboard_upstream_request_duration_seconds', time.monotonic() - t0, {'host': host})
+            fail('timeout' if isinstance(e, requests.Timeout) else 'connection')
+            not_sent = isinstance(e, requests.ConnectTimeout)
+            delay = _http_retry_delay(attempt)
+            left = remaining()
+            if attempt >= retries or not (idempotent or not_sent) or (left is not None and left <= delay):
+                raise
+            metrics_inc('mineboard_upstream_retries_total', {'host': host})
+            attempt += 1
+            time.sleep(delay)
+            continue
+        metrics_observe('mineboard_upstream_request_duration_seconds', time.monotonic() - t0, {'host': host})
+        metrics_inc('mineboard_upstream_requests_total', {'host': host, 'status': f'{r.status_code // 100}xx'})
+        if r.status_code in HTTP_RETRY_STATUSES and attempt < retries and (idempotent or r.status_code == 429):
+            delay = _http_retry_delay(attempt, r)
+            left = remaining()
+            if left is None or left > delay:
+                r.close()
+                metrics_inc('mineboard_upstream_retries_total', {'host': host})
+                attempt += 1
+                time.sleep(delay)
+                continue
+        if stream:
+            return r
+        # Legge il corpo qui per applicare la scadenza anche al download della risposta
+        body = bytearray()
+        try:
+            for chunk in r.iter_content(chunk_size=HTTP_BODY_CHUNK):
+                body += chunk
+                left = remaining()
+                if left is not None and left <= 0:
+                    fail('deadline')
+                    raise HttpDeadlineExceeded(f"{method} {url}: scadenza di {deadline:.0f}s superata")
+        except requests.RequestException:
+            r.close()
+            raise
+        r._content = bytes(body)
+        r._content_consumed = True
+        r.close()
+        return r
+
+def http_get(url, **kwargs):
+    return http_request('GET', url, **kwargs)
+
+def http_post(url, **kwargs):
+    return http_request('POST', url, **kwargs)
+
 DEFAULT_PERMISSIONS = {
     'servers_control': True,   # avviare/fermare/riavviare
     'files_access': True,      # file manager
@@ -112,19 +427,8 @@ otp_info = {
     'used': False
 }
 
-def load_users():
-    try:
-        with open(USERS_FILE, 'r') as f:
-            users = json.load(f)
-    except Exception:
-        users = {
-            'admin': {
-                'password_hash': None,
-                'role': 'admin',
-                'permissions': DEFAULT_PERMISSIONS
-            }
-        }
-    # Normalize: ensure role and permissions exist
+def normalize_users(users):
+    """Assicura role e permissions per ogni utente. Ritorna True se ha modificato qualcosa."""
     changed = False
     for uname, info in list(users.items()):
         if not isinstance(info, dict):
@@ -136,7 +440,7 @@ def load_users():
             changed = True
         if 'permissions' not in info:
             if info['role'] == 'admin':
-                info['permissions'] = DEFAULT_PERMISSIONS
+                info['permissions'] = dict(DEFAULT_PERMISSIONS)
             else:
                 info['permissions'] = {
                     'servers_control': False,
@@ -149,19 +453,93 @@ def load_users():
                     'server_stats_access': False
                 }
             changed = True
-    if changed:
-        save_users(users)
-    return users
+    return changed
+
+class UserStore:
+    """users.json in memoria.
+
+    Il file viene riletto solo quando cambia (mtime, size), quindi una modifica
+    a mano viene vista alla richiesta successiva. Le scritture passano tutte da
+    update()/save() sotto lock e sono atomiche, così due modifiche concorrenti
+    dall'admin non si sovrascrivono.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.users = None
+        self.stamp = None
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if self.users is not None and stamp == self.stamp:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                users = json.load(f)
+        except Exception:
+            users = {
+                'admin': {
+                    'password_hash': None,
+                    'role': 'admin',
+                    'permissions': dict(DEFAULT_PERMISSIONS)
+                }
+            }
+        if normalize_users(users):
+            self._write(users)
+        else:
+            self.users = users
+            self.stamp = stamp
+
+    def _write(self, users):
+        write_json_atomic(self.path, users)
+        st = os.stat(self.path)
+        self.users = users
+        self.stamp = (st.st_mtime_ns, st.st_size)
+
+    def all(self):
+        """Copia di tutti gli utenti (il chiamante può modificarla liberamente)."""
+        with self.lock:
+            self._refresh()
+            return copy.deepcopy(self.users)
+
+    def lookup(self, username):
+        """Copia del singolo utente, o None."""
+        with self.lock:
+            self._refresh()
+            return copy.deepcopy(self.users.get(username))
+
+    def save(self, users):
+        with self.lock:
+            normalize_users(users)
+            self._write(copy.deepcopy(users))
+
+    def update(self, mutate):
+        """Applica mutate(users) sull'ultima versione e salva; ritorna gli utenti aggiornati."""
+        with self.lock:
+            self._refresh()
+            users = copy.deepcopy(self.users)
+            mutate(users)
+            self.save(users)
+            return users
+
+user_store = UserStore(USERS_FILE)
+
+def load_users():
+    return user_store.all()
 
 def save_users(users):
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f, indent=2)
+    user_store.save(users)
 
 def set_admin_password(raw_password):
-    users = load_users()
-    users.setdefault('admin', {'role': 'admin', 'permissions': DEFAULT_PERMISSIONS})
-    users['admin']['password_hash'] = generate_password_hash(raw_password)
-    save_users(users)
+    def apply(users):
+        users.setdefault('admin', {'role': 'admin', 'permissions': dict(DEFAULT_PERMISSIONS)})
+        users['admin']['password_hash'] = generate_password_hash(raw_password)
+    user_store.update(apply)
 
 def is_authenticated():
     return bool(session.get('user'))
@@ -170,8 +548,18 @@ def get_current_user():
     username = session.get('user')
     if not username:
         return None, None
-    users = load_users()
-    return username, users.get(username)
+    # Risolto una volta per richiesta: has_permission() può essere chiamato più
+    # volte dalla stessa view senza rileggere lo store.
+    cached = getattr(g, 'mineboard_user', None)
+    if cached is not None and cached[0] == username:
+        return username, cached[1]
+    user = user_store.lookup(username)
+    g.mineboard_user = (username, user)
+    return username, user
+
+def is_admin_user():
+    username, user = get_current_user()
+    return bool(user) and user.get('role') == 'admin'
 
 def has_permission(perm_key):
     username, user = get_current_user()
@@ -185,13 +573,21 @@ def has_permission(perm_key):
 def login_required_path(path):
     # Percorsi pubblici
     public_paths = [
-        '/login', '/forgot-password', '/static/', '/favicon.ico'
+        '/login', '/forgot-password', '/static/', '/favicon.ico',
+        '/metrics'  # autenticato con token di scrape, non con la sessione
     ]
     # Consenti static
     if path.startswith('/static/'):
         return False
     return path not in public_paths
 
+@app.before_request
+def tag_request_route():
+    # Registrato prima dell'autenticazione così anche i redirect hanno la route;
+    # RequestMetricsMiddleware legge questi valori dall'environ a fine richiesta.
+    request.environ['mineboard.route'] = request.url_rule.rule if request.url_rule else 'unmatched'
+    request.environ['mineboard.view_args'] = request.view_args or {}
+
 @app.before_request
 def enforce_authentication():
     path = request.path
@@ -222,6 +618,22 @@ MCUTILS_TYPES = {
     'modded': ['fabric', 'neoforge', 'quilt', 'forge']
 }
 
+# Ultime versioni note, usate per "latest" solo se il catalogo versions/ non ha
+# il tipo richiesto (vedi resolve_latest_version)
+FALLBACK_LATEST_VERSIONS = {
+    'paper': '1.21.8',
+    'spigot': '1.21.8',
+    'bukkit': '1.21.8',
+    'vanilla': '1.21.8',
+    'fabric': '1.21.8',
+    'forge': '1.21.8',
+    'quilt': '1.21.8',
+    'velocity': '3.4.0-SNAPSHOT',
+    'bungeecord': '1.21',
+    'waterfall': '1.21'
+}
+FALLBACK_LATEST_DEFAULT = '1.21.8'
+
 # Fallback URLs per download JAR
 FALLBACK_JAR_URLS = {
     'paper': 'https://api.papermc.io/v2/projects/paper/versions/{version}/builds/{build}/downloads/paper-{version}-{build}.jar',
@@ -232,7 +644,7 @@ FALLBACK_JAR_URLS = {
 def fetch_jar_types():
     """Ottieni tutti i tipi di JAR disponibili da CentroJars"""
     try:
-        response = requests.get(f"{CENTROJARS_BASE_URL}/api/fetchJar/fetchAllTypes.php", timeout=10)
+        response = http_get(f"{CENTROJARS_BASE_URL}/api/fetchJar/fetchAllTypes.php", timeout=10)
         if response.status_code == 200:
             return response.json()
         return CENTROJARS_TYPES
@@ -244,7 +656,7 @@ def fetch_latest_jar(type_name, category):
     """Ottieni informazioni sull'ultimo JAR disponibile"""
     try:
         # Prova prima con CentroJars
-        response = requests.get(f"{CENTROJARS_BASE_URL}/api/fetchLatest/{type_name}/{category}", timeout=10, allow_redirects=True)
+        response = http_get(f"{CENTROJARS_BASE_URL}/api/fetchLatest/{type_name}/{category}", timeout=10, allow_redirects=True)
         if response.status_code == 200:
             data = response.json()
             # CentroJars restituisce la struttura: {"status": "success", "response": {...}}
@@ -252,24 +664,19 @@ def fetch_latest_jar(type_name, category):
                 return data['response']
             return data
         
-        # Se CentroJars non funziona, usa fallback per versioni comuni
+        # Se CentroJars non funziona, usa il catalogo locale / fallback
         print(f"CentroJars non disponibile per {category}, uso fallback")
-        fallback_versions = {
-            'paper': '1.20.1',
-            'spigot': '1.20.1', 
-            'bukkit': '1.20.1',
-            'vanilla': '1.20.1',
-            'fabric': '1.20.1',
-            'forge': '1.20.1',
-            'quilt': '1.20.1',
-            'velocity': '3.2.0',
-            'bungeecord': '1.20',
-            'waterfall': '1.20'
-        }
-        
-        if category in fallback_versions:
+        local_latest = versions_catalog.latest(category)
+        if local_latest:
             return {
-                'version': fallback_versions[category],
+                'version': local_latest,
+                'category': category,
+                'type': type_name,
+                'source': 'versions'
+            }
+        if category in FALLBACK_LATEST_VERSIONS:
+            return {
+                'version': FALLBACK_LATEST_VERSIONS[category],
                 'category': category,
                 'type': type_name,
                 'source': 'fallback'
@@ -291,14 +698,14 @@ def fetch_jar_download_link(type_name, category, version="latest"):
                 print(f"Versione latest trovata: {version}")
             else:
                 # Fallback per versioni comuni
-                version = "1.20.1"
+                version = resolve_latest_version(category)
                 print(f"Usando versione fallback: {version}")
         
         # Prova prima con l'URL diretto
         url = f"{CENTROJARS_BASE_URL}/api/fetchJar/{type_name}/{category}/{version}"
         print(f"Tentativo di accesso a: {url}")
         
-        response = requests.get(url, timeout=10, allow_redirects=True)
+        response = http_get(url, timeout=10, allow_redirects=True)
         print(f"Status code: {response.status_code}")
         
         if response.status_code == 200:
@@ -317,7 +724,7 @@ def fetch_jar_download_link(type_name, category, version="latest"):
             # Segui il redirect
             redirect_url = response.headers.get('Location')
             if redirect_url:
-                redirect_response = requests.get(redirect_url, timeout=10)
+                redirect_response = http_get(redirect_url, timeout=10)
                 if redirect_response.status_code == 200:
                     try:
                         return redirect_response.json()
@@ -330,11 +737,29 @@ def fetch_jar_download_link(type_name, category, version="latest"):
         return None
 
 # ===================== SERVER INTERNAL CONFIG + WEBHOOK HELPERS =====================
-def load_server_internal_config(server_name):
-    """Carica server_config.json come dict, se manca ritorna default."""
-    server_path = os.path.join(SERVER_DIR, server_name)
-    cfg_path = os.path.join(server_path, 'server_config.json')
-    cfg = {
+WEBHOOK_TRIGGERS = ['server_started', 'server_stopped', 'server_crashed', 'backup_completed', 'jar_updated',
+                    'command_received', 'server_terminated', 'player_join_match', 'disk_quota_exceeded']
+
+def write_json_atomic(path, data):
+    """Scrive JSON su file temporaneo nella stessa cartella e poi os.replace: chi legge non vede mai file a metà."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def default_server_config(server_name):
+    return {
         'name': server_name,
         'port': 25565,
         'jar_file': 'server.jar',
@@ -342,50 +767,116 @@ def load_server_internal_config(server_name):
         'status': 'stopped',
         'use_custom_start': False,
         'custom_start_cmd': '',
+        'gc_logging': False,
+        'disk_quota_mb': 0,
         'webhook': {
             'url': '',
-            'triggers': {
-                'server_started': False,
-                'server_stopped': False,
-                'server_crashed': False,
-                'backup_completed': False,
-                'jar_updated': False,
-                'command_received': False,
-                'server_terminated': False,
-                'player_join_match': False
-            },
+            'triggers': {t: False for t in WEBHOOK_TRIGGERS},
             'player_match_username': ''
         }
     }
-    try:
-        if os.path.exists(cfg_path):
-            with open(cfg_path, 'r') as f:
-                file_cfg = json.load(f)
-                # merge shallow
-                for k, v in file_cfg.items():
-                    cfg[k] = v
-                # Default webhook keys
-                wb = cfg.get('webhook') or {}
-                wb.setdefault('url', '')
-                wb.setdefault('triggers', {})
-                for t in ['server_started','server_stopped','server_crashed','backup_completed','jar_updated','command_received','server_terminated','player_join_match']:
-                    wb['triggers'].setdefault(t, False)
-                wb.setdefault('player_match_username', '')
-                cfg['webhook'] = wb
-                # Ensure custom start keys exist after merge
-                cfg.setdefault('use_custom_start', False)
-                cfg.setdefault('custom_start_cmd', '')
-    except Exception as e:
-        print(f"Errore nel caricare config server {server_name}: {e}")
-    return cfg
+
+class ServerConfigError(Exception):
+    """server_config.json esiste ma non è leggibile (JSON non valido, permessi)."""
+    pass
+
+class ServerConfigStore:
+    """Cache in memoria di servers/<nome>/server_config.json.
+
+    Le voci sono validate con (mtime, size) del file, quindi le modifiche
+    esterne vengono viste alla lettura successiva; le scritture passano da qui
+    (atomiche) e aggiornano subito la cache. Default e normalizzazione delle
+    chiavi webhook vengono applicati una sola volta per versione del file.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.cache = {}  # nome -> (mtime_ns, size, cfg normalizzata)
+
+    @staticmethod
+    def path(server_name):
+        return os.path.join(SERVER_DIR, server_name, 'server_config.json')
+
+    @staticmethod
+    def normalize(server_name, file_cfg):
+        cfg = default_server_config(server_name)
+        # merge shallow
+        for k, v in (file_cfg or {}).items():
+            cfg[k] = v
+        # Default webhook keys
+        wb = cfg.get('webhook') or {}
+        wb.setdefault('url', '')
+        wb.setdefault('triggers', {})
+        for t in WEBHOOK_TRIGGERS:
+            wb['triggers'].setdefault(t, False)
+        wb.setdefault('player_match_username', '')
+        cfg['webhook'] = wb
+        return cfg
+
+    def exists(self, server_name):
+        return os.path.isfile(self.path(server_name))
+
+    def get(self, server_name, revalidate=True, strict=False):
+        """Ritorna una copia della configurazione normalizzata (default se il file manca).
+
+        Se il file esiste ma non si riesce a leggerlo ritorna i default, oppure
+        con strict=True solleva ServerConfigError: chi poi salva o avvia il
+        server non deve lavorare su valori inventati.
+        """
+        cfg_path = self.path(server_name)
+        with self.lock:
+            cached = self.cache.get(server_name)
+            if cached is not None and not revalidate:
+                return copy.deepcopy(cached[2])
+            try:
+                st = os.stat(cfg_path)
+            except OSError:
+                self.cache.pop(server_name, None)
+                return default_server_config(server_name)
+            if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                return copy.deepcopy(cached[2])
+            try:
+                with open(cfg_path, 'r') as f:
+                    cfg = self.normalize(server_name, json.load(f))
+            except Exception as e:
+                print(f"Errore nel caricare config server {server_name}: {e}")
+                if strict:
+                    raise ServerConfigError(f"server_config.json di '{server_name}' non leggibile: {e}")
+                return default_server_config(server_name)
+            self.cache[server_name] = (st.st_mtime_ns, st.st_size, cfg)
+            return copy.deepcopy(cfg)
+
+    def save(self, server_name, cfg):
+        cfg_path = self.path(server_name)
+        with self.lock:
+            write_json_atomic(cfg_path, cfg)
+            st = os.stat(cfg_path)
+            self.cache[server_name] = (st.st_mtime_ns, st.st_size, self.normalize(server_name, copy.deepcopy(cfg)))
+
+    def update(self, server_name, mutate):
+        """Legge, applica mutate(cfg) e salva sotto lock, così due scritture concorrenti non si sovrascrivono.
+
+        Un file esistente ma illeggibile non viene mai sovrascritto con i default (ServerConfigError).
+        """
+        with self.lock:
+            cfg = self.get(server_name, strict=True)
+            mutate(cfg)
+            self.save(server_name, cfg)
+            return cfg
+
+    def invalidate(self, server_name):
+        with self.lock:
+            self.cache.pop(server_name, None)
+
+server_config_store = ServerConfigStore()
+
+def load_server_internal_config(server_name):
+    """Carica server_config.json come dict, se manca ritorna default."""
+    return server_config_store.get(server_name)
 
 def save_server_internal_config(server_name, cfg):
-    server_path = os.path.join(SERVER_DIR, server_name)
-    os.makedirs(server_path, exist_ok=True)
-    cfg_path = os.path.join(server_path, 'server_config.json')
     try:
-        with open(cfg_path, 'w') as f:
-            json.dump(cfg, f, indent=2)
+        server_config_store.save(server_name, cfg)
         return True
     except Exception as e:
         print(f"Errore nel salvataggio config server {server_name}: {e}")
@@ -405,42 +896,28 @@ def send_discord_webhook(server_name, trigger_key, content):
         payload = {
             'content': content
         }
-        r = requests.post(url, json=payload, timeout=10)
-        return r.status_code in (200, 204)
+        r = http_post(url, json=payload, timeout=10)
+        ok = r.status_code in (200, 204)
+        metrics_inc('mineboard_webhook_sent_total' if ok else 'mineboard_webhook_failures_total',
+                    {'server': server_name, 'trigger': trigger_key})
+        return ok
     except Exception as e:
         print(f"Errore invio webhook ({trigger_key}): {e}")
+        metrics_inc('mineboard_webhook_failures_total', {'server': server_name, 'trigger': trigger_key})
         return False
 
 def get_fallback_jar_url(category, version="latest"):
     """Ottieni URL di fallback per download JAR quando CentroJars non è disponibile"""
     try:
-        # Se la versione è "latest", usa versioni predefinite
+        # Se la versione è "latest", usa il catalogo o le versioni predefinite
         if version == "latest":
-            fallback_versions = {
-                'paper': '1.20.1',
-                'spigot': '1.20.1', 
-                'bukkit': '1.20.1',
-                'vanilla': '1.20.1',
-                'fabric': '1.20.1',
-                'forge': '1.20.1',
-                'quilt': '1.20.1',
-                'velocity': '3.2.0',
-                'bungeecord': '1.20',
-                'waterfall': '1.20'
-            }
-            version = fallback_versions.get(category, '1.20.1')
+            version = resolve_latest_version(category)
         
         if category == 'paper':
-            # Per Paper, usa l'API ufficiale
-            try:
-                # Ottieni l'ultimo build per quella versione
-                builds_response = requests.get(f'https://api.papermc.io/v2/projects/paper/versions/{version}/builds', timeout=10)
-                if builds_response.status_code == 200:
-                    builds = builds_response.json()['builds']
-                    latest_build = builds[-1]['build']
-                    return f'https://api.papermc.io/v2/projects/paper/versions/{version}/builds/{latest_build}/downloads/paper-{version}-{latest_build}.jar'
-            except:
-                pass
+            # Per Paper, usa l'API ufficiale (ultimo build, memorizzato in resolution_cache)
+            paper = resolve_paper_build(version)
+            if paper:
+                return paper['url']
         
         elif category == 'spigot':
             # Per Spigot, usa GetBukkit
@@ -458,28 +935,231 @@ def get_fallback_jar_url(category, version="latest"):
         print(f"Errore nel fallback JAR: {e}")
         return None
 
-def get_url_from_versions(jar_type, version):
-    """Leggi i file JSON in versions/ per ottenere l'URL di download per jar_type/version.
-    Ritorna None se non trovato."""
-    try:
-        os.makedirs(VERSIONS_DIR, exist_ok=True)
-        # Normalizza nomi file: bukkit -> craftbukkit
-        file_key = jar_type.lower()
-        if file_key == 'bukkit':
-            file_key = 'craftbukkit'
-        filename = f"{file_key}_version_list.json"
-        path = os.path.join(VERSIONS_DIR, filename)
-        if not os.path.exists(path):
+# ===================== VERSIONS CATALOG =====================
+# Indice in memoria di versions/<tipo>_version_list.json ({versione: url}).
+# I file vengono caricati una volta e ricaricati solo quando cambiano
+# (mtime/size, controllato al massimo ogni VERSIONS_CHECK_INTERVAL secondi).
+# Opzionalmente le liste si aggiornano da un upstream: il nuovo indice viene
+# costruito a parte e sostituito in un colpo solo.
+VERSIONS_FILE_SUFFIX = '_version_list.json'
+VERSIONS_FILE_ALIASES = {'bukkit': 'craftbukkit'}
+VERSIONS_CHECK_INTERVAL = 5.0
+# Es. https://raw.githubusercontent.com/<utente>/<repo>/main/{file}; vuoto = disattivato
+VERSIONS_UPSTREAM_URL = os.environ.get('MINEBOARD_VERSIONS_UPSTREAM', '').strip()
+VERSIONS_UPSTREAM_INTERVAL = float(os.environ.get('MINEBOARD_VERSIONS_UPSTREAM_INTERVAL', '86400'))
+
+_VERSION_SNAPSHOT_RE = re.compile(r'^(\d{2})w(\d{2})([a-z]+)$', re.IGNORECASE)
+_VERSION_NUMERIC_RE = re.compile(
+    r'^(\d+(?:\.\d+)*)(?:[-_ ]*(alpha|beta|a|b|snapshot|pre-release|pre|rc|release-candidate)[-_. ]*(\d*))?(.*)$',
+    re.IGNORECASE)
+# Ordine degli stadi prima della release finale (più alto = più recente)
+_VERSION_STAGE_RANK = {
+    'alpha': 0, 'a': 0, 'beta': 1, 'b': 1, 'snapshot': 2,
+    'pre': 3, 'pre-release': 3, 'rc': 4, 'release-candidate': 4,
+}
+_VERSION_RELEASE_RANK = 5
+
+def version_sort_key(v):
+    """Chiave di ordinamento per versioni Minecraft/proxy.
+
+    1.21 == 1.21.0 < 1.21.1-pre1 < 1.21.1-rc1 < 1.21.1; i suffissi Maven
+    (-SNAPSHOT) contano come precedenti alla release. Gli snapshot settimanali
+    (24w14a) non hanno un numero di versione: stanno sotto tutte le release,
+    ordinati per anno/settimana. Stringhe non riconosciute in fondo.
+    """
+    v = str(v).strip()
+    m = _VERSION_SNAPSHOT_RE.match(v)
+    if m:
+        return (1, (int(m.group(1)), int(m.group(2))), 0, m.group(3).lower(), v)
+    m = _VERSION_NUMERIC_RE.match(v)
+    if not m:
+        return (0, (), 0, '', v)
+    nums = [int(p) for p in m.group(1).split('.')]
+    while len(nums) > 1 and nums[-1] == 0:
+        nums.pop()
+    stage = (m.group(2) or '').lower()
+    rank = _VERSION_STAGE_RANK.get(stage, _VERSION_RELEASE_RANK)
+    stage_num = int(m.group(3)) if m.group(3) else 0
+    return (2, tuple(nums), rank, '%08d' % stage_num, v)
+
+def is_stable_version(v):
+    """True per release finali (niente pre/rc/snapshot/alpha/beta né suffissi)."""
+    m = _VERSION_NUMERIC_RE.match(str(v).strip())
+    return bool(m) and not m.group(2) and not m.group(4)
+
+def stable_versions(ordered):
+    """Versioni considerate stabili di una lista ordinata dalla più recente.
+
+    Di norma solo le release finali. Se però la linea major.minor più recente
+    esiste solo come build Maven -SNAPSHOT (es. Velocity 3.4.0-SNAPSHOT) le sue
+    build contano come stabili: altrimenti "ultima stabile" sarebbe una release
+    vecchia di anni (Velocity 3.1.0).
+    """
+    stable = [v for v in ordered if is_stable_version(v)]
+    if not ordered:
+        return stable
+    snapshot = _VERSION_STAGE_RANK['snapshot']
+    newest = version_sort_key(ordered[0])
+    if newest[0] != 2 or newest[2] != snapshot:
+        return stable
+    line = newest[1][:2]
+    if any(version_sort_key(v)[1][:2] == line for v in stable):
+        return stable
+    current = [v for v in ordered
+               if version_sort_key(v)[0] == 2 and version_sort_key(v)[1][:2] == line and version_sort_key(v)[2] == snapshot]
+    return current + stable
+
+class VersionsCatalog:
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.index = {}   # tipo -> {'urls': {versione: url}, 'ordered': [...], 'stable': [...], 'latest', 'latest_stable'}
+        self.stamps = {}  # nome file -> (mtime_ns, size)
+        self.checked_at = 0.0
+
+    @staticmethod
+    def file_key(jar_type):
+        key = str(jar_type or '').strip().lower()
+        return VERSIONS_FILE_ALIASES.get(key, key)
+
+    @staticmethod
+    def build_entry(data):
+        urls = {str(k): v for k, v in data.items() if isinstance(v, str) and v}
+        ordered = sorted(urls, key=version_sort_key, reverse=True)
+        stable = stable_versions(ordered)
+        return {
+            'urls': urls,
+            'ordered': ordered,
+            'stable': stable,
+            'latest': ordered[0] if ordered else None,
+            'latest_stable': stable[0] if stable else None,
+        }
+
+    def _refresh(self, force=False):
+        now = time.time()
+        if not force and now - self.checked_at < VERSIONS_CHECK_INTERVAL:
+            return
+        with self.lock:
+            if not force and now - self.checked_at < VERSIONS_CHECK_INTERVAL:
+                return
+            self.checked_at = now
+            stamps = {}
+            try:
+                with os.scandir(self.directory) as it:
+                    for entry in it:
+                        if entry.name.endswith(VERSIONS_FILE_SUFFIX) and entry.is_file():
+                            st = entry.stat()
+                            stamps[entry.name] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                pass
+            if stamps == self.stamps:
+                return
+            index = dict(self.index)
+            for fname in set(self.stamps) - set(stamps):
+                index.pop(fname[:-len(VERSIONS_FILE_SUFFIX)], None)
+            for fname, stamp in stamps.items():
+                if self.stamps.get(fname) == stamp:
+                    continue
+                try:
+                    with open(os.path.join(self.directory, fname), 'r') as f:
+                        data = json.load(f)
+                    index[fname[:-len(VERSIONS_FILE_SUFFIX)]] = self.build_entry(data)
+                except Exception as e:
+                    print(f"Errore lettura versions/{fname}: {e}")
+            self.index = index
+            self.stamps = stamps
+
+    def _entry(self, jar_type):
+        self._refresh()
+        return self.index.get(self.file_key(jar_type))
+
+    def types(self):
+        self._refresh()
+        return sorted(self.index)
+
+    def lookup(self, jar_type, version):
+        entry = self._entry(jar_type)
+        return entry['urls'].get(str(version).strip()) if entry else None
+
+    def versions(self, jar_type, stable_only=False):
+        entry = self._entry(jar_type)
+        if not entry:
+            return None
+        if stable_only:
+            return list(entry['stable'])
+        return list(entry['ordered'])
+
+    def latest(self, jar_type, stable=True):
+        entry = self._entry(jar_type)
+        if not entry:
             return None
-        with open(path, 'r') as f:
-            data = json.load(f)
-        # Le chiavi sono versioni, i valori URL
-        url = data.get(str(version))
-        return url
+        if stable:
+            return entry['latest_stable'] or entry['latest']
+        return entry['latest']
+
+    def refresh_upstream(self):
+        """Scarica le liste da VERSIONS_UPSTREAM_URL, le salva e sostituisce l'indice.
+
+        Un tipo che fallisce mantiene la lista precedente. Ritorna i tipi aggiornati.
+        """
+        if not VERSIONS_UPSTREAM_URL:
+            return []
+        self._refresh(force=True)
+        with self.lock:
+            known = sorted(self.index)
+        fetched = {}
+        for key in known:
+            fname = f"{key}{VERSIONS_FILE_SUFFIX}"
+            try:
+                r = http_get(VERSIONS_UPSTREAM_URL.format(file=fname, type=key))
+                if r.status_code != 200:
+                    continue
+                data = r.json()
+                if not isinstance(data, dict) or not data:
+                    continue
+                fetched[fname] = (key, data, self.build_entry(data))
+            except Exception as e:
+                print(f"Errore aggiornamento versioni {key} da upstream: {e}")
+        if not fetched:
+            return []
+        with self.lock:
+            index = dict(self.index)
+            stamps = dict(self.stamps)
+            for fname, (key, data, entry) in fetched.items():
+                path = os.path.join(self.directory, fname)
+                write_json_atomic(path, data)
+                st = os.stat(path)
+                stamps[fname] = (st.st_mtime_ns, st.st_size)
+                index[key] = entry
+            self.index = index
+            self.stamps = stamps
+        return sorted(key for key, _, _ in fetched.values())
+
+versions_catalog = VersionsCatalog(VERSIONS_DIR)
+
+def get_url_from_versions(jar_type, version):
+    """URL di download per jar_type/version dal catalogo versions/, None se non trovato."""
+    try:
+        return versions_catalog.lookup(jar_type, version)
     except Exception as e:
         print(f"Errore lettura versions/{jar_type}: {e}")
         return None
 
+def resolve_latest_version(jar_type):
+    """Ultima versione stabile nota per jar_type (vedi stable_versions): catalogo locale, poi FALLBACK_LATEST_VERSIONS."""
+    key = str(jar_type or '').strip().lower()
+    return versions_catalog.latest(key) or FALLBACK_LATEST_VERSIONS.get(key, FALLBACK_LATEST_DEFAULT)
+
+def background_versions_refresher():
+    while True:
+        try:
+            updated = versions_catalog.refresh_upstream()
+            if updated:
+                print(f"[VERSIONS] Liste aggiornate da upstream: {', '.join(updated)}")
+        except Exception as e:
+            print(f"Errore aggiornamento versioni: {e}")
+        time.sleep(max(300.0, VERSIONS_UPSTREAM_INTERVAL))
+
 # ===================== VERSION CHECK =====================
 def parse_version(v):
     try:
@@ -505,7 +1185,7 @@ def compare_versions(a, b):
 
 def fetch_latest_version():
     try:
-        r = requests.get(UPDATE_CHECK_URL, timeout=10)
+        r = http_get(UPDATE_CHECK_URL, timeout=10)
         if r.status_code == 200:
             latest = r.text.strip().splitlines()[0].strip()
             return latest
@@ -585,30 +1265,1315 @@ def check_version():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e), 'version': APP_VERSION}), 500
 
-def download_jar_to_server(server_name, jar_url, jar_filename="server.jar"):
-    """Scarica un JAR da CentroJars e lo salva nella directory del server"""
+# ===================== DOWNLOADER =====================
+# Download di file grandi verso un .part su disco: con HTTP Range il file viene
+# scaricato in segmenti paralleli, altrimenti in un unico stream. Accanto al
+# .part uno stato JSON (.part.json) registra i byte già scritti per segmento,
+# così un download interrotto riparte da dove era arrivato. A fine download
+# vengono verificati dimensione e SHA-256.
+DOWNLOAD_SEGMENTS = max(1, int(os.environ.get('MINEBOARD_DOWNLOAD_SEGMENTS', '4')))
+DOWNLOAD_PARALLEL_MIN_BYTES = 8 * 1024 * 1024  # sotto questa soglia un solo stream
+DOWNLOAD_BUFFER_SIZE = 1024 * 1024             # byte accumulati prima di ogni scrittura
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_TIMEOUT = (10, 60)                    # connessione, lettura
+DOWNLOAD_STATE_INTERVAL = 1.0
+
+class DownloadError(Exception):
+    pass
+
+def _content_disposition_filename(headers):
+    cd = headers.get('Content-Disposition') or headers.get('content-disposition')
+    if cd and 'filename=' in cd:
+        return cd.split('filename=')[-1].split(';')[0].strip().strip('"')
+    return None
+
+def probe_download(url, headers=None):
+    """Chiede il primo byte con Range per sapere URL finale, dimensione e supporto ai range."""
+    h = dict(headers or {})
+    h['Range'] = 'bytes=0-0'
+    with http_get(url, headers=h, stream=True, timeout=DOWNLOAD_TIMEOUT, allow_redirects=True) as r:
+        if r.status_code not in (200, 206):
+            raise DownloadError(f"HTTP {r.status_code}")
+        size = None
+        ranges = r.status_code == 206
+        if ranges:
+            total = (r.headers.get('Content-Range') or '').rsplit('/', 1)[-1]
+            size = int(total) if total.isdigit() else None
+            ranges = size is not None
+        else:
+            try:
+                size = int(r.headers.get('Content-Length', '')) or None
+            except ValueError:
+                size = None
+        return {
+            'url': r.url,
+            'size': size,
+            'ranges': ranges,
+            'etag': r.headers.get('ETag'),
+            'last_modified': r.headers.get('Last-Modified'),
+            'filename': _content_disposition_filename(r.headers),
+        }
+
+def _read_download_state(state_path, identity):
+    try:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+        if state.get('identity') == identity:
+            return state
+    except (OSError, ValueError):
+        pass
+    return None
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_BUFFER_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def fetch_to_file(url, part_path, expected_size=None, expected_sha256=None, progress=None,
+                  kind='jar', headers=None, segments=None, max_rate=None, unthrottle=None):
+    """Scarica url in part_path (ripartendo da un download parziale compatibile).
+
+    Ritorna {'url', 'size', 'sha256', 'filename'}; il file resta in part_path e
+    spostarlo è compito del chiamante. Con max_rate (byte/s) il download usa un
+    solo stream limitato a quella banda, finché l'Event unthrottle (se dato) non
+    viene impostato. Solleva DownloadError se il download fallisce o la verifica
+    di dimensione/hash non passa.
+    """
+    info = probe_download(url, headers)
+    size = info['size']
+    if expected_size and size and expected_size != size:
+        raise DownloadError(f"Dimensione inattesa: {size} invece di {expected_size}")
+    size = size or expected_size
+    state_path = part_path + '.json'
+    # Un .part è riutilizzabile solo se è lo stesso file remoto
+    identity = [url, size, info['etag'] or info['last_modified']]
+    state = _read_download_state(state_path, identity) if os.path.exists(part_path) else None
+    os.makedirs(os.path.dirname(part_path) or '.', exist_ok=True)
+
+    segments = segments or DOWNLOAD_SEGMENTS
+    if unthrottle is not None and unthrottle.is_set():
+        max_rate = None
+    if info['ranges'] and size and size >= DOWNLOAD_PARALLEL_MIN_BYTES and segments > 1 and not max_rate:
+        _download_segments(info, part_path, state_path, identity, state, size, segments, progress, kind, headers)
+    else:
+        _download_stream(info, part_path, state_path, identity, state, progress, kind, headers, max_rate, unthrottle)
+
+    actual = os.path.getsize(part_path)
+    if size and actual != size:
+        raise DownloadError(f"Download incompleto: {actual}/{size} byte")
+    sha = file_sha256(part_path)
+    try:
+        os.remove(state_path)
+    except OSError:
+        pass
+    if expected_sha256 and sha != expected_sha256.lower():
+        os.remove(part_path)
+        raise DownloadError(f"Checksum non valido: atteso {expected_sha256}, ottenuto {sha}")
+    return {'url': info['url'], 'size': actual, 'sha256': sha, 'filename': info['filename']}
+
+def _download_segments(info, part_path, state_path, identity, state, size, count, progress, kind, headers):
+    if state and state.get('segments'):
+        segs = [list(seg) for seg in state['segments']]
+    else:
+        step = -(-size // count)
+        segs = [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+    lock = threading.Lock()
+    errors = []
+
+    def save_state():
+        with lock:
+            snapshot = [list(seg) for seg in segs]
+        write_json_atomic(state_path, {'identity': identity, 'segments': snapshot})
+
+    def worker(seg):
+        attempts = 0
+        with open(part_path, 'r+b') as f:
+            while seg[2] < seg[1] - seg[0] + 1:
+                offset = seg[0] + seg[2]
+                h = dict(headers or {})
+                h['Range'] = f'bytes={offset}-{seg[1]}'
+                try:
+                    with http_get(info['url'], headers=h, stream=True, timeout=DOWNLOAD_TIMEOUT, deadline=None, retries=0) as r:
+                        if r.status_code != 206:
+                            raise DownloadError(f"Range non rispettato: HTTP {r.status_code}")
+                        buf = bytearray()
+                        for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            buf += chunk
+                            if len(buf) >= DOWNLOAD_BUFFER_SIZE:
+                                f.seek(seg[0] + seg[2])
+                                f.write(buf)
+                                metrics_inc('mineboard_download_bytes_total', {'kind': kind}, len(buf))
+                                with lock:
+                                    seg[2] += len(buf)
+                                buf = bytearray()
+                        if buf:
+                            f.seek(seg[0] + seg[2])
+                            f.write(buf)
+                            metrics_inc('mineboard_download_bytes_total', {'kind': kind}, len(buf))
+                            with lock:
+                                seg[2] += len(buf)
+                    attempts = 0
+                except (requests.RequestException, DownloadError) as e:
+                    attempts += 1
+                    if attempts > DOWNLOAD_RETRIES:
+                        errors.append(e)
+                        return
+                    time.sleep(min(10, 2 ** attempts))
+                if seg[2] > seg[1] - seg[0] + 1:
+                    errors.append(DownloadError('Il server ha inviato più byte del richiesto'))
+                    return
+            f.flush()
+            os.fsync(f.fileno())
+
+    threads = [threading.Thread(target=worker, args=(seg,), daemon=True, name='download-segment')
+               for seg in segs if seg[2] < seg[1] - seg[0] + 1]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        next(t for t in threads if t.is_alive()).join(DOWNLOAD_STATE_INTERVAL)
+        save_state()
+        if progress:
+            with lock:
+                done = sum(seg[2] for seg in segs)
+            progress(done, size)
+    save_state()
+    if errors:
+        raise DownloadError(f"Download interrotto (riprendibile): {errors[0]}")
+    if progress:
+        progress(size, size)
+
+def _download_stream(info, part_path, state_path, identity, state, progress, kind, headers, max_rate=None,
+                     unthrottle=None):
+    # Senza range non si può riprendere: si riparte da zero
+    offset = os.path.getsize(part_path) if state and info['ranges'] else 0
+    write_json_atomic(state_path, {'identity': identity, 'segments': None})
+    attempts = 0
+    started, received = time.monotonic(), 0
+    while True:
+        h = dict(headers or {})
+        if offset:
+            h['Range'] = f'bytes={offset}-'
+        try:
+            with http_get(info['url'], headers=h, stream=True, timeout=DOWNLOAD_TIMEOUT, deadline=None, retries=0) as r:
+                if r.status_code == 200:
+                    offset = 0
+                elif not (offset and r.status_code == 206):
+                    raise DownloadError(f"HTTP {r.status_code}")
+                with open(part_path, 'ab' if offset else 'wb', buffering=DOWNLOAD_BUFFER_SIZE) as f:
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if not chunk:
+                            continue
+                        f.write(chunk)
+                        offset += len(chunk)
+                        metrics_inc('mineboard_download_bytes_total', {'kind': kind}, len(chunk))
+                        if progress:
+                            progress(offset, info['size'])
+                        if max_rate and unthrottle is not None and unthrottle.is_set():
+                            max_rate = None  # una richiesta interattiva attende questo download
+                        if max_rate:
+                            received += len(chunk)
+                            ahead = received / max_rate - (time.monotonic() - started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+                    f.flush()
+                    os.fsync(f.fileno())
+            return
+        except (requests.RequestException, DownloadError) as e:
+            attempts += 1
+            if attempts > DOWNLOAD_RETRIES:
+                raise DownloadError(f"Download interrotto: {e}")
+            time.sleep(min(10, 2 ** attempts))
+            offset = os.path.getsize(part_path) if info['ranges'] and os.path.exists(part_path) else 0
+
+# ===================== RESOLUTION CACHE =====================
+# Ricorda l'esito della risoluzione dei metadati upstream (catalogo/MCUtils/
+# fallback/API PaperMC): chiave -> URL finale (o altro valore) oppure "mancante".
+# Le voci valide durano RESOLVE_HIT_TTL, quelle negative RESOLVE_MISS_TTL;
+# una voce valida scaduta viene ancora servita (fino a RESOLVE_STALE_MAX) mentre
+# un thread la riverifica, così con la cache calda non si attende l'upstream.
+RESOLVE_CACHE_FILE = os.path.join(os.getcwd(), 'cache', 'resolutions.json')
+RESOLVE_HIT_TTL = float(os.environ.get('MINEBOARD_RESOLVE_TTL', '21600'))
+RESOLVE_MISS_TTL = float(os.environ.get('MINEBOARD_RESOLVE_MISS_TTL', '600'))
+RESOLVE_STALE_MAX = 7 * 86400.0  # oltre, la voce si riverifica prima di usarla
+
+class ResolutionCache:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = None  # {chiave: {'value', 'missing', 'status', 'message', 'stored_at'}}
+        self.refreshing = set()
+
+    @staticmethod
+    def key(*parts):
+        return '/'.join(str(p) for p in parts if p not in (None, ''))
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        try:
+            with open(self.path, 'r') as f:
+                self.entries.update(json.load(f) or {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Cache risoluzioni non leggibile, ricostruita: {e}")
+
+    def _save(self):
+        now = time.time()
+        for key in [k for k, e in self.entries.items() if now - e.get('stored_at', 0) > RESOLVE_STALE_MAX]:
+            del self.entries[key]
+        try:
+            write_json_atomic(self.path, self.entries)
+        except Exception as e:
+            print(f"Errore salvataggio cache risoluzioni: {e}")
+
+    def lookup(self, key):
+        """(voce, stato) con stato 'fresh', 'stale' (servibile, da riverificare) o 'expired'."""
+        with self.lock:
+            self._load()
+            entry = self.entries.get(key)
+        if entry is None:
+            return None, 'expired'
+        age = time.time() - entry.get('stored_at', 0)
+        if age <= (RESOLVE_MISS_TTL if entry.get('missing') else RESOLVE_HIT_TTL):
+            return entry, 'fresh'
+        if not entry.get('missing') and age <= RESOLVE_STALE_MAX:
+            return entry, 'stale'
+        return entry, 'expired'
+
+    def store(self, key, value, status=404, message=None):
+        """Memorizza value per key; value None registra una voce negativa."""
+        entry = {'value': value, 'missing': value is None, 'stored_at': time.time()}
+        if value is None:
+            entry.update(status=status, message=message or 'Non trovato')
+        with self.lock:
+            self._load()
+            self.entries[key] = entry
+            self._save()
+        return entry
+
+    def invalidate(self, key):
+        with self.lock:
+            self._load()
+            if self.entries.pop(key, None) is not None:
+                self._save()
+
+    def refresh(self, key, resolver):
+        """Esegue resolver() e salva l'esito; JarResolveError 404 diventa una voce negativa."""
+        try:
+            value = resolver()
+        except JarResolveError as e:
+            if e.status != 404:
+                raise
+            return self.store(key, None, e.status, str(e))
+        return self.store(key, value)
+
+    def revalidate(self, key, resolver):
+        """Riverifica key in background (al massimo un thread per chiave)."""
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def worker():
+            try:
+                self.refresh(key, resolver)
+            except Exception as e:
+                # Resta la voce precedente: verrà ritentata alla prossima richiesta
+                print(f"Riverifica {key} fallita: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+        threading.Thread(target=worker, daemon=True, name='resolve-refresh').start()
+
+    def resolve(self, key, resolver):
+        """Voce per key dalla cache (riverificata in background se scaduta) o da resolver()."""
+        entry, state = self.lookup(key)
+        if state == 'fresh':
+            return entry
+        if state == 'stale':
+            self.revalidate(key, resolver)
+            return entry
+        try:
+            return self.refresh(key, resolver)
+        except Exception:
+            # Upstream irraggiungibile: meglio un URL vecchio che nessuno
+            if entry is not None and not entry.get('missing'):
+                return entry
+            raise
+
+resolution_cache = ResolutionCache(RESOLVE_CACHE_FILE)
+
+# ===================== ARTIFACT CACHE =====================
+# Store locale indirizzato per contenuto (SHA-256) per JAR e plugin scaricati.
+# Un indice mappa chiavi tipo ('jar', 'paper', '1.21.8', 130) -> hash, così
+# un'installazione ripetuta diventa un reflink (o una copia se il file system
+# non lo consente) senza traffico di rete. Ogni server ha così un proprio file
+# scrivibile e una scrittura in place (cartella update/ di Bukkit, tool esterni)
+# non può corrompere il blob. Con MINEBOARD_ARTIFACT_HARDLINK=1 (solo POSIX) si
+# installano hardlink per risparmiare spazio: il numero di link del blob
+# (st_nlink - 1) è il numero di installazioni che lo usano e quei blob non
+# vengono rimossi. Gli altri vengono rimossi in ordine LRU oltre ARTIFACT_CACHE_MAX_BYTES.
+ARTIFACT_CACHE_DIR = os.path.join(os.getcwd(), 'cache', 'artifacts')
+ARTIFACT_CACHE_MAX_BYTES = int(float(os.environ.get('MINEBOARD_ARTIFACT_CACHE_MB', '2048')) * 1024 * 1024)
+# Chiavi senza build (es. 'purpur 1.21.8' da MCUtils) puntano a contenuti che
+# cambiano nel tempo: vengono riutilizzate solo per questo numero di secondi
+ARTIFACT_UNPINNED_TTL = float(os.environ.get('MINEBOARD_ARTIFACT_TTL', '86400'))
+ARTIFACT_INDEX_FILE = 'index.json'
+ARTIFACT_INCOMING_MAX_AGE = 86400.0  # .part abbandonati più vecchi di così vengono rimossi
+_FICLONE = 0x40049409  # ioctl Linux per reflink (btrfs, xfs)
+ARTIFACT_HARDLINK = os.environ.get('MINEBOARD_ARTIFACT_HARDLINK', '0') == '1' and os.name == 'posix'
+ARTIFACT_GC_GRACE = 600.0  # blob appena cercati/usati: gc non li tocca (lookup -> install)
+
+class ArtifactCache:
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.RLock()
+        self.index = None  # {'keys': {chiave: {'sha256', 'stored_at', 'pinned'}}, 'blobs': {sha: {'size', 'last_used'}}}
+        self.fetch_locks = {}
+
+    @staticmethod
+    def key(*parts):
+        return '/'.join(str(p) for p in parts if p not in (None, ''))
+
+    def blob_path(self, sha):
+        return os.path.join(self.directory, sha[:2], sha)
+
+    def _load(self):
+        if self.index is not None:
+            return
+        self.index = {'keys': {}, 'blobs': {}}
+        try:
+            with open(os.path.join(self.directory, ARTIFACT_INDEX_FILE), 'r') as f:
+                data = json.load(f)
+            self.index['keys'].update(data.get('keys') or {})
+            self.index['blobs'].update(data.get('blobs') or {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Indice cache artefatti non leggibile, ricostruito: {e}")
+
+    def _save(self):
+        write_json_atomic(os.path.join(self.directory, ARTIFACT_INDEX_FILE), self.index)
+
+    def lookup(self, key):
+        """Hash del blob per key, se presente, integro nelle dimensioni e non scaduto."""
+        if not key:
+            return None
+        with self.lock:
+            self._load()
+            entry = self.index['keys'].get(key)
+            if not entry:
+                return None
+            sha = entry['sha256']
+            blob = self.index['blobs'].get(sha)
+            expired = not entry.get('pinned') and time.time() - entry.get('stored_at', 0) > ARTIFACT_UNPINNED_TTL
+            try:
+                st = os.stat(self.blob_path(sha))
+            except OSError:
+                st = None
+            if expired or st is None or blob is None or st.st_size != blob['size']:
+                del self.index['keys'][key]
+                self._save()
+                return None
+            blob['last_used'] = time.time()
+            return sha
+
+    def has_blob(self, sha, size=None):
+        """True se il blob sha è nello store (e, se indicata, ha dimensione size)."""
+        with self.lock:
+            self._load()
+            blob = self.index['blobs'].get(sha)
+        try:
+            st = os.stat(self.blob_path(sha))
+        except OSError:
+            return False
+        return blob is not None and st.st_size == blob['size'] and (size is None or st.st_size == size)
+
+    def incoming_path(self, url):
+        """.part stabile per url: un download interrotto riprende al tentativo successivo."""
+        return os.path.join(self.directory, 'incoming', hashlib.sha1(url.encode('utf-8')).hexdigest() + '.part')
+
+    def fetch(self, url, key=None, expected_sha256=None, progress=None, kind='jar', max_rate=None):
+        """Scarica url nello store con fetch_to_file e ritorna (hash, info del download).
+
+        Una richiesta senza max_rate (interattiva) che trova lo stesso url in
+        download con banda limitata (prefetch) toglie il limite e ne attende la fine.
+        """
+        part_path = self.incoming_path(url)
+        with self.lock:
+            # La voce sparisce con l'ultima richiesta in corso
+            slot = self.fetch_locks.setdefault(part_path, {'lock': threading.Lock(), 'users': 0,
+                                                           'unthrottle': threading.Event()})
+            slot['users'] += 1
+            if not max_rate:
+                slot['unthrottle'].set()
+        try:
+            with slot['lock']:
+                # Un altro job può averlo appena scaricato
+                sha = self.lookup(key)
+                if sha:
+                    return sha, {'url': url, 'sha256': sha, 'filename': (self.entry(key) or {}).get('filename')}
+                result = fetch_to_file(url, part_path, expected_sha256=expected_sha256, progress=progress, kind=kind,
+                                       max_rate=max_rate, unthrottle=slot['unthrottle'])
+                self.ingest(part_path, result['sha256'], key, pinned=bool(expected_sha256))
+                return result['sha256'], result
+        finally:
+            with self.lock:
+                slot['users'] -= 1
+                if not slot['users']:
+                    self.fetch_locks.pop(part_path, None)
+
+    def ingest(self, tmp_path, sha, key=None, pinned=False):
+        """Sposta un file già verificato nello store e lo associa a key."""
+        path = self.blob_path(sha)
+        with self.lock:
+            self._load()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                # In sola lettura solo se non condiviso via hardlink con i server
+                os.chmod(tmp_path, 0o644 if ARTIFACT_HARDLINK else 0o444)
+                os.replace(tmp_path, path)
+            now = time.time()
+            self.index['blobs'][sha] = {'size': os.path.getsize(path), 'last_used': now}
+            if key:
+                self.index['keys'][key] = {'sha256': sha, 'stored_at': now, 'pinned': pinned}
+            self._save()
+        self.gc()
+
+    def install(self, sha, dest_path):
+        """Installa il blob in dest_path in modo atomico: reflink, poi copia (hardlink se ARTIFACT_HARDLINK).
+
+        Il file installato è sempre scrivibile. Il blob viene aperto (o
+        collegato) sotto lock, così gc non può rimuoverlo a metà.
+        """
+        src = self.blob_path(sha)
+        dest_dir = os.path.dirname(dest_path)
+        os.makedirs(dest_dir, exist_ok=True)
+        tmp_path = os.path.join(dest_dir, f'.{os.path.basename(dest_path)}.{os.getpid()}.{threading.get_ident()}.link')
+        method, fsrc = None, None
+        try:
+            with self.lock:
+                if ARTIFACT_HARDLINK:
+                    try:
+                        os.chmod(src, 0o644)  # blob creato con hardlink disattivati
+                        os.link(src, tmp_path)
+                        method = 'hardlink'
+                    except OSError:
+                        pass
+                if method is None:
+                    # Il file aperto resta leggibile anche se rimosso dallo store
+                    fsrc = open(src, 'rb')
+            if method is None:
+                with fsrc, open(tmp_path, 'wb') as fdst:
+                    method = 'reflink'
+                    try:
+                        import fcntl
+                        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                    except (OSError, ImportError):
+                        method = 'copy'
+                        fdst.seek(0)
+                        fdst.truncate()
+                        fsrc.seek(0)
+                        shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+                os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, dest_path)
+        finally:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+        with self.lock:
+            self._load()
+            blob = self.index['blobs'].get(sha)
+            if blob:
+                blob['last_used'] = time.time()
+                self._save()
+        return method
+
+    def annotate(self, key, **fields):
+        """Aggiunge metadati (es. filename originale) alla voce key dell'indice."""
+        with self.lock:
+            self._load()
+            entry = self.index['keys'].get(key)
+            if entry is not None:
+                entry.update(fields)
+                self._save()
+
+    def entry(self, key):
+        with self.lock:
+            self._load()
+            entry = self.index['keys'].get(key)
+            return dict(entry) if entry else None
+
+    def verify(self, sha):
+        h = hashlib.sha256()
+        with open(self.blob_path(sha), 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        return h.hexdigest() == sha
+
+    def stats(self, verify=False):
+        with self.lock:
+            self._load()
+            blobs = dict(self.index['blobs'])
+            keys = dict(self.index['keys'])
+        items = []
+        for sha, blob in blobs.items():
+            try:
+                refs = os.stat(self.blob_path(sha)).st_nlink - 1
+            except OSError:
+                continue
+            item = {'sha256': sha, 'size': blob['size'], 'last_used': blob['last_used'], 'references': refs,
+                    'keys': sorted(k for k, e in keys.items() if e['sha256'] == sha)}
+            if verify:
+                item['valid'] = self.verify(sha)
+            items.append(item)
+        items.sort(key=lambda i: i['last_used'], reverse=True)
+        return {
+            'blobs': items,
+            'total_bytes': sum(i['size'] for i in items),
+            'unreferenced_bytes': sum(i['size'] for i in items if i['references'] == 0),
+            'max_bytes': ARTIFACT_CACHE_MAX_BYTES,
+        }
+
+    def gc(self):
+        """Rimuove i blob non referenziati meno usati finché lo spazio solo-cache supera il limite.
+
+        I blob con hardlink nei server non liberano spazio se rimossi, quindi non
+        contano; quelli usati negli ultimi ARTIFACT_GC_GRACE secondi non vengono toccati.
+        """
+        with self.lock:
+            self._load()
+            unreferenced = []
+            for sha, blob in list(self.index['blobs'].items()):
+                try:
+                    st = os.stat(self.blob_path(sha))
+                except OSError:
+                    del self.index['blobs'][sha]
+                    continue
+                if st.st_nlink <= 1 and time.time() - blob['last_used'] > ARTIFACT_GC_GRACE:
+                    unreferenced.append((blob['last_used'], sha, st.st_size))
+            used = sum(size for _, _, size in unreferenced)
+            removed = []
+            for _, sha, size in sorted(unreferenced):
+                if used <= ARTIFACT_CACHE_MAX_BYTES:
+                    break
+                try:
+                    os.chmod(self.blob_path(sha), 0o644)  # su Windows i file in sola lettura non si rimuovono
+                    os.remove(self.blob_path(sha))
+                except OSError:
+                    continue
+                used -= size
+                removed.append(sha)
+                self.index['blobs'].pop(sha, None)
+            if removed:
+                doomed = set(removed)
+                self.index['keys'] = {k: e for k, e in self.index['keys'].items() if e['sha256'] not in doomed}
+                self._save()
+        incoming = os.path.join(self.directory, 'incoming')
+        try:
+            with os.scandir(incoming) as it:
+                for entry in it:
+                    try:
+                        if time.time() - entry.stat().st_mtime > ARTIFACT_INCOMING_MAX_AGE:
+                            os.remove(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return removed
+
+artifact_cache = ArtifactCache(ARTIFACT_CACHE_DIR)
+
+def detach_hardlink(path):
+    """Prima di riscrivere un file in place: se è un hardlink condiviso (cache artefatti)
+    lo scollega, così la scrittura crea un nuovo inode invece di modificare il blob."""
+    try:
+        if os.path.isfile(path) and os.stat(path).st_nlink > 1:
+            try:
+                os.remove(path)
+            except PermissionError:
+                # Hardlink in sola lettura installati dalle versioni precedenti (Windows)
+                os.chmod(path, 0o644)
+                os.remove(path)
+    except OSError:
+        pass
+
+def _fetch_paper_build(version):
+    """Interroga l'API PaperMC; None se la versione non ha build, eccezione se l'API non risponde."""
+    r = http_get(f'https://api.papermc.io/v2/projects/paper/versions/{version}/builds', timeout=10)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    builds = r.json().get('builds') or []
+    stable = [b for b in builds if b.get('channel', 'default') == 'default'] or builds
+    if not stable:
+        return None
+    b = stable[-1]
+    app_dl = (b.get('downloads') or {}).get('application') or {}
+    name = app_dl.get('name') or f"paper-{version}-{b['build']}.jar"
+    return {
+        'build': b['build'],
+        'url': f"https://api.papermc.io/v2/projects/paper/versions/{version}/builds/{b['build']}/downloads/{name}",
+        'sha256': app_dl.get('sha256'),
+    }
+
+def resolve_paper_build(version):
+    """Ultimo build stabile Paper per version (via resolution_cache): {'build', 'url', 'sha256'} o None."""
+    try:
+        entry = resolution_cache.resolve(resolution_cache.key('paper-build', version),
+                                         lambda: _fetch_paper_build(version))
+        return entry['value']
+    except Exception as e:
+        print(f"Errore risoluzione build Paper {version}: {e}")
+        return None
+
+# ===================== BACKGROUND JOBS =====================
+# Operazioni lunghe (installazione JAR, ...) eseguite in un thread: la route
+# risponde subito con job_id e il browser fa polling su /api/jobs/<id>.
+JOBS_RETENTION = 3600.0  # secondi per cui un job terminato resta interrogabile
+JOB_PROGRESS_INTERVAL = 0.5
+
+jobs_lock = threading.Lock()
+jobs = {}
+
+def create_job(kind, owner, **info):
+    import uuid
+    now = time.time()
+    job = {
+        'id': uuid.uuid4().hex,
+        'kind': kind,
+        'owner': owner,
+        'status': 'queued',  # queued | running | completed | failed
+        'phase': None,
+        'bytes_done': 0,
+        'bytes_total': None,
+        'message': None,
+        'result': None,
+        'created_at': now,
+        'updated_at': now,
+        'finished_at': None,
+    }
+    job.update(info)
+    with jobs_lock:
+        for job_id in [k for k, j in jobs.items() if j['finished_at'] and now - j['finished_at'] > JOBS_RETENTION]:
+            del jobs[job_id]
+        jobs[job['id']] = job
+    return dict(job)
+
+def update_job(job_id, **fields):
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        job['updated_at'] = time.time()
+        if fields.get('status') in ('completed', 'failed'):
+            job['finished_at'] = job['updated_at']
+
+def get_job(job_id):
+    with jobs_lock:
+        job = jobs.get(job_id)
+        return dict(job) if job else None
+
+def run_job(job, target, *args):
+    """Esegue target(job_id, *args) in un thread; un'eccezione chiude il job come failed."""
+    def runner():
+        update_job(job['id'], status='running')
+        try:
+            result = target(job['id'], *args)
+            update_job(job['id'], status='completed', result=result)
+        except Exception as e:
+            print(f"Errore job {job['kind']} {job['id']}: {e}")
+            update_job(job['id'], status='failed', message=str(e))
+    threading.Thread(target=runner, daemon=True, name=f"job-{job['kind']}-{job['id'][:8]}").start()
+
+def download_jar_to_server(server_name, jar_url, jar_filename="server.jar", progress=None,
+                           cache_key=None, expected_sha256=None):
+    """Scarica un JAR nella directory del server passando dalla cache artefatti.
+
+    Il file viene scaricato nello store con fetch_to_file (segmenti paralleli,
+    ripresa da .part, verifica dimensione e expected_sha256 se noto) e poi
+    collegato in servers/<nome>/ con un rename atomico, così un server non vede
+    mai un JAR troncato. jar_url può anche redirigere: l'URL finale lo scopre
+    la richiesta di prova di fetch_to_file. `progress(scaricati, totale)` viene
+    chiamata durante il download.
+    """
     try:
         server_path = os.path.join(SERVER_DIR, server_name)
         os.makedirs(server_path, exist_ok=True)
         
         jar_path = os.path.join(server_path, jar_filename)
         
-        print(f"Scaricamento JAR da: {jar_url}")
-        response = requests.get(jar_url, timeout=60, stream=True)
-        
-        if response.status_code == 200:
-            with open(jar_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            print(f"JAR scaricato con successo: {jar_path}")
-            return True, f"JAR scaricato con successo: {jar_filename}"
-        else:
-            return False, f"Errore nel download: HTTP {response.status_code}"
-            
+        sha = artifact_cache.lookup(cache_key)
+        if not sha:
+            if not jar_url:
+                return False, "Artefatto non più presente in cache, riprova"
+            print(f"Scaricamento JAR da: {jar_url}")
+            sha, _ = artifact_cache.fetch(jar_url, cache_key, expected_sha256, progress, kind='jar')
+        method = artifact_cache.install(sha, jar_path)
+
+        print(f"JAR installato ({method}): {jar_path}")
+        return True, f"JAR scaricato con successo: {jar_filename}"
+    except DownloadError as e:
+        return False, f"Errore nel download del JAR: {str(e)}"
     except Exception as e:
         return False, f"Errore nel download del JAR: {str(e)}"
 
+def plan_jar_install(jar_type, version, source=''):
+    """Dove prendere il JAR jar_type/version: {'cache_key', 'cached', 'url', 'sha256', 'build'}.
+
+    Paper espone build e SHA-256 (chiave stabile e verifica d'integrità); per
+    gli altri tipi l'URL viene risolto solo se l'artefatto non è già in cache.
+    """
+    paper = resolve_paper_build(version) if jar_type == 'paper' and source != 'mcutils' else None
+    if paper:
+        plan = {'cache_key': artifact_cache.key('jar', 'paper', version, paper['build']),
+                'url': paper['url'], 'sha256': paper['sha256'], 'build': paper['build']}
+    else:
+        plan = {'cache_key': artifact_cache.key('jar', jar_type, version, source),
+                'url': None, 'sha256': None, 'build': None}
+    plan['cached'] = bool(artifact_cache.lookup(plan['cache_key']))
+    if not plan['cached'] and not paper:
+        plan['url'] = resolve_jar_url(jar_type, version, source)
+    return plan
+
+def install_jar_job(job_id, server_name, jar_type, version, jar_filename, source):
+    """Job: risolve jar_type/version e lo installa in servers/<nome>/ (dalla cache se possibile)."""
+    if version.lower() == 'latest':
+        version = resolve_latest_version(jar_type)
+    update_job(job_id, phase='resolving', version=version)
+    plan = plan_jar_install(jar_type, version, source)
+    if plan['cached']:
+        update_job(job_id, phase='cached', build=plan['build'])
+    else:
+        update_job(job_id, phase='downloading', url=plan['url'], build=plan['build'])
+    last = [0.0]
+
+    def progress(done, total):
+        now = time.monotonic()
+        if now - last[0] >= JOB_PROGRESS_INTERVAL or (total and done >= total):
+            last[0] = now
+            update_job(job_id, bytes_done=done, bytes_total=total)
+
+    ok, message = download_jar_to_server(server_name, plan['url'], jar_filename, progress=progress,
+                                         cache_key=plan['cache_key'], expected_sha256=plan['sha256'])
+    if not ok:
+        # L'URL risolto potrebbe non essere più valido: il prossimo tentativo lo riverifica
+        if plan['url'] and not plan['build']:
+            resolution_cache.invalidate(jar_resolution_key(jar_type, version, source))
+        raise RuntimeError(message)
+    # Le cartelle temporanee della creazione guidata non hanno ancora una config:
+    # tipo/versione restano accanto al JAR e move-jar li porta nel server finale
+    if not server_config_store.exists(server_name):
+        write_json_atomic(os.path.join(SERVER_DIR, server_name, JAR_WIZARD_INFO_FILE),
+                          {'jar_file': jar_filename, 'jar_type': jar_type, 'jar_version': version,
+                           'jar_build': plan['build']})
+    else:
+        def apply(cfg):
+            # Tipo/versione descrivono il JAR avviato, non altri JAR scaricati accanto
+            if cfg.get('jar_file') == jar_filename:
+                cfg['jar_type'] = jar_type
+                cfg['jar_version'] = version
+                if plan['build']:
+                    cfg['jar_build'] = plan['build']
+                else:
+                    cfg.pop('jar_build', None)
+        server_config_store.update(server_name, apply)
+        try:
+            send_discord_webhook(server_name, 'jar_updated', f"Eseguibile del server aggiornato: {jar_filename} ({jar_type} {version})")
+        except Exception as e:
+            print(f"Errore webhook jar_updated: {e}")
+    update_job(job_id, phase='done')
+    return {'jar_file': jar_filename, 'jar_type': jar_type, 'jar_version': version, 'jar_build': plan['build']}
+
+# Tipo/versione del JAR di un server: registrati da install_jar_job o, per i
+# server creati prima (o con JAR caricati a mano), ricavati dal JAR stesso
+# (versions.list di paperclip, version.json vanilla, manifest Velocity,
+# install.properties Fabric) o dal nome file, e salvati nella config.
+JAR_WIZARD_INFO_FILE = '.mineboard_jar.json'  # tipo/versione nella cartella temporanea della creazione guidata
+JAR_FILENAME_RE = re.compile(r'^([a-z]+)-(\d+\.\d+(?:\.\d+)?(?:-(?:pre|rc)\d+)?|\d+\.\d+\.\d+-SNAPSHOT)(?:-b?(\d+))?\.jar$', re.IGNORECASE)
+JAR_PAPERCLIP_RE = re.compile(r'\b(paper|purpur|folia|pufferfish)-(\d+\.\d+(?:\.\d+)?)', re.IGNORECASE)
+
+def infer_jar_info(jar_path):
+    """{'jar_type', 'jar_version'} ricavati dal JAR in jar_path, o None se non riconoscibile."""
+    try:
+        with zipfile.ZipFile(jar_path) as zf:
+            names = set(zf.namelist())
+            fork = False
+            if 'META-INF/versions.list' in names:
+                listed = zf.read('META-INF/versions.list').decode('utf-8', 'replace')
+                m = JAR_PAPERCLIP_RE.search(listed)
+                if m:
+                    return {'jar_type': m.group(1).lower(), 'jar_version': m.group(2)}
+                # Il bundler vanilla elenca server-<versione>.jar; altri fork (Spigot) no
+                fork = 'server-' not in listed
+            if 'META-INF/MANIFEST.MF' in names:
+                manifest = dict(line.split(': ', 1) for line in
+                                zf.read('META-INF/MANIFEST.MF').decode('utf-8', 'replace').splitlines() if ': ' in line)
+                if manifest.get('Implementation-Title', '').strip().lower() == 'velocity':
+                    version = manifest.get('Implementation-Version', '').split(' ')[0].strip()
+                    if version:
+                        return {'jar_type': 'velocity', 'jar_version': version}
+            if 'install.properties' in names:
+                props = dict(line.split('=', 1) for line in
+                             zf.read('install.properties').decode('utf-8', 'replace').splitlines() if '=' in line)
+                if props.get('game-version'):
+                    return {'jar_type': 'fabric', 'jar_version': props['game-version'].strip()}
+            if 'version.json' in names and not fork:
+                version = (json.loads(zf.read('version.json')) or {}).get('id')
+                if version:
+                    return {'jar_type': 'vanilla', 'jar_version': str(version)}
+    except (OSError, zipfile.BadZipFile, ValueError, KeyError):
+        pass
+    m = JAR_FILENAME_RE.match(os.path.basename(jar_path))
+    if m and versions_catalog.versions(m.group(1).lower()):
+        return {'jar_type': m.group(1).lower(), 'jar_version': m.group(2)}
+    return None
+
+def server_jar_info(server_name, cfg=None):
+    """Config del server con jar_type/jar_version, ricavandoli (e salvandoli) se mancano.
+
+    Ritorna la config; jar_type resta assente se il JAR non è riconoscibile.
+    """
+    cfg = cfg if cfg is not None else server_config_store.get(server_name, revalidate=False)
+    if cfg.get('jar_type') and cfg.get('jar_version'):
+        return cfg
+    jar_path = os.path.join(SERVER_DIR, server_name, cfg.get('jar_file') or 'server.jar')
+    try:
+        st = os.stat(jar_path)
+    except OSError:
+        return cfg
+    stamp = [st.st_mtime_ns, st.st_size]
+    if cfg.get('jar_inferred_from') == stamp:
+        return cfg  # già provato su questo JAR senza risultato
+    info = infer_jar_info(jar_path) or {}
+
+    def apply(c):
+        c.update(info)
+        c['jar_inferred_from'] = stamp
+    try:
+        return server_config_store.update(server_name, apply)
+    except Exception as e:
+        print(f"Impossibile salvare tipo JAR ricavato per {server_name}: {e}")
+        return dict(cfg, **info)
+
+# ===================== JAR PREFETCH =====================
+# Opzionale (MINEBOARD_PREFETCH=1): nelle ore di bassa attività scarica nella
+# cache artefatti l'ultimo build dei tipi/versioni usati dai server (e l'ultima
+# versione stabile di ciascun tipo), con banda limitata; un'installazione
+# interattiva dello stesso file toglie il limite invece di restare in coda. Il
+# controllo aggiornamenti e l'installazione diventano così operazioni locali.
+PREFETCH_ENABLED = os.environ.get('MINEBOARD_PREFETCH', '').strip().lower() in ('1', 'true', 'yes')
+PREFETCH_HOURS = os.environ.get('MINEBOARD_PREFETCH_HOURS', '2-6')  # ora locale, inizio-fine
+PREFETCH_MAX_RATE = float(os.environ.get('MINEBOARD_PREFETCH_KBPS', '4096')) * 1024
+PREFETCH_INTERVAL = float(os.environ.get('MINEBOARD_PREFETCH_INTERVAL', '3600'))
+PREFETCH_CHECK_INTERVAL = 300.0
+
+prefetch_lock = threading.Lock()
+prefetch_state = {
+    'running': False,
+    'last_run': None,
+    'targets': {},  # 'tipo/versione' -> {'status', 'build', 'message', 'checked_at'}
+}
+
+def parse_hours_window(spec):
+    """'2-6' -> (2, 6); finestra non valida -> (2, 6). '22-4' attraversa la mezzanotte."""
+    try:
+        start, end = (int(p) % 24 for p in str(spec).split('-', 1))
+        return start, end
+    except (ValueError, TypeError):
+        return 2, 6
+
+def in_prefetch_window(now=None):
+    start, end = parse_hours_window(PREFETCH_HOURS)
+    hour = (now or datetime.now()).hour
+    if start == end:
+        return True
+    if start < end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+def prefetch_targets():
+    """(tipo, versione) dei server (anche ricavati dal JAR, vedi server_jar_info) più l'ultima versione
+    stabile del catalogo per tipo."""
+    targets = set()
+    for name in server_registry.names():
+        try:
+            cfg = server_jar_info(name) or {}
+        except Exception:
+            continue
+        jar_type = (cfg.get('jar_type') or '').strip().lower()
+        version = (cfg.get('jar_version') or '').strip()
+        if not jar_type or not version:
+            continue
+        targets.add((jar_type, version))
+        latest = versions_catalog.latest(jar_type)
+        if latest:
+            targets.add((jar_type, latest))
+    return sorted(targets)
+
+def prefetch_jar(jar_type, version):
+    """Porta in cache l'ultimo build di jar_type/version; ritorna il piano di installazione."""
+    plan = plan_jar_install(jar_type, version)
+    if not plan['cached']:
+        print(f"[PREFETCH] Scarico {jar_type} {version}" + (f" build {plan['build']}" if plan['build'] else ''))
+        artifact_cache.fetch(plan['url'], plan['cache_key'], plan['sha256'], kind='jar', max_rate=PREFETCH_MAX_RATE)
+    return plan
+
+def run_prefetch(ignore_window=False):
+    """Un giro di prefetch; si interrompe se la finestra oraria finisce a metà."""
+    with prefetch_lock:
+        if prefetch_state['running']:
+            return False
+        prefetch_state['running'] = True
+    try:
+        for jar_type, version in prefetch_targets():
+            if not ignore_window and not in_prefetch_window():
+                break
+            record = {'checked_at': datetime.now(timezone.utc).isoformat()}
+            try:
+                plan = prefetch_jar(jar_type, version)
+                record.update(status='cached' if plan['cached'] else 'downloaded', build=plan['build'])
+            except Exception as e:
+                record.update(status='error', message=str(e))
+                print(f"[PREFETCH] Errore {jar_type} {version}: {e}")
+            with prefetch_lock:
+                prefetch_state['targets'][f'{jar_type}/{version}'] = record
+        with prefetch_lock:
+            prefetch_state['last_run'] = time.time()
+        return True
+    finally:
+        with prefetch_lock:
+            prefetch_state['running'] = False
+
+def background_jar_prefetcher():
+    while True:
+        try:
+            last = prefetch_state['last_run']
+            if in_prefetch_window() and (last is None or time.time() - last >= PREFETCH_INTERVAL):
+                run_prefetch()
+        except Exception as e:
+            print(f"Errore prefetch JAR: {e}")
+        time.sleep(PREFETCH_CHECK_INTERVAL)
+
+def local_jar_update_info(cfg):
+    """Confronta il JAR di un server con catalogo e cache locali, senza richieste upstream."""
+    jar_type = (cfg.get('jar_type') or '').strip().lower()
+    version = (cfg.get('jar_version') or '').strip()
+    build = cfg.get('jar_build')
+    info = {'jar_type': jar_type or None, 'current_version': version or None, 'current_build': build,
+            'latest_version': None, 'latest_build': None, 'update_available': False, 'cached': False}
+    if not jar_type or not version:
+        return info
+    latest = versions_catalog.latest(jar_type) or version
+    if version_sort_key(latest) < version_sort_key(version):
+        latest = version
+    info['latest_version'] = latest
+    if jar_type == 'paper':
+        entry, _ = resolution_cache.lookup(resolution_cache.key('paper-build', latest))
+        paper = entry['value'] if entry and not entry.get('missing') else None
+        if paper:
+            info['latest_build'] = paper['build']
+            info['cached'] = bool(artifact_cache.lookup(artifact_cache.key('jar', 'paper', latest, paper['build'])))
+    else:
+        info['cached'] = bool(artifact_cache.lookup(artifact_cache.key('jar', jar_type, latest)))
+    if latest != version:
+        info['update_available'] = True
+    elif build and info['latest_build']:
+        info['update_available'] = int(info['latest_build']) > int(build)
+    return info
+
+@app.route('/api/servers/<server_name>/jar-update')
+def get_server_jar_update(server_name):
+    """Aggiornamento JAR disponibile per il server (dati locali: catalogo, cache risoluzioni e artefatti)."""
+    if not server_config_store.exists(server_name):
+        return jsonify({'success': False, 'message': 'Server non trovato'}), 404
+    try:
+        cfg = server_jar_info(server_name, server_config_store.get(server_name))
+        return jsonify({'success': True, **local_jar_update_info(cfg)})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
+
+@app.route('/api/system/prefetch', methods=['GET', 'POST'])
+def system_prefetch():
+    """Stato del prefetch JAR (GET) o avvio immediato ignorando la finestra oraria (POST). Solo admin."""
+    if not is_admin_user():
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    if request.method == 'POST':
+        if prefetch_state['running']:
+            return jsonify({'success': False, 'message': 'Prefetch già in corso'}), 409
+        threading.Thread(target=run_prefetch, kwargs={'ignore_window': True}, daemon=True, name='jar-prefetch').start()
+        return jsonify({'success': True, 'message': 'Prefetch avviato'}), 202
+    with prefetch_lock:
+        state = {
+            'running': prefetch_state['running'],
+            'last_run': datetime.fromtimestamp(prefetch_state['last_run'], timezone.utc).isoformat() if prefetch_state['last_run'] else None,
+            'targets': {k: dict(v) for k, v in prefetch_state['targets'].items()},
+        }
+    return jsonify({'success': True, 'enabled': PREFETCH_ENABLED, 'hours': PREFETCH_HOURS,
+                    'max_kbps': PREFETCH_MAX_RATE / 1024, **state})
+
+# ===================== FLEET UPGRADE =====================
+# Aggiornamento a rotazione del JAR di più server: l'artefatto viene scaricato
+# una volta sola nella cache, poi per ogni server (a gruppi di batch_size):
+# JAR nuovo preparato accanto a quello attuale, stop, scambio atomico,
+# avvio e attesa del "Done (" nel log. Se un server non diventa pronto il JAR
+# precedente viene ripristinato e l'operazione si ferma.
+FLEET_READY_TIMEOUT = float(os.environ.get('MINEBOARD_FLEET_READY_TIMEOUT', '180'))
+FLEET_READY_MARKER = 'Done ('
+FLEET_READY_POLL = 1.0
+
+fleet_lock = threading.Lock()
+fleet_busy = set()  # server coinvolti in un aggiornamento in corso
+
+def select_fleet_servers(jar_type, from_version=None, names=None):
+    """Server con jar_type (ed eventualmente from_version), limitati a names se indicato.
+
+    Ritorna (selezionati, {nome: motivo} degli esclusi). Tipo e versione
+    mancanti vengono ricavati dal JAR (server_jar_info); i server di tipo
+    ancora sconosciuto finiscono tra gli esclusi invece di sparire in silenzio.
+    """
+    selected, excluded = [], {}
+    known = server_registry.names()
+    for name in names or []:
+        if name not in known:
+            excluded[name] = 'server non trovato'
+    for name in known:
+        if names and name not in names:
+            continue
+        try:
+            cfg = server_jar_info(name)
+        except Exception as e:
+            excluded[name] = f'configurazione non leggibile: {e}'
+            continue
+        current_type = (cfg.get('jar_type') or '').strip().lower()
+        if not current_type:
+            excluded[name] = 'tipo JAR sconosciuto'
+            continue
+        if current_type != jar_type:
+            if names:
+                excluded[name] = f'tipo JAR {current_type}'
+            continue
+        if from_version and (cfg.get('jar_version') or '').strip() != from_version:
+            if names:
+                excluded[name] = f"versione {cfg.get('jar_version') or 'sconosciuta'}"
+            continue
+        selected.append(name)
+    return selected, excluded
+
+def wait_server_ready(server, log_offset, timeout):
+    """Attende FLEET_READY_MARKER nel log dopo log_offset; (pronto, messaggio)."""
+    deadline = time.monotonic() + timeout
+    tail = ''
+    while time.monotonic() < deadline:
+        if server.status != 'running':
+            return False, 'Il server si è arrestato durante l\'avvio'
+        try:
+            with open(server.log_file, 'r', encoding='utf-8', errors='replace') as f:
+                f.seek(log_offset)
+                chunk = f.read()
+                log_offset = f.tell()
+        except OSError:
+            chunk = ''
+        # Conserva la coda precedente: il marcatore può arrivare spezzato tra due letture
+        tail = tail[-len(FLEET_READY_MARKER):] + chunk
+        if FLEET_READY_MARKER in tail:
+            return True, 'Server pronto'
+        time.sleep(FLEET_READY_POLL)
+    return False, f'Server non pronto entro {int(timeout)}s'
+
+def start_server_and_wait(server_name, timeout):
+    cfg = server_config_store.get(server_name, strict=True)
+    server = build_minecraft_server(cfg)
+    try:
+        log_offset = os.path.getsize(server.log_file)
+    except OSError:
+        log_offset = 0
+    ok, message = server.start()
+    if not ok:
+        return False, message
+    try:
+        send_discord_webhook(server_name, 'server_started', f"Server '{server_name}' avviato")
+    except Exception as e:
+        print(f"Errore webhook start: {e}")
+    return wait_server_ready(server, log_offset, timeout)
+
+def upgrade_server_jar(server_name, sha, jar_type, version, build, timeout, report):
+    """Aggiorna un server al blob sha; ritorna True o False se è stato ripristinato il JAR precedente."""
+    cfg = server_config_store.get(server_name, strict=True)
+    jar_path = os.path.join(SERVER_DIR, server_name, cfg['jar_file'])
+    staged_path = jar_path + '.new'
+    backup_path = jar_path + '.bak'
+    report('staging')
+    artifact_cache.install(sha, staged_path)
+
+    server = running_servers.get(server_name)
+    was_running = server is not None
+    if was_running:
+        report('stopping')
+        ok, message = server.stop()
+        if not ok:
+            os.remove(staged_path)
+            report('failed', message)
+            return False
+
+    report('swapping')
+    had_jar = os.path.exists(jar_path)
+    if had_jar:
+        if os.path.lexists(backup_path):
+            os.remove(backup_path)
+        try:
+            os.link(jar_path, backup_path)
+        except OSError:
+            shutil.copy2(jar_path, backup_path)
+    os.replace(staged_path, jar_path)
+
+    if was_running:
+        report('starting')
+        ready, message = start_server_and_wait(server_name, timeout)
+        if not ready:
+            print(f"[FLEET] {server_name}: {message}, ripristino JAR precedente")
+            current = running_servers.get(server_name)
+            if current:
+                current.stop()
+            if had_jar:
+                os.replace(backup_path, jar_path)
+                restarted, _ = start_server_and_wait(server_name, timeout)
+                message += '; JAR precedente ripristinato' + ('' if restarted else ' (riavvio non riuscito)')
+            report('rolled_back', message)
+            return False
+
+    def apply(c):
+        c['jar_type'] = jar_type
+        c['jar_version'] = version
+        if build:
+            c['jar_build'] = build
+        else:
+            c.pop('jar_build', None)
+    server_config_store.update(server_name, apply)
+    if had_jar:
+        os.remove(backup_path)
+    try:
+        send_discord_webhook(server_name, 'jar_updated', f"Eseguibile del server aggiornato: {cfg['jar_file']} ({jar_type} {version})")
+    except Exception as e:
+        print(f"Errore webhook jar_updated: {e}")
+    report('upgraded', 'Riavviato e pronto' if was_running else 'Server fermo: JAR sostituito')
+    return True
+
+def fleet_upgrade_job(job_id, names, jar_type, version, source, batch_size, timeout):
+    """Job: scarica una volta jar_type/version e aggiorna names a gruppi, fermandosi al primo fallimento."""
+    try:
+        if version.lower() == 'latest':
+            version = resolve_latest_version(jar_type)
+        servers = {name: {'status': 'pending', 'message': None} for name in names}
+        states_lock = threading.Lock()
+
+        def reporter(name):
+            def report(status, message=None):
+                with states_lock:
+                    servers[name] = {'status': status, 'message': message}
+                    snapshot = {k: dict(v) for k, v in servers.items()}
+                update_job(job_id, servers=snapshot)
+            return report
+
+        update_job(job_id, phase='resolving', version=version)
+        plan = plan_jar_install(jar_type, version, source)
+        sha = artifact_cache.lookup(plan['cache_key'])
+        if not sha:
+            update_job(job_id, phase='downloading', url=plan['url'], build=plan['build'])
+            last = [0.0]
+
+            def progress(done, total):
+                now = time.monotonic()
+                if now - last[0] >= JOB_PROGRESS_INTERVAL or (total and done >= total):
+                    last[0] = now
+                    update_job(job_id, bytes_done=done, bytes_total=total)
+            sha, _ = artifact_cache.fetch(plan['url'], plan['cache_key'], plan['sha256'], progress, kind='jar')
+
+        update_job(job_id, phase='upgrading', build=plan['build'])
+        halted = None
+        for i in range(0, len(names), batch_size):
+            batch = names[i:i + batch_size]
+            outcome = {}
+
+            def worker(name):
+                try:
+                    outcome[name] = upgrade_server_jar(name, sha, jar_type, version, plan['build'], timeout, reporter(name))
+                except Exception as e:
+                    reporter(name)('failed', str(e))
+                    outcome[name] = False
+            threads = [threading.Thread(target=worker, args=(n,), daemon=True, name=f'fleet-{n}') for n in batch]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            failed = [n for n in batch if not outcome.get(n)]
+            if failed:
+                halted = failed[0]
+                for name in names[i + batch_size:]:
+                    reporter(name)('skipped', f'Interrotto dopo il fallimento di {halted}')
+                break
+        update_job(job_id, phase='done')
+        if halted:
+            raise RuntimeError(f"Aggiornamento interrotto: {halted} non è ripartito correttamente")
+        return {'jar_type': jar_type, 'version': version, 'build': plan['build'], 'upgraded': names}
+    finally:
+        with fleet_lock:
+            fleet_busy.difference_update(names)
+
+@app.route('/api/fleet/upgrade', methods=['POST'])
+def fleet_upgrade():
+    """Avvia l'aggiornamento a rotazione del JAR dei server selezionati; risponde con il job da interrogare.
+
+    JSON: type (obbligatorio), version (default latest), from_version, servers
+    (lista di nomi), batch_size (default 1), ready_timeout (secondi), source.
+    """
+    if not has_permission('servers_control') or not has_permission('files_access'):
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    data = request.get_json(silent=True) or {}
+    jar_type = (data.get('type') or '').strip().lower()
+    version = (data.get('version') or 'latest').strip()
+    from_version = (data.get('from_version') or '').strip() or None
+    source = (data.get('source') or '').strip().lower()
+    names = data.get('servers') or None
+    try:
+        batch_size = max(1, int(data.get('batch_size') or 1))
+        timeout = max(10.0, float(data.get('ready_timeout') or FLEET_READY_TIMEOUT))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'batch_size o ready_timeout non validi'}), 400
+    if not jar_type:
+        return jsonify({'success': False, 'message': 'Tipo richiesto'}), 400
+    if names is not None and not isinstance(names, list):
+        return jsonify({'success': False, 'message': 'servers deve essere una lista'}), 400
+    if names is not None and not all(isinstance(n, str) for n in names):
+        return jsonify({'success': False, 'message': 'servers deve contenere nomi di server'}), 400
+    selected, excluded = select_fleet_servers(jar_type, from_version, set(names) if names else None)
+    if names and excluded:
+        # Selezione esplicita: ogni server indicato deve poter essere aggiornato
+        details = '; '.join(f'{n}: {reason}' for n, reason in sorted(excluded.items()))
+        return jsonify({'success': False, 'message': f'Server non aggiornabili: {details}', 'excluded': excluded}), 400
+    if not selected:
+        return jsonify({'success': False, 'message': 'Nessun server corrisponde alla selezione', 'excluded': excluded}), 404
+    with fleet_lock:
+        busy = fleet_busy.intersection(selected)
+        if busy:
+            return jsonify({'success': False, 'message': f"Aggiornamento già in corso per: {', '.join(sorted(busy))}"}), 409
+        fleet_busy.update(selected)
+    job = create_job('fleet-upgrade', session.get('user'), jar_type=jar_type, version=version,
+                     batch_size=batch_size, servers={n: {'status': 'pending', 'message': None} for n in selected},
+                     excluded=excluded)
+    run_job(job, fleet_upgrade_job, selected, jar_type, version, source, batch_size, timeout)
+    # excluded: server di tipo sconosciuto, da sistemare a mano (tipo/versione nella config)
+    return jsonify({'success': True, 'job_id': job['id'], 'job': job, 'excluded': excluded}), 202
+
 # ===================== AUTO-UPDATE (APP) – MIRROR MODE =====================
 def github_main_zip_url():
     return 'https://github.com/Scalamobile/mineboard/archive/refs/heads/main.zip'
@@ -680,14 +2645,11 @@ def system_auto_update():
     try:
         zip_url = github_main_zip_url()
         print(f"[UPDATE] Scarico pacchetto da: {zip_url}")
-        with requests.get(zip_url, stream=True, timeout=120) as r:
-            if r.status_code != 200:
-                return jsonify({'success': False, 'message': f'Download fallito: HTTP {r.status_code}'}), 502
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmpf:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        tmpf.write(chunk)
-                tmp_zip = tmpf.name
+        tmp_zip = os.path.join(tempfile.gettempdir(), 'mineboard-update.zip.part')
+        try:
+            fetch_to_file(zip_url, tmp_zip, kind='update')
+        except DownloadError as e:
+            return jsonify({'success': False, 'message': f'Download fallito: {str(e)}'}), 502
         with tempfile.TemporaryDirectory() as tmpdir:
             with zipfile.ZipFile(tmp_zip, 'r') as z:
                 z.extractall(tmpdir)
@@ -699,7 +2661,7 @@ def system_auto_update():
             if not os.path.isdir(repo_root):
                 repo_root = tmpdir
             project_root = os.getcwd()
-            preserve_dirs = {'backups', 'logs', 'versions', 'servers', 'uploads', '.git'}
+            preserve_dirs = {'backups', 'logs', 'versions', 'servers', 'uploads', 'cache', '.git'}
             preserve_files = {'users.json'}
             mirror_copy_repo_to_project(repo_root, project_root, preserve_dirs, preserve_files)
         try:
@@ -712,6 +2674,147 @@ def system_auto_update():
         return jsonify({'success': False, 'message': f'Errore aggiornamento: {str(e)}'}), 500
 
 # ===================== MCUTILS API ROUTES =====================
+class JarResolveError(Exception):
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+def _jar_url_status(url):
+    """Status HTTP di url (dopo i redirect) senza scaricare il JAR: HEAD, o GET del solo primo byte
+    se il server non accetta HEAD. 206 vale come 200."""
+    r = http_request('HEAD', url, timeout=(5, 60), allow_redirects=True)
+    if r.status_code not in (403, 405, 501):
+        return r.status_code
+    with http_get(url, headers={'Range': 'bytes=0-0'}, timeout=(5, 60), stream=True, allow_redirects=True) as r:
+        return 200 if r.status_code == 206 else r.status_code
+
+def _resolve_jar_url_upstream(jar_type, version, source=''):
+    """Risolve l'URL di download di un JAR interrogando l'upstream, senza scaricarlo.
+
+    Ordine: catalogo versions/ (saltato con source='mcutils'), MCUtils
+    (download diretto o downloadUrl dai metadati), URL di fallback. Gli URL
+    candidati si verificano con _jar_url_status. Ritorna l'URL; solleva
+    JarResolveError con lo status HTTP da restituire al client.
+    """
+    def try_fallback(message, status):
+        fb = get_fallback_jar_url(jar_type, version)
+        if not fb:
+            raise JarResolveError(message, status)
+        print(f"Using fallback URL for {jar_type} {version}: {fb}")
+        fb_status = _jar_url_status(fb)
+        if fb_status == 200:
+            return fb
+        raise JarResolveError(f'Fallback download failed: HTTP {fb_status}', 502)
+
+    # 0) Sorgente locale in versions/ (salta se ?source=mcutils)
+    if source != 'mcutils':
+        local_url = get_url_from_versions(jar_type, version)
+        if local_url:
+            print(f"Using local versions URL for {jar_type} {version}: {local_url}")
+            if _jar_url_status(local_url) == 200:
+                return local_url
+            # Se l'URL locale non funziona, prosegui con MCUtils/fallback
+
+    # 1) Prova endpoint diretto MCUtils (solo intestazioni: se risponde JSON si passa ai metadati)
+    primary_url = f"{MCUTILS_BASE_URL}/api/server-jars/{jar_type}/{version}/download"
+    print(f"MCUtils direct attempt: {primary_url}")
+    head = http_request('HEAD', primary_url, timeout=(5, 60), allow_redirects=True)
+    ctype = head.headers.get('content-type', '')
+    if head.status_code == 200 and ('java-archive' in ctype or 'octet-stream' in ctype):
+        return primary_url
+
+    # 2) Metadati MCUtils: endpoint senza /download, leggi JSON e segui downloadUrl
+    meta_url = f"{MCUTILS_BASE_URL}/api/server-jars/{jar_type}/{version}"
+    print(f"MCUtils meta attempt: {meta_url}")
+    mr = http_get(meta_url, allow_redirects=True)
+    if mr.status_code == 404:
+        # 3) Try our own fallback URLs when MCUtils has no entry
+        return try_fallback('Versione non trovata', 404)
+    if mr.status_code != 200:
+        return try_fallback(f'Errore nel download: HTTP {mr.status_code}', 500)
+    try:
+        meta = mr.json()
+    except ValueError:
+        raise JarResolveError('Risposta MCUtils non valida', 500)
+    download_url = meta.get('downloadUrl') or meta.get('download')
+    if not download_url:
+        raise JarResolveError('downloadUrl non presente nella risposta MCUtils', 500)
+    print(f"MCUtils resolved downloadUrl: {download_url}")
+    status = _jar_url_status(download_url)
+    if status == 200:
+        return download_url
+    if status == 404:
+        return try_fallback('Versione non trovata', 404)
+    return try_fallback(f'Errore download JAR: HTTP {status}', 500)
+
+def jar_resolution_key(jar_type, version, source=''):
+    return resolution_cache.key('jar', source or 'auto', jar_type, version)
+
+def resolve_jar_url(jar_type, version, source=''):
+    """URL di download di jar_type/version, dalla resolution_cache se possibile.
+
+    Con la cache calda non fa richieste upstream; una versione già nota come
+    mancante solleva subito JarResolveError fino a RESOLVE_MISS_TTL.
+    """
+    entry = resolution_cache.resolve(jar_resolution_key(jar_type, version, source),
+                                     lambda: _resolve_jar_url_upstream(jar_type, version, source))
+    if entry['missing']:
+        raise JarResolveError(entry.get('message') or 'Versione non trovata', entry.get('status', 404))
+    return entry['value']
+
+def open_jar_download(jar_type, version, source=''):
+    """Apre in streaming il download di un JAR usando l'URL risolto in cache.
+
+    Se l'URL memorizzato non risponde più 200 la voce viene invalidata e la
+    risoluzione ripetuta una volta dall'upstream. Ritorna (response, url).
+    """
+    key = jar_resolution_key(jar_type, version, source)
+    url = resolve_jar_url(jar_type, version, source)
+    try:
+        r = http_get(url, timeout=(5, 60), stream=True, allow_redirects=True)
+        if r.status_code == 200:
+            return r, url
+        r.close()
+        problem = f"HTTP {r.status_code}"
+    except requests.RequestException as e:
+        problem = str(e)
+    print(f"URL in cache per {jar_type} {version} non valido ({problem}), nuova risoluzione")
+    resolution_cache.invalidate(key)
+    url = resolve_jar_url(jar_type, version, source)
+    r = http_get(url, timeout=(5, 60), stream=True, allow_redirects=True)
+    if r.status_code != 200:
+        r.close()
+        raise JarResolveError(f'Errore download JAR: HTTP {r.status_code}', 502)
+    return r, url
+
+@app.route('/api/servers/<server_name>/install-jar', methods=['POST'])
+def install_jar(server_name):
+    """Avvia l'installazione di un JAR lato server; risponde con il job da interrogare."""
+    if not has_permission('files_access'):
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    data = request.get_json(silent=True) or {}
+    jar_type = (data.get('type') or '').strip().lower()
+    version = (data.get('version') or '').strip()
+    source = (data.get('source') or '').strip().lower()
+    jar_filename = secure_filename((data.get('filename') or 'server.jar').strip())
+    if not jar_type or not version:
+        return jsonify({'success': False, 'message': 'Tipo e versione richiesti'}), 400
+    if not jar_filename or not jar_filename.lower().endswith('.jar'):
+        return jsonify({'success': False, 'message': 'Nome file non valido'}), 400
+    if not os.path.isdir(os.path.join(SERVER_DIR, server_name)):
+        return jsonify({'success': False, 'message': 'Server non trovato'}), 404
+    job = create_job('install-jar', session.get('user'), server=server_name,
+                     jar_type=jar_type, version=version, filename=jar_filename)
+    run_job(job, install_jar_job, server_name, jar_type, version, jar_filename, source)
+    return jsonify({'success': True, 'job_id': job['id'], 'job': job}), 202
+
+@app.route('/api/jobs/<job_id>')
+def get_job_status(job_id):
+    job = get_job(job_id)
+    if not job or (job['owner'] != session.get('user') and not is_admin_user()):
+        return jsonify({'success': False, 'message': 'Job non trovato'}), 404
+    return jsonify({'success': True, 'job': job})
+
 @app.route('/api/mcutils/types')
 def mcutils_types():
     try:
@@ -719,6 +2822,35 @@ def mcutils_types():
     except Exception as e:
         return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
 
+@app.route('/api/versions/<jar_type>')
+def list_versions(jar_type):
+    """Versioni note per un tipo di JAR (dal catalogo versions/), dalla più recente.
+    ?stable=1 esclude pre-release, release candidate e snapshot."""
+    stable_only = request.args.get('stable') in ('1', 'true', 'yes')
+    versions = versions_catalog.versions(jar_type, stable_only=stable_only)
+    if versions is None:
+        return jsonify({'success': False, 'message': 'Tipo non presente nel catalogo versioni', 'types': versions_catalog.types()}), 404
+    return jsonify({
+        'success': True,
+        'type': jar_type,
+        'versions': versions,
+        'latest': versions_catalog.latest(jar_type, stable=False),
+        'latest_stable': versions_catalog.latest(jar_type),
+    })
+
+@app.route('/api/versions/refresh', methods=['POST'])
+def refresh_versions():
+    """Aggiorna le liste versioni da MINEBOARD_VERSIONS_UPSTREAM (solo admin)."""
+    if not is_admin_user():
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    if not VERSIONS_UPSTREAM_URL:
+        return jsonify({'success': False, 'message': 'MINEBOARD_VERSIONS_UPSTREAM non configurato'}), 400
+    try:
+        updated = versions_catalog.refresh_upstream()
+        return jsonify({'success': True, 'updated': updated})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
+
 
 @app.route('/api/mcutils/download/<jar_type>/<version>', methods=['GET', 'OPTIONS'])
 def mcutils_download(jar_type, version):
@@ -734,6 +2866,8 @@ def mcutils_download(jar_type, version):
         jar_type = jar_type.strip()
         version = version.strip()
         source = (request.args.get('source') or '').strip().lower()
+        if version.lower() == 'latest':
+            version = resolve_latest_version(jar_type)
         
         def send_jar(r):
             # Stream chunks to client and log progress to console
@@ -749,6 +2883,7 @@ def mcutils_download(jar_type, version):
                     if not chunk:
                         continue
                     downloaded += len(chunk)
+                    metrics_inc('mineboard_download_bytes_total', {'kind': 'proxy'}, len(chunk))
                     # Console progress logging
                     try:
                         if total:
@@ -771,103 +2906,716 @@ def mcutils_download(jar_type, version):
                 headers['Content-Length'] = str(total)
             return app.response_class(generate(), status=200, headers=headers)
 
-        # 0) Sorgente locale in versions/ (salta se ?source=mcutils)
-        if source != 'mcutils':
-            local_url = get_url_from_versions(jar_type, version)
-            if local_url:
-                print(f"Using local versions URL for {jar_type} {version}: {local_url}")
-                lr = requests.get(local_url, timeout=120, stream=True, allow_redirects=True)
-                if lr.status_code == 200:
-                    return send_jar(lr)
-                # Se l'URL locale non funziona, prosegui con MCUtils/fallback
+        try:
+            r, url = open_jar_download(jar_type, version, source)
+        except JarResolveError as e:
+            return jsonify({'success': False, 'message': str(e)}), e.status
+        return send_jar(r)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
 
-        # 1) Prova endpoint diretto MCUtils
-        primary_url = f"{MCUTILS_BASE_URL}/api/server-jars/{jar_type}/{version}/download"
-        print(f"MCUtils direct attempt: {primary_url}")
-        resp = requests.get(primary_url, timeout=120, stream=True, allow_redirects=True)
+# ===================== JVM GC LOG =====================
+# Con 'gc_logging' attivo in server_config.json il server viene avviato con il
+# logging GC unificato (-Xlog) su un file a rotazione in servers/<nome>/logs/.
+GC_LOG_RELATIVE_PATH = os.path.join('logs', 'gc.log')
+GC_LOG_XLOG = 'gc,gc+phases:file=logs/gc.log:uptime,level,tags:filecount=5,filesize=10m'
+GC_WINDOW_SIZE = 1000
+GC_READ_LIMIT = 4 * 1024 * 1024  # byte massimi letti per singolo poll
+
+_GC_UNITS = {'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+_GC_UPTIME_RE = re.compile(r'\[(\d+(?:\.\d+)?)s\]')
+# G1 / Parallel / Serial: "GC(5) Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 3.456ms"
+_GC_PAUSE_HEAP_RE = re.compile(
+    r'GC\((\d+)\) (Pause .+?) (\d+)([BKMG])->(\d+)([BKMG])\((\d+)([BKMG])\) (\d+(?:\.\d+)?)ms')
+# Solo queste pause sono raccolte; Remark e Cleanup di G1 sono fasi del ciclo di mark concorrente
+_GC_COLLECTION_PAUSES = ('Pause Young', 'Pause Full', 'Pause Mixed')
+# ZGC: "GC(3) Garbage Collection (Warmup) 1234M(12%)->456M(4%)" / "Minor Collection (...)" / "Major Collection (...)"
+_GC_ZGC_CYCLE_RE = re.compile(
+    r'GC\((\d+)\) ((?:Garbage|Minor|Major) Collection \(.*?\)) (\d+)([BKMG])\(\d+%\)->(\d+)([BKMG])\(\d+%\)')
+# ZGC (gc+phases): "GC(3) Pause Mark Start 0.012ms", generazionale (JDK 21+):
+# "GC(3) y: Pause Mark Start 0.010ms" / "GC(0) Y: Pause Mark Start (Major) 0.013ms"
+_GC_PAUSE_ONLY_RE = re.compile(r'GC\((\d+)\) (?:[yoYO]: )?(Pause [A-Za-z ]+?(?: \([A-Za-z ]+\))?) (\d+(?:\.\d+)?)ms')
+
+class GcLogTailer:
+    """Legge in modo incrementale il GC log di un server e mantiene statistiche su una finestra."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.inode = None
+        self.partial = ''
+        self.last_uptime = None
+        self.pauses = deque(maxlen=GC_WINDOW_SIZE)       # (uptime, ms)
+        self.collections = deque(maxlen=GC_WINDOW_SIZE)  # (uptime, before, after)
+        self.heap_after = None
+        self.heap_capacity = None
+        self.pause_count = 0
+        self.pause_total_ms = 0.0
+        self.collection_count = 0
+
+    def poll(self):
+        with self.lock:
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                return
+            # Rotazione (nuovo inode) o troncamento: riparti da capo
+            if self.inode is not None and (st.st_ino != self.inode or st.st_size < self.offset):
+                self.offset = 0
+                self.partial = ''
+            self.inode = st.st_ino
+            if st.st_size <= self.offset:
+                return
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(GC_READ_LIMIT)
+            self.offset += len(data)
+            text = self.partial + data.decode('utf-8', errors='ignore')
+            lines = text.split('\n')
+            self.partial = lines.pop()
+            for line in lines:
+                self._parse_line(line)
+
+    def _parse_line(self, line):
+        if 'GC(' not in line:
+            return
+        m = _GC_UPTIME_RE.search(line)
+        uptime = float(m.group(1)) if m else None
+        if uptime is not None:
+            # Uptime che torna indietro = nuova JVM: le finestre precedenti non sono confrontabili
+            if self.last_uptime is not None and uptime < self.last_uptime:
+                self.pauses.clear()
+                self.collections.clear()
+            self.last_uptime = uptime
+        m = _GC_PAUSE_HEAP_RE.search(line)
+        if m:
+            before = int(m.group(3)) * _GC_UNITS[m.group(4)]
+            after = int(m.group(5)) * _GC_UNITS[m.group(6)]
+            self.heap_capacity = int(m.group(7)) * _GC_UNITS[m.group(8)]
+            self._add_pause(uptime, float(m.group(9)))
+            if m.group(2).startswith(_GC_COLLECTION_PAUSES):
+                self._add_collection(uptime, before, after)
+            return
+        m = _GC_ZGC_CYCLE_RE.search(line)
+        if m:
+            before = int(m.group(3)) * _GC_UNITS[m.group(4)]
+            after = int(m.group(5)) * _GC_UNITS[m.group(6)]
+            self._add_collection(uptime, before, after)
+            return
+        m = _GC_PAUSE_ONLY_RE.search(line)
+        if m:
+            self._add_pause(uptime, float(m.group(3)))
+
+    def _add_pause(self, uptime, ms):
+        self.pauses.append((uptime, ms))
+        self.pause_count += 1
+        self.pause_total_ms += ms
+
+    def _add_collection(self, uptime, before, after):
+        self.collections.append((uptime, before, after))
+        self.heap_after = after
+        self.collection_count += 1
+
+    def snapshot(self):
+        with self.lock:
+            durations = sorted(ms for _, ms in self.pauses)
+            collections = list(self.collections)
+            result = {
+                'pause_count_total': self.pause_count,
+                'pause_time_total_ms': round(self.pause_total_ms, 3),
+                'collections_total': self.collection_count,
+                'heap_after_gc_bytes': self.heap_after,
+                'heap_capacity_bytes': self.heap_capacity,
+                'jvm_uptime_seconds': self.last_uptime,
+                'pause_ms': None,
+                'allocation_rate_bytes_per_second': None,
+                'gc_per_minute': None,
+            }
+        if durations:
+            def pct(q):
+                return durations[min(len(durations) - 1, int(q * len(durations)))]
+            result['pause_ms'] = {'p50': pct(0.5), 'p95': pct(0.95), 'p99': pct(0.99),
+                                  'max': durations[-1], 'window': len(durations)}
+        timed = [c for c in collections if c[0] is not None]
+        if len(timed) >= 2 and timed[-1][0] > timed[0][0]:
+            span = timed[-1][0] - timed[0][0]
+            # Allocato tra due GC = heap prima del GC corrente - heap dopo il precedente
+            allocated = sum(max(0, cur[1] - prev[2]) for prev, cur in zip(timed, timed[1:]))
+            result['allocation_rate_bytes_per_second'] = round(allocated / span)
+            result['gc_per_minute'] = round((len(timed) - 1) * 60.0 / span, 3)
+        return result
+
+gc_tailers = {}  # nome server -> GcLogTailer
+gc_tailers_lock = threading.Lock()
+
+def get_gc_tailer(server_name):
+    path = os.path.join(SERVER_DIR, server_name, GC_LOG_RELATIVE_PATH)
+    with gc_tailers_lock:
+        tailer = gc_tailers.get(server_name)
+        if tailer is None or tailer.path != path:
+            tailer = GcLogTailer(path)
+            gc_tailers[server_name] = tailer
+    return tailer
+
+# ===================== INOTIFY WATCHER =====================
+class InotifyWatcher:
+    """Wrapper minimale su inotify(7) via ctypes, solo Linux.
+
+    Se inotify non è disponibile (altri OS, limiti esauriti) `available` resta
+    False e chi lo usa deve ripiegare su scansioni periodiche. La callback
+    riceve (cartella, nome, mask); su overflow della coda riceve (None, '', mask).
+    """
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    TREE_CHANGES = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+
+    def __init__(self, callback, name='inotify'):
+        self.callback = callback
+        self.name = name
+        self.available = False
+        self._fd = None
+        self._libc = None
+        self._lock = threading.Lock()
+        self._wd_paths = {}
+        self._path_wds = {}
 
-        
+    def start(self):
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            import ctypes
+            import ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0:
+                return False
+        except Exception as e:
+            print(f"inotify non disponibile ({self.name}): {e}")
+            return False
+        self._libc, self._fd = libc, fd
+        self.available = True
+        threading.Thread(target=self._read_loop, daemon=True, name=self.name).start()
+        return True
 
-        if resp.status_code == 200:
-            ctype = resp.headers.get('content-type', '')
-            if 'java-archive' in ctype or 'octet-stream' in ctype:
-                return send_jar(resp)
-            # Alcune risposte possono ancora essere JSON: prova a leggerlo e seguire downloadUrl
+    def add_watch(self, path, mask):
+        if not self.available:
+            return None
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask | self.IN_ONLYDIR)
+        if wd < 0:
+            return None
+        with self._lock:
+            old = self._wd_paths.get(wd)
+            if old is not None and self._path_wds.get(old) == wd:
+                del self._path_wds[old]
+            self._wd_paths[wd] = path
+            self._path_wds[path] = wd
+        return wd
+
+    def add_tree(self, root, mask):
+        """Aggiunge un watch per ogni cartella sotto root. False se il limite di watch è esaurito."""
+        stack = [root]
+        while stack:
+            d = stack.pop()
+            if self.add_watch(d, mask) is None:
+                return False
             try:
-                meta = resp.json()
-                download_url = meta.get('downloadUrl') or meta.get('download')
-                if download_url:
-                    print(f"MCUtils meta provided downloadUrl: {download_url}")
-                    dr = requests.get(download_url, timeout=120, stream=True, allow_redirects=True)
-                    if dr.status_code == 200:
-                        return send_jar(dr)
-            except Exception:
-                pass
+                with os.scandir(d) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return True
 
-        # 2) Fallback: colpisci endpoint senza /download, leggi JSON e segui downloadUrl
-        meta_url = f"{MCUTILS_BASE_URL}/api/server-jars/{jar_type}/{version}"
-        print(f"MCUtils fallback meta attempt: {meta_url}")
-        mr = requests.get(meta_url, timeout=60, allow_redirects=True)
-        if mr.status_code == 404:
-            # 3) Try our own fallback URLs when MCUtils has no entry
-            fb = get_fallback_jar_url(jar_type, version)
-            if fb:
-                print(f"Using fallback URL for {jar_type} {version}: {fb}")
-                fr = requests.get(fb, timeout=120, stream=True, allow_redirects=True)
-                if fr.status_code == 200:
-                    return send_jar(fr)
-                else:
-                    return jsonify({'success': False, 'message': f'Fallback download failed: HTTP {fr.status_code}'}), 502
-            return jsonify({'success': False, 'message': 'Versione non trovata'}), 404
-        if mr.status_code != 200:
-            # Try fallback URL as well
-            fb = get_fallback_jar_url(jar_type, version)
-            if fb:
-                print(f"Using fallback URL for {jar_type} {version}: {fb}")
-                fr = requests.get(fb, timeout=120, stream=True, allow_redirects=True)
-                if fr.status_code == 200:
-                    return send_jar(fr)
+    def remove_watch(self, path):
+        if not self.available:
+            return
+        with self._lock:
+            wd = self._path_wds.pop(path, None)
+            if wd is not None:
+                self._wd_paths.pop(wd, None)
+        if wd is not None:
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def remove_tree(self, root):
+        if not self.available:
+            return
+        prefix = root.rstrip(os.sep) + os.sep
+        with self._lock:
+            doomed = [(p, wd) for p, wd in self._path_wds.items() if p == root or p.startswith(prefix)]
+            for p, wd in doomed:
+                self._path_wds.pop(p, None)
+                self._wd_paths.pop(wd, None)
+        for _, wd in doomed:
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _read_loop(self):
+        import struct
+        header = struct.Struct('iIII')
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except OSError:
+                time.sleep(1)
+                continue
+            off = 0
+            while off + header.size <= len(data):
+                wd, mask, _cookie, length = header.unpack_from(data, off)
+                raw_name = data[off + header.size:off + header.size + length].split(b'\0', 1)[0]
+                off += header.size + length
+                if mask & self.IN_Q_OVERFLOW:
+                    path = None
                 else:
-                    return jsonify({'success': False, 'message': f'Fallback download failed: HTTP {fr.status_code}'}), 502
-            return jsonify({'success': False, 'message': f'Errore nel download: HTTP {mr.status_code}'}), 500
-        try:
-            meta = mr.json()
-            download_url = meta.get('downloadUrl') or meta.get('download')
-            if not download_url:
-                return jsonify({'success': False, 'message': 'downloadUrl non presente nella risposta MCUtils'}), 500
-            print(f"MCUtils resolved downloadUrl: {download_url}")
-            dr = requests.get(download_url, timeout=120, stream=True, allow_redirects=True)
-            if dr.status_code == 200:
-                return send_jar(dr)
-            elif dr.status_code == 404:
-                # Try fallback URL
-                fb = get_fallback_jar_url(jar_type, version)
-                if fb:
-                    print(f"Using fallback URL for {jar_type} {version}: {fb}")
-                    fr = requests.get(fb, timeout=120, stream=True, allow_redirects=True)
-                    if fr.status_code == 200:
-                        return send_jar(fr)
+                    with self._lock:
+                        path = self._wd_paths.get(wd)
+                        if mask & self.IN_IGNORED:
+                            self._wd_paths.pop(wd, None)
+                            if path is not None and self._path_wds.get(path) == wd:
+                                del self._path_wds[path]
+                    if path is None or mask & self.IN_IGNORED:
+                        continue
+                try:
+                    self.callback(path, os.fsdecode(raw_name), mask)
+                except Exception as e:
+                    print(f"Errore callback inotify ({self.name}): {e}")
+
+# ===================== DISK USAGE INDEX =====================
+# Dimensione per server (totale + cartelle di primo livello: world, world_nether,
+# plugins, logs, ...). Costruito una volta con os.scandir e tenuto aggiornato
+# con inotify: per i file modificati/creati/eliminati si applica la differenza
+# tra la nuova stat e la dimensione registrata, le cartelle create o spostate
+# vengono riscansionate, la coda inotify piena porta a una scansione completa.
+# Senza inotify si ripiega su riscansioni periodiche.
+DISK_USAGE_RESCAN_INTERVAL = float(os.environ.get('MINEBOARD_DISK_RESCAN_INTERVAL', '300'))
+DISK_USAGE_RECONCILE_INTERVAL = 3600.0  # riscansione di sicurezza anche con inotify attivo
+DISK_USAGE_DEBOUNCE = 10.0              # secondi minimi tra due riscansioni della stessa cartella
+DISK_USAGE_ROOT_KEY = '.'               # file direttamente nella root del server
+DISK_USAGE_WATCH_MASK = InotifyWatcher.TREE_CHANGES | InotifyWatcher.IN_MODIFY | InotifyWatcher.IN_CLOSE_WRITE
+
+def scan_tree_size(path, sizes=None):
+    """Ritorna (byte, numero file) sotto path usando os.scandir e le stat dei DirEntry.
+
+    Se sizes è un dict vi registra anche la dimensione di ogni file (percorso -> byte).
+    """
+    total, files = 0, 0
+    stack = [path]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
                     else:
-                        return jsonify({'success': False, 'message': f'Fallback download failed: HTTP {fr.status_code}'}), 502
-                return jsonify({'success': False, 'message': 'Versione non trovata'}), 404
+                        size = entry.stat(follow_symlinks=False).st_size
+                        total += size
+                        files += 1
+                        if sizes is not None:
+                            sizes[entry.path] = size
+                except OSError:
+                    continue
+    return total, files
+
+class DiskUsageIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # nome -> {'folders': {cartella: {'bytes', 'files'}}, 'sizes': {percorso: byte} (solo se
+        # osservato con inotify), 'scanned_at', 'watched', 'over_quota'}
+        self.servers = {}
+        self.dirty = {}    # nome -> set di cartelle di primo livello (None = scansione completa)
+        self.changed = {}  # nome -> set di file da rileggere con stat
+        self.last_folder_scan = {}
+        self.wake = threading.Event()
+        self.watcher = InotifyWatcher(self._on_event, name='disk-usage-inotify')
+
+    def start(self):
+        if self.watcher.start():
+            self.watcher.add_watch(SERVER_DIR, InotifyWatcher.TREE_CHANGES)
+        threading.Thread(target=self._run, daemon=True, name='disk-usage-index').start()
+
+    def get(self, name):
+        with self.lock:
+            entry = self.servers.get(name)
+            if entry is None:
+                return None
+            folders = {k: dict(v) for k, v in entry['folders'].items()}
+            scanned_at, over_quota = entry['scanned_at'], entry['over_quota']
+        return {
+            'total_bytes': sum(f['bytes'] for f in folders.values()),
+            'files': sum(f['files'] for f in folders.values()),
+            'folders': {k: v['bytes'] for k, v in folders.items()},
+            'scanned_at': datetime.fromtimestamp(scanned_at, timezone.utc).isoformat() if scanned_at else None,
+            'over_quota': over_quota,
+        }
+
+    def scan_server(self, name):
+        server_path = os.path.join(SERVER_DIR, name)
+        folders = {DISK_USAGE_ROOT_KEY: {'bytes': 0, 'files': 0}}
+        sizes = {}
+        try:
+            with os.scandir(server_path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            size, count = scan_tree_size(entry.path, sizes)
+                            folders[entry.name] = {'bytes': size, 'files': count}
+                        else:
+                            size = entry.stat(follow_symlinks=False).st_size
+                            folders[DISK_USAGE_ROOT_KEY]['bytes'] += size
+                            folders[DISK_USAGE_ROOT_KEY]['files'] += 1
+                            sizes[entry.path] = size
+                    except OSError:
+                        continue
+        except OSError:
+            with self.lock:
+                self.servers.pop(name, None)
+            return
+        watched = self.watcher.available and self.watcher.add_tree(server_path, DISK_USAGE_WATCH_MASK)
+        if self.watcher.available and not watched:
+            print(f"[DISK] Limite watch inotify raggiunto per '{name}', uso riscansioni periodiche")
+        with self.lock:
+            prev = self.servers.get(name) or {}
+            self.servers[name] = {'folders': folders, 'sizes': sizes if watched else None,
+                                  'scanned_at': time.time(), 'watched': watched,
+                                  'over_quota': prev.get('over_quota', False)}
+            # La scansione ha già letto tutto: le stat in attesa non servono più
+            self.changed.pop(name, None)
+        self._check_quota(name)
+
+    def rescan_folder(self, name, folder):
+        server_path = os.path.join(SERVER_DIR, name)
+        sizes = {}
+        if folder == DISK_USAGE_ROOT_KEY:
+            size, count = 0, 0
+            try:
+                with os.scandir(server_path) as it:
+                    for entry in it:
+                        try:
+                            if not entry.is_dir(follow_symlinks=False):
+                                sizes[entry.path] = entry.stat(follow_symlinks=False).st_size
+                                size += sizes[entry.path]
+                                count += 1
+                        except OSError:
+                            continue
+            except OSError:
+                return
+            result = {'bytes': size, 'files': count}
+            in_folder = lambda path: os.path.dirname(path) == server_path
+        else:
+            folder_path = os.path.join(server_path, folder)
+            result = {'bytes': 0, 'files': 0}
+            if os.path.isdir(folder_path):
+                size, count = scan_tree_size(folder_path, sizes)
+                result = {'bytes': size, 'files': count}
             else:
-                # Try fallback URL for any other failure
-                fb = get_fallback_jar_url(jar_type, version)
-                if fb:
-                    print(f"Using fallback URL for {jar_type} {version}: {fb}")
-                    fr = requests.get(fb, timeout=120, stream=True, allow_redirects=True)
-                    if fr.status_code == 200:
-                        return send_jar(fr)
-                    else:
-                        return jsonify({'success': False, 'message': f'Fallback download failed: HTTP {fr.status_code}'}), 502
-                return jsonify({'success': False, 'message': f'Errore download JAR: HTTP {dr.status_code}'}), 500
-        except ValueError:
-            return jsonify({'success': False, 'message': 'Risposta MCUtils non valida'}), 500
-    except Exception as e:
-        return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
+                result = None
+            prefix = folder_path + os.sep
+            in_folder = lambda path: path.startswith(prefix)
+        with self.lock:
+            entry = self.servers.get(name)
+            if entry is None:
+                return
+            if result is None:
+                entry['folders'].pop(folder, None)
+            else:
+                entry['folders'][folder] = result
+            if entry['sizes'] is not None:
+                for path in [p for p in entry['sizes'] if in_folder(p)]:
+                    del entry['sizes'][path]
+                entry['sizes'].update(sizes)
+            entry['scanned_at'] = time.time()
+        self._check_quota(name)
+
+    def apply_file_changes(self, name, paths):
+        """Aggiorna i totali con la differenza tra la stat attuale dei file e la dimensione registrata."""
+        server_path = os.path.join(SERVER_DIR, name)
+        current = {}
+        for path in paths:
+            try:
+                st = os.lstat(path)
+                current[path] = None if stat.S_ISDIR(st.st_mode) else st.st_size
+            except OSError:
+                current[path] = None
+        with self.lock:
+            entry = self.servers.get(name)
+            if entry is None or entry['sizes'] is None:
+                return
+            for path, size in current.items():
+                parts = os.path.relpath(path, server_path).split(os.sep)
+                folder = parts[0] if len(parts) > 1 else DISK_USAGE_ROOT_KEY
+                old = entry['sizes'].pop(path, None)
+                if size is not None:
+                    entry['sizes'][path] = size
+                if old is None and size is None:
+                    continue
+                totals = entry['folders'].setdefault(folder, {'bytes': 0, 'files': 0})
+                totals['bytes'] += (size or 0) - (old or 0)
+                totals['files'] += (size is not None) - (old is not None)
+        self._check_quota(name)
+
+    def forget(self, name):
+        self.watcher.remove_tree(os.path.join(SERVER_DIR, name))
+        with self.lock:
+            self.servers.pop(name, None)
+            self.dirty.pop(name, None)
+            self.changed.pop(name, None)
+
+    def _mark(self, name, folder):
+        with self.lock:
+            if name in self.dirty and self.dirty[name] is None:
+                return
+            if folder is None:
+                self.dirty[name] = None
+            else:
+                self.dirty.setdefault(name, set()).add(folder)
+        self.wake.set()
+
+    def _mark_file(self, name, folder, path):
+        with self.lock:
+            entry = self.servers.get(name)
+            if entry is None or entry['sizes'] is None:
+                marked = False
+            else:
+                pending = self.dirty.get(name, set())
+                if pending is None or folder in pending:
+                    return  # la riscansione in attesa lo conterà già
+                self.changed.setdefault(name, set()).add(path)
+                marked = True
+        if not marked:
+            self._mark(name, folder)
+            return
+        self.wake.set()
+
+    def _on_event(self, dir_path, fname, mask):
+        if dir_path is None:
+            # Coda inotify piena: non sappiamo cosa è cambiato
+            with self.lock:
+                names = list(self.servers)
+            for name in names:
+                self._mark(name, None)
+            return
+        rel = os.path.relpath(dir_path, SERVER_DIR)
+        if rel == '.':
+            # Server creato/eliminato/rinominato
+            if fname:
+                if mask & (InotifyWatcher.IN_DELETE | InotifyWatcher.IN_MOVED_FROM):
+                    self.forget(fname)
+                else:
+                    self._mark(fname, None)
+            return
+        parts = rel.split(os.sep)
+        name = parts[0]
+        if len(parts) == 1:
+            is_dir = bool(mask & InotifyWatcher.IN_ISDIR)
+            folder = fname if (is_dir and fname) else DISK_USAGE_ROOT_KEY
+        else:
+            folder = parts[1]
+        if mask & InotifyWatcher.IN_ISDIR and mask & (InotifyWatcher.IN_CREATE | InotifyWatcher.IN_MOVED_TO) and fname:
+            self.watcher.add_tree(os.path.join(dir_path, fname), DISK_USAGE_WATCH_MASK)
+        if fname and not mask & InotifyWatcher.IN_ISDIR:
+            # Un solo file: basta una stat, non la riscansione della cartella
+            self._mark_file(name, folder, os.path.join(dir_path, fname))
+        else:
+            self._mark(name, folder)
+
+    def _check_quota(self, name):
+        cfg = load_server_internal_config(name)
+        try:
+            quota_mb = float(cfg.get('disk_quota_mb') or 0)
+        except (TypeError, ValueError):
+            quota_mb = 0
+        usage = self.get(name)
+        if usage is None:
+            return
+        over = quota_mb > 0 and usage['total_bytes'] > quota_mb * 1024 * 1024
+        with self.lock:
+            entry = self.servers.get(name)
+            if entry is None:
+                return
+            was_over = entry['over_quota']
+            entry['over_quota'] = over
+        if over and not was_over:
+            used_mb = usage['total_bytes'] / (1024 * 1024)
+            print(f"[DISK] Server '{name}' oltre la quota: {used_mb:.0f} MB / {quota_mb:.0f} MB")
+            send_discord_webhook(name, 'disk_quota_exceeded',
+                                 f"Il server '{name}' ha superato la quota disco: {used_mb:.0f} MB su {quota_mb:.0f} MB")
+
+    def _run(self):
+        last_sync = 0.0
+        while True:
+            now = time.time()
+            try:
+                if now - last_sync > 30 or not self.servers:
+                    last_sync = now
+                    names = {n for n in os.listdir(SERVER_DIR) if os.path.isdir(os.path.join(SERVER_DIR, n))}
+                    with self.lock:
+                        known = set(self.servers)
+                    for name in names - known:
+                        self._mark(name, None)
+                    for name in known - names:
+                        self.forget(name)
+                    with self.lock:
+                        stale = [n for n, e in self.servers.items()
+                                 if now - e['scanned_at'] > (DISK_USAGE_RECONCILE_INTERVAL if e['watched'] else DISK_USAGE_RESCAN_INTERVAL)]
+                    for name in stale:
+                        self._mark(name, None)
+                with self.lock:
+                    pending = list(self.dirty.items())
+                for name, folders in pending:
+                    if folders is None:
+                        with self.lock:
+                            self.dirty.pop(name, None)
+                        self.scan_server(name)
+                        continue
+                    for folder in list(folders):
+                        key = (name, folder)
+                        if now - self.last_folder_scan.get(key, 0) < DISK_USAGE_DEBOUNCE:
+                            continue  # ritenta al prossimo giro
+                        with self.lock:
+                            current = self.dirty.get(name)
+                            if current is None:
+                                break
+                            current.discard(folder)
+                            if not current:
+                                self.dirty.pop(name, None)
+                        self.last_folder_scan[key] = now
+                        self.rescan_folder(name, folder)
+                with self.lock:
+                    changed, self.changed = self.changed, {}
+                for name, paths in changed.items():
+                    self.apply_file_changes(name, paths)
+            except Exception as e:
+                print(f"Errore indice uso disco: {e}")
+            self.wake.wait(2.0)
+            self.wake.clear()
+
+disk_usage_index = DiskUsageIndex()
+
+# ===================== SERVER REGISTRY =====================
+# Elenco dei server tenuto in memoria: popolato all'avvio, aggiornato dalle route
+# che creano/importano/rinominano/eliminano server e riconciliato con inotify
+# (cartelle in SERVER_DIR e scritture di server_config.json) o, senza inotify,
+# con un listdir periodico. /api/servers non tocca più il disco a ogni poll.
+SERVER_REGISTRY_RECONCILE_INTERVAL = float(os.environ.get('MINEBOARD_REGISTRY_RECONCILE_INTERVAL', '60'))
+SERVER_REGISTRY_FALLBACK_INTERVAL = 5.0  # senza inotify: età massima del listdir
+SERVER_REGISTRY_DIR_MASK = InotifyWatcher.TREE_CHANGES
+SERVER_REGISTRY_CONFIG_MASK = InotifyWatcher.IN_CLOSE_WRITE | InotifyWatcher.IN_MOVED_TO | InotifyWatcher.IN_DELETE
+
+class ServerRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.servers = set()
+        self.loaded = False
+        self.reconciled_at = 0.0
+        self.wake = threading.Event()
+        self.watcher = InotifyWatcher(self._on_event, name='server-registry-inotify')
+
+    def start(self):
+        if self.watcher.start():
+            self.watcher.add_watch(SERVER_DIR, SERVER_REGISTRY_DIR_MASK)
+        self.reconcile()
+        threading.Thread(target=self._run, daemon=True, name='server-registry').start()
+
+    @property
+    def live(self):
+        """True se le modifiche a server_config.json arrivano via inotify (niente stat a ogni lettura)."""
+        return self.watcher.available
+
+    def names(self):
+        # Senza inotify (o prima di start()) si riconcilia al massimo ogni pochi secondi
+        stale = not self.watcher.available and time.time() - self.reconciled_at > SERVER_REGISTRY_FALLBACK_INTERVAL
+        if not self.loaded or stale:
+            self.reconcile()
+        with self.lock:
+            return sorted(self.servers)
+
+    def add(self, name):
+        with self.lock:
+            self.servers.add(name)
+        if self.watcher.available:
+            self.watcher.add_watch(os.path.join(SERVER_DIR, name), SERVER_REGISTRY_CONFIG_MASK)
+        server_config_store.invalidate(name)
+
+    def remove(self, name):
+        with self.lock:
+            self.servers.discard(name)
+        self.watcher.remove_tree(os.path.join(SERVER_DIR, name))
+        server_config_store.invalidate(name)
+
+    def reconcile(self):
+        os.makedirs(SERVER_DIR, exist_ok=True)
+        found = set()
+        with os.scandir(SERVER_DIR) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        found.add(entry.name)
+                except OSError:
+                    continue
+        with self.lock:
+            known = set(self.servers)
+            self.loaded = True
+            self.reconciled_at = time.time()
+        for name in found - known:
+            self.add(name)
+        for name in known - found:
+            self.remove(name)
+
+    def _on_event(self, dir_path, fname, mask):
+        if dir_path is None:
+            # Coda piena: eventi persi, quindi nessuna config in cache è affidabile
+            with self.lock:
+                names = list(self.servers)
+            for name in names:
+                server_config_store.invalidate(name)
+            self.wake.set()
+            return
+        if dir_path == SERVER_DIR:
+            if not fname:
+                return
+            if mask & (InotifyWatcher.IN_DELETE | InotifyWatcher.IN_MOVED_FROM):
+                self.remove(fname)
+            elif mask & InotifyWatcher.IN_ISDIR:
+                self.add(fname)
+            return
+        if fname == 'server_config.json':
+            server_config_store.invalidate(os.path.basename(dir_path))
+
+    def _run(self):
+        while True:
+            self.wake.wait(SERVER_REGISTRY_RECONCILE_INTERVAL)
+            self.wake.clear()
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"Errore riconciliazione registro server: {e}")
+
+server_registry = ServerRegistry()
 
 class MinecraftServer:
-    def __init__(self, name, port, jar_file, max_memory='1G', platform='minecraft', use_custom_start=False, custom_start_cmd=''):
+    def __init__(self, name, port, jar_file, max_memory='1G', platform='minecraft', use_custom_start=False, custom_start_cmd='', gc_logging=False):
         self.name = name
         self.port = port
         self.jar_file = jar_file
@@ -875,11 +3623,13 @@ class MinecraftServer:
         self.platform = platform or 'minecraft'
         self.use_custom_start = bool(use_custom_start)
         self.custom_start_cmd = (custom_start_cmd or '').strip()
+        self.gc_logging = bool(gc_logging)
         self.process = None
         self.status = 'stopped'
         self.stopping = False  # per distinguere arresto intenzionale da crash
         self.log_file = os.path.join(LOG_DIR, f'{name}.log')
         self.online_players = set()  # Traccia giocatori online
+        self.started_at = None  # time.time() dell'ultimo avvio, per uptime/metriche
         
     def start(self):
         if self.status == 'running':
@@ -909,6 +3659,10 @@ class MinecraftServer:
                     jar_path,
                     'nogui'
                 ]
+                if self.gc_logging:
+                    # Percorso relativo alla cwd del server (evita i ':' dei path Windows in -Xlog)
+                    os.makedirs(os.path.join(SERVER_DIR, self.name, 'logs'), exist_ok=True)
+                    cmd.insert(3, f'-Xlog:{GC_LOG_XLOG}')
                 use_shell = False
             
             # Avvia il processo
@@ -924,7 +3678,10 @@ class MinecraftServer:
                 )
             
             self.status = 'running'
+            self.started_at = time.time()
             running_servers[self.name] = self
+            metrics_inc('mineboard_server_starts_total', {'server': self.name})
+            notify_dashboard_change()
             
             # Avvia il monitoraggio del processo
             self.start_process_monitoring()
@@ -942,12 +3699,15 @@ class MinecraftServer:
                 # Il processo è terminato
                 self.status = 'stopped'
                 self.process = None
-                if self.name in running_servers:
+                # Dopo un riavvio rapido il nome può già appartenere a una nuova istanza
+                if running_servers.get(self.name) is self:
                     del running_servers[self.name]
+                notify_dashboard_change()
                 print(f"Server {self.name} si è spento automaticamente")
                 # Invio webhook per arresto anomalo se non è stato uno stop richiesto
                 try:
                     if not self.stopping:
+                        metrics_inc('mineboard_server_crashes_total', {'server': self.name})
                         send_discord_webhook(self.name, 'server_crashed', f"Il server '{self.name}' si è arrestato in modo anomalo")
                     else:
                         # Arresto normale
@@ -959,7 +3719,7 @@ class MinecraftServer:
                     self.stopping = False
         
         # Avvia il monitoraggio in un thread separato
-        monitor_thread = threading.Thread(target=monitor_process, daemon=True)
+        monitor_thread = threading.Thread(target=monitor_process, daemon=True, name=f'monitor-{self.name}')
         monitor_thread.start()
     
     def stop(self):
@@ -1173,15 +3933,21 @@ def add_user():
     }
     if not username or not password or len(password) < 8:
         return render_template('settings/users.html', error='Dati non validi (password min 8)', users=load_users(), current_user=session.get('user'))
-    users = load_users()
-    if username in users:
+    password_hash = generate_password_hash(password)
+    exists = []
+
+    def apply(users):
+        if username in users:
+            exists.append(True)
+            return
+        users[username] = {
+            'password_hash': password_hash,
+            'role': 'user',
+            'permissions': perms
+        }
+    users = user_store.update(apply)
+    if exists:
         return render_template('settings/users.html', error='Utente già esistente', users=users, current_user=session.get('user'))
-    users[username] = {
-        'password_hash': generate_password_hash(password),
-        'role': 'user',
-        'permissions': perms
-    }
-    save_users(users)
     return render_template('settings/users.html', success='Utente creato', users=users, current_user=session.get('user'))
 
 @app.route('/settings/users/update', methods=['POST'])
@@ -1191,10 +3957,7 @@ def update_user_permissions():
     username = request.form.get('username')
     if not username:
         return render_template('settings/users.html', error='Utente non specificato', users=load_users(), current_user=session.get('user'))
-    users = load_users()
-    if username not in users:
-        return render_template('settings/users.html', error='Utente inesistente', users=users, current_user=session.get('user'))
-    users[username]['permissions'] = {
+    perms = {
         'servers_control': request.form.get('servers_control') == 'on',
         'files_access': request.form.get('files_access') == 'on',
         'players_access': request.form.get('players_access') == 'on',
@@ -1204,7 +3967,16 @@ def update_user_permissions():
         'backup_access': request.form.get('backup_access') == 'on',
         'server_stats_access': request.form.get('server_stats_access') == 'on'
     }
-    save_users(users)
+    missing = []
+
+    def apply(users):
+        if username not in users:
+            missing.append(True)
+            return
+        users[username]['permissions'] = perms
+    users = user_store.update(apply)
+    if missing:
+        return render_template('settings/users.html', error='Utente inesistente', users=users, current_user=session.get('user'))
     return render_template('settings/users.html', success='Permessi aggiornati', users=users, current_user=session.get('user'))
 
 @app.route('/settings/users/delete', methods=['POST'])
@@ -1212,12 +3984,15 @@ def delete_user():
     if session.get('user') != 'admin':
         abort(403)
     username = request.form.get('username')
-    users = load_users()
     if username == 'admin':
-        return render_template('settings/users.html', error='Non è possibile eliminare admin', users=users, current_user=session.get('user'))
-    if username in users:
-        del users[username]
-        save_users(users)
+        return render_template('settings/users.html', error='Non è possibile eliminare admin', users=load_users(), current_user=session.get('user'))
+    removed = []
+
+    def apply(users):
+        if users.pop(username, None) is not None:
+            removed.append(True)
+    users = user_store.update(apply)
+    if removed:
         return render_template('settings/users.html', success='Utente eliminato', users=users, current_user=session.get('user'))
     return render_template('settings/users.html', error='Utente inesistente', users=users, current_user=session.get('user'))
 
@@ -1246,24 +4021,257 @@ def server_detail(server_name):
 
 # ===================== SPIGET PROXY ENDPOINTS =====================
 SPIGET_BASE = "https://api.spiget.org/v2"
+SPIGET_TIMEOUT = (5, 10)
+# Risposte JSON in memoria: fresche per SPIGET_CACHE_TTL, poi servite ancora
+# fino a SPIGET_CACHE_STALE_MAX mentre un thread le aggiorna
+SPIGET_CACHE_TTL = float(os.environ.get('MINEBOARD_SPIGET_TTL', '300'))
+SPIGET_CACHE_STALE_MAX = 3600.0
+SPIGET_CACHE_MAX_ENTRIES = 512
+SPIGET_LIST_FIELDS = 'id,name,tag,downloads,rating,testedVersions,icon,premium,updateDate'
+# Indice locale opzionale delle risorse più scaricate (ricerca e lista senza rete)
+SPIGET_INDEX_ENABLED = os.environ.get('MINEBOARD_SPIGET_INDEX', '').strip().lower() in ('1', 'true', 'yes')
+SPIGET_INDEX_SIZE = int(os.environ.get('MINEBOARD_SPIGET_INDEX_SIZE', '2000'))
+SPIGET_INDEX_INTERVAL = float(os.environ.get('MINEBOARD_SPIGET_INDEX_INTERVAL', '86400'))
+SPIGET_INDEX_FILE = os.path.join(os.getcwd(), 'cache', 'spiget_index.json')
+SPIGET_INDEX_PAGE_SIZE = 100
+# Filtro ?mc= senza indice: Spiget pagina prima del filtro, quindi si leggono
+# pagine upstream più grandi finché la pagina filtrata è piena
+SPIGET_FILTER_PAGE_SIZE = 100
+SPIGET_FILTER_MAX_PAGES = 10
+SPIGET_MC_VERSION_RE = re.compile(r'^\d+\.\d+(?:\.\d+)?$')
 
 def spiget_get(path, params=None, stream=False):
     url = f"{SPIGET_BASE}{path}"
-    r = requests.get(url, params=params or {}, timeout=30, stream=stream)
+    r = http_get(url, params=params or {}, stream=stream)
     r.raise_for_status()
     return r
 
+class SpigetCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}  # chiave -> {'data', 'stored_at'}
+        self.fetch_locks = {}
+        self.refreshing = set()
+
+    @staticmethod
+    def key(path, params):
+        return path + '?' + urllib.parse.urlencode(sorted((params or {}).items()))
+
+    def _fetch(self, key, path, params):
+        r = http_get(f"{SPIGET_BASE}{path}", params=params or {}, timeout=SPIGET_TIMEOUT)
+        r.raise_for_status()
+        data = r.json()
+        with self.lock:
+            self.entries[key] = {'data': data, 'stored_at': time.time()}
+            if len(self.entries) > SPIGET_CACHE_MAX_ENTRIES:
+                oldest = min(self.entries, key=lambda k: self.entries[k]['stored_at'])
+                del self.entries[oldest]
+        return data
+
+    def _revalidate(self, key, path, params):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def worker():
+            try:
+                self._fetch(key, path, params)
+            except Exception as e:
+                print(f"Aggiornamento cache Spiget {key} fallito: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+        threading.Thread(target=worker, daemon=True, name='spiget-refresh').start()
+
+    def get(self, path, params=None):
+        """JSON di path dalla cache (aggiornato in background se scaduto) o da Spiget.
+
+        Richieste identiche contemporanee fanno una sola chiamata upstream.
+        """
+        key = self.key(path, params)
+        with self.lock:
+            entry = self.entries.get(key)
+        age = time.time() - entry['stored_at'] if entry else None
+        if entry and age <= SPIGET_CACHE_TTL:
+            return entry['data']
+        if entry and age <= SPIGET_CACHE_STALE_MAX:
+            self._revalidate(key, path, params)
+            return entry['data']
+        with self.lock:
+            fetch_lock = self.fetch_locks.setdefault(key, threading.Lock())
+        with fetch_lock:
+            with self.lock:
+                entry = self.entries.get(key)
+            if entry and time.time() - entry['stored_at'] <= SPIGET_CACHE_TTL:
+                return entry['data']
+            try:
+                return self._fetch(key, path, params)
+            except Exception:
+                # Spiget non raggiungibile o limitato: meglio dati vecchi che nessuno
+                if entry:
+                    return entry['data']
+                raise
+            finally:
+                with self.lock:
+                    self.fetch_locks.pop(key, None)
+
+spiget_cache = SpigetCache()
+
+def spiget_mc_filter(mc_version, jar_type=None):
+    """Versione major.minor su cui filtrare i plugin, o None se il filtro non ha senso.
+
+    I proxy (Velocity, BungeeCord, ...) hanno versioni proprie (3.4.0-SNAPSHOT)
+    che non vanno confrontate con le versioni Minecraft dichiarate su Spiget.
+    """
+    jar_type = (jar_type or '').strip().lower()
+    if jar_type in CENTROJARS_TYPES['proxies'] or jar_type in MCUTILS_TYPES['proxies']:
+        return None
+    mc_version = str(mc_version or '').strip()
+    if not SPIGET_MC_VERSION_RE.match(mc_version):
+        return None
+    return '.'.join(mc_version.split('.')[:2])
+
+def spiget_tested_for(resource, mc_version):
+    """True se la risorsa dichiara di essere testata sulla versione major.minor mc_version.
+
+    Le risorse senza testedVersions restano visibili: molte non le compilano.
+    """
+    tested = resource.get('testedVersions') or []
+    if not mc_version or not tested:
+        return True
+    return any(str(v) == mc_version or str(v).startswith(mc_version + '.') for v in tested)
+
+def spiget_filtered_page(path, params, mc_version, size, page):
+    """Pagina page (di size risorse) di path filtrata con spiget_tested_for.
+
+    Spiget pagina prima del filtro: si leggono pagine upstream da
+    SPIGET_FILTER_PAGE_SIZE (in cache) finché ci sono abbastanza risultati,
+    al massimo SPIGET_FILTER_MAX_PAGES.
+    """
+    if not mc_version:
+        return spiget_cache.get(path, dict(params, size=size, page=page))
+    found = []
+    for upstream_page in range(1, SPIGET_FILTER_MAX_PAGES + 1):
+        data = spiget_cache.get(path, dict(params, size=SPIGET_FILTER_PAGE_SIZE, page=upstream_page))
+        found.extend(r for r in data if spiget_tested_for(r, mc_version))
+        if len(found) >= page * size or len(data) < SPIGET_FILTER_PAGE_SIZE:
+            break
+    return found[(page - 1) * size:page * size]
+
+def spiget_index_entry(resource):
+    rating = resource.get('rating') or {}
+    name = resource.get('name') or ''
+    tag = resource.get('tag') or ''
+    return {
+        'id': resource.get('id'),
+        'name': name,
+        'tag': tag,
+        'downloads': resource.get('downloads') or 0,
+        'rating': {'average': rating.get('average') or 0, 'count': rating.get('count') or 0},
+        'testedVersions': resource.get('testedVersions') or [],
+        'icon': resource.get('icon'),
+        'premium': bool(resource.get('premium')),
+        'updateDate': resource.get('updateDate'),
+        '_text': f'{name} {tag}'.lower(),
+    }
+
+class SpigetIndex:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.resources = None  # ordinate per downloads desc
+        self.built_at = None
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            resources = [spiget_index_entry(r) for r in data.get('resources') or []]
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Indice Spiget non leggibile: {e}")
+            return False
+        resources.sort(key=lambda r: r['downloads'], reverse=True)
+        with self.lock:
+            self.resources = resources
+            self.built_at = data.get('built_at')
+        return True
+
+    @property
+    def ready(self):
+        return self.resources is not None
+
+    def build(self):
+        """Scarica le SPIGET_INDEX_SIZE risorse più scaricate e sostituisce l'indice."""
+        collected = {}
+        page = 1
+        while len(collected) < SPIGET_INDEX_SIZE:
+            r = http_get(f"{SPIGET_BASE}/resources", timeout=SPIGET_TIMEOUT, params={
+                'size': SPIGET_INDEX_PAGE_SIZE, 'page': page, 'sort': '-downloads', 'fields': SPIGET_LIST_FIELDS,
+            })
+            r.raise_for_status()
+            batch = r.json()
+            if not batch:
+                break
+            for r in batch:
+                collected.setdefault(r.get('id'), r)
+            page += 1
+        raw = sorted(collected.values(), key=lambda r: r.get('downloads') or 0, reverse=True)[:SPIGET_INDEX_SIZE]
+        built_at = datetime.now(timezone.utc).isoformat()
+        write_json_atomic(self.path, {'built_at': built_at, 'resources': raw})
+        resources = [spiget_index_entry(r) for r in raw]
+        with self.lock:
+            self.resources = resources
+            self.built_at = built_at
+        return len(resources)
+
+    def query(self, q='', mc_version=None, size=20, page=1):
+        """Pagina di risorse che contengono tutte le parole di q (nome/tag), per downloads desc."""
+        with self.lock:
+            resources = self.resources or []
+        words = q.lower().split()
+        matches = [r for r in resources
+                   if all(w in r['_text'] for w in words) and spiget_tested_for(r, mc_version)]
+        start = max(0, (page - 1) * size)
+        return [{k: v for k, v in r.items() if k != '_text'} for r in matches[start:start + size]]
+
+spiget_index = SpigetIndex(SPIGET_INDEX_FILE)
+
+def background_spiget_indexer():
+    if spiget_index.load():
+        print(f"[SPIGET] Indice locale caricato: {len(spiget_index.resources)} risorse")
+    while True:
+        try:
+            built_at = spiget_index.built_at
+            age = (datetime.now(timezone.utc) - datetime.fromisoformat(built_at)).total_seconds() if built_at else None
+            if age is None or age >= SPIGET_INDEX_INTERVAL:
+                count = spiget_index.build()
+                print(f"[SPIGET] Indice locale aggiornato: {count} risorse")
+        except Exception as e:
+            print(f"Errore aggiornamento indice Spiget: {e}")
+        time.sleep(max(600.0, min(SPIGET_INDEX_INTERVAL, 3600.0)))
+
+def spiget_list_args():
+    size = max(1, min(100, int(request.args.get('size', 20))))
+    page = max(1, int(request.args.get('page', 1)))
+    mc_version = spiget_mc_filter(request.args.get('mc'), request.args.get('type'))
+    return size, page, mc_version
+
 @app.route('/api/spiget/resources')
 def spiget_resources():
-    """Lista risorse (proxy) ordinata per downloads desc lato server."""
-    try:
-        size = int(request.args.get('size', 20))
-        page = int(request.args.get('page', 1))
-        res = spiget_get('/resources', params={'size': size, 'page': page})
-        data = res.json()
-        # Ordina per downloads desc se presente
-        data.sort(key=lambda x: x.get('downloads', 0), reverse=True)
-        return jsonify({'success': True, 'resources': data})
+    """Lista risorse per downloads desc: dall'indice locale se attivo, altrimenti Spiget (in cache).
+    ?mc=<versione> tiene solo le risorse testate su quella versione (o senza versioni dichiarate);
+    ?type=<tipo JAR> disattiva il filtro per i proxy."""
+    try:
+        size, page, mc_version = spiget_list_args()
+        if spiget_index.ready:
+            return jsonify({'success': True, 'source': 'index',
+                            'resources': spiget_index.query('', mc_version, size, page)})
+        data = spiget_filtered_page('/resources', {'sort': '-downloads', 'fields': SPIGET_LIST_FIELDS},
+                                    mc_version, size, page)
+        return jsonify({'success': True, 'source': 'spiget', 'resources': data})
     except requests.HTTPError as he:
         code = he.response.status_code if getattr(he, 'response', None) is not None else 502
         return jsonify({'success': False, 'message': f'Errore Spiget: HTTP {code}'}), code
@@ -1272,24 +4280,69 @@ def spiget_resources():
 
 @app.route('/api/spiget/search')
 def spiget_search():
-    """Ricerca risorse per query, ordinate per downloads desc lato server."""
+    """Ricerca risorse per query, per downloads desc. L'indice locale risponde per le risorse
+    popolari; se non trova nulla si interroga Spiget (in cache). ?mc=<versione> come sopra."""
     try:
         q = request.args.get('q', '').strip()
-        size = int(request.args.get('size', 20))
-        page = int(request.args.get('page', 1))
+        size, page, mc_version = spiget_list_args()
         if not q:
             return jsonify({'success': True, 'resources': []})
-        # Spiget search endpoint
-        res = spiget_get(f"/search/resources/{urllib.parse.quote(q)}", params={'size': size, 'page': page})
-        data = res.json()
-        data.sort(key=lambda x: x.get('downloads', 0), reverse=True)
-        return jsonify({'success': True, 'resources': data})
+        if spiget_index.ready:
+            found = spiget_index.query(q, mc_version, size, page)
+            if found or page > 1:
+                return jsonify({'success': True, 'source': 'index', 'resources': found})
+        data = spiget_filtered_page(f"/search/resources/{urllib.parse.quote(q)}",
+                                    {'sort': '-downloads', 'fields': SPIGET_LIST_FIELDS}, mc_version, size, page)
+        return jsonify({'success': True, 'source': 'spiget', 'resources': data})
     except requests.HTTPError as he:
         code = he.response.status_code if getattr(he, 'response', None) is not None else 502
         return jsonify({'success': False, 'message': f'Errore Spiget: HTTP {code}'}), code
     except Exception as e:
         return jsonify({'success': False, 'message': f'Errore Spiget: {str(e)}'}), 500
 
+@app.route('/api/spiget/index', methods=['GET', 'POST'])
+def spiget_index_status():
+    """Stato dell'indice Spiget locale (GET) o ricostruzione immediata in background (POST). Solo admin."""
+    if not is_admin_user():
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    if request.method == 'POST':
+        threading.Thread(target=spiget_index.build, daemon=True, name='spiget-index').start()
+        return jsonify({'success': True, 'message': 'Ricostruzione indice avviata'}), 202
+    return jsonify({'success': True, 'enabled': SPIGET_INDEX_ENABLED, 'ready': spiget_index.ready,
+                    'built_at': spiget_index.built_at,
+                    'resources': len(spiget_index.resources) if spiget_index.ready else 0})
+
+def fetch_spiget_plugin(resource_id):
+    """Porta nella cache artefatti l'ultima versione di una risorsa Spiget.
+
+    Ritorna {'resource_id', 'name', 'sha256', 'filename'} con filename già
+    sicuro e terminante in .jar. Solleva requests.HTTPError o DownloadError.
+    """
+    # Ottieni informazioni sul plugin per il nome reale
+    plugin_data = spiget_get(f"/resources/{resource_id}").json()
+    plugin_name = plugin_data.get('name', f'plugin-{resource_id}')
+    version_id = (plugin_data.get('version') or {}).get('id')
+    # Senza id versione non si può sapere se il file è cambiato: niente cache
+    cache_key = artifact_cache.key('spiget', resource_id, version_id) if version_id else None
+    sha = artifact_cache.lookup(cache_key)
+
+    # Determina filename da Content-Disposition, altrimenti usa il nome del plugin
+    filename = f"{plugin_name}.jar"
+    if sha:
+        filename = (artifact_cache.entry(cache_key) or {}).get('filename') or filename
+    else:
+        # L'endpoint download redirige al jar: URL finale e nome file arrivano
+        # dalla richiesta di prova di fetch_to_file, senza GET in più
+        sha, result = artifact_cache.fetch(f"{SPIGET_BASE}/resources/{resource_id}/download", cache_key,
+                                           kind='plugin')
+        filename = result.get('filename') or filename
+        if cache_key:
+            artifact_cache.annotate(cache_key, filename=filename)
+    # Assicura estensione jar
+    if not filename.lower().endswith('.jar'):
+        filename += '.jar'
+    return {'resource_id': resource_id, 'name': plugin_name, 'sha256': sha, 'filename': secure_filename(filename)}
+
 @app.route('/api/servers/<server_name>/plugins/download', methods=['POST'])
 def download_plugin(server_name):
     """Scarica un plugin Spiget nella cartella plugins del server."""
@@ -1304,66 +4357,74 @@ def download_plugin(server_name):
         if not resource_id:
             return jsonify({'success': False, 'message': 'resource_id mancante'}), 400
 
-        # Ottieni informazioni sul plugin per il nome reale
-        plugin_info = spiget_get(f"/resources/{resource_id}")
-        plugin_data = plugin_info.json()
-        plugin_name = plugin_data.get('name', f'plugin-{resource_id}')
-        
-        # Scarica il file (proxy) – usa endpoint download che redirige al jar
-        r = spiget_get(f"/resources/{resource_id}/download", stream=True)
-
-        # Determina filename da Content-Disposition, altrimenti usa il nome del plugin
-        filename = f"{plugin_name}.jar"
-        cd = r.headers.get('Content-Disposition') or r.headers.get('content-disposition')
-        if cd and 'filename=' in cd:
-            filename = cd.split('filename=')[-1].strip('"')
-        # Assicura estensione jar
-        if not filename.lower().endswith('.jar'):
-            filename += '.jar'
-
+        plugin = fetch_spiget_plugin(resource_id)
         plugins_dir = os.path.join(server_path, 'plugins')
         os.makedirs(plugins_dir, exist_ok=True)
-        out_path = os.path.join(plugins_dir, secure_filename(filename))
-
-        with open(out_path, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+        out_path = os.path.join(plugins_dir, plugin['filename'])
+        artifact_cache.install(plugin['sha256'], out_path)
 
         return jsonify({'success': True, 'message': f'Plugin salvato in plugins/{os.path.basename(out_path)}'})
     except requests.HTTPError as he:
         return jsonify({'success': False, 'message': f'Errore download: HTTP {he.response.status_code}'}), 502
+    except DownloadError as e:
+        return jsonify({'success': False, 'message': f'Errore download: {str(e)}'}), 502
     except Exception as e:
         return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
 
+def list_server_configs():
+    """Configurazione + stato di ogni server, dal registro in memoria."""
+    servers = []
+    # Con inotify attivo le config in cache vengono invalidate alla scrittura,
+    # altrimenti si rivalida con uno stat (il JSON viene riletto solo se cambiato)
+    revalidate = not server_registry.live
+    for name in server_registry.names():
+        config = server_config_store.get(name, revalidate=revalidate)
+        
+        # Controlla se il server è in esecuzione
+        if name in running_servers:
+            config['status'] = running_servers[name].status
+        config['disk_usage'] = disk_usage_index.get(name)
+    
+        servers.append(config)
+    return servers
+
+def filter_server_configs(servers, args):
+    """Filtri di /api/servers: type (platform), status, q (sottostringa del nome)."""
+    platform = (args.get('type') or '').strip().lower()
+    status = (args.get('status') or '').strip().lower()
+    q = (args.get('q') or '').strip().lower()
+    if platform:
+        servers = [s for s in servers if str(s.get('platform') or 'minecraft').lower() == platform]
+    if status:
+        servers = [s for s in servers if str(s.get('status') or 'stopped').lower() == status]
+    if q:
+        servers = [s for s in servers if q in str(s.get('name') or '').lower()]
+    return servers
+
 @app.route('/api/servers', methods=['GET'])
 def get_servers():
+    """Lista server. Filtri opzionali type/status/q, paginazione con offset/limit
+    (il totale filtrato è nell'header X-Total-Count) ed ETag sul contenuto."""
     try:
-        os.makedirs(SERVER_DIR, exist_ok=True)
-        servers = []
-        for name in os.listdir(SERVER_DIR):
-            server_path = os.path.join(SERVER_DIR, name)
-            if os.path.isdir(server_path):
-                # Carica configurazione server se esiste
-                config_file = os.path.join(server_path, 'server_config.json')
-                config = {
-                    'name': name,
-                    'port': 25565,
-                    'jar_file': 'server.jar',
-                    'max_memory': '1G',
-                    'status': 'stopped'
-                }
-                
-                if os.path.exists(config_file):
-                    with open(config_file, 'r') as f:
-                        config.update(json.load(f))
-                
-                # Controlla se il server è in esecuzione
-                if name in running_servers:
-                    config['status'] = running_servers[name].status
-            
-                servers.append(config)
-        return jsonify(servers)
+        servers = filter_server_configs(list_server_configs(), request.args)
+        total = len(servers)
+        try:
+            offset = max(0, int(request.args.get('offset', 0)))
+            limit = request.args.get('limit')
+            limit = max(0, int(limit)) if limit not in (None, '') else None
+        except ValueError:
+            return jsonify({'success': False, 'message': 'offset/limit non validi'}), 400
+        servers = servers[offset:offset + limit] if limit is not None else servers[offset:]
+        body = json.dumps(servers, sort_keys=True, separators=(',', ':'))
+        etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+        if etag in request.if_none_match:
+            resp = app.response_class(status=304)
+        else:
+            resp = app.response_class(body, mimetype='application/json')
+        resp.set_etag(etag)
+        resp.headers['X-Total-Count'] = str(total)
+        resp.headers['Cache-Control'] = 'no-cache'
+        return resp
     except Exception as e:
         return jsonify([])
 
@@ -1407,8 +4468,7 @@ def import_server():
         shutil.copytree(source_path, dest_path)
 
         # Crea un file di configurazione minimale se non presente
-        config_file = os.path.join(dest_path, 'server_config.json')
-        if not os.path.exists(config_file):
+        if not server_config_store.exists(target_name):
             cfg = {
                 'name': target_name,
                 'port': 25565,
@@ -1423,8 +4483,8 @@ def import_server():
                     cfg['jar_file'] = jars[0]
             except Exception:
                 pass
-            with open(config_file, 'w') as f:
-                json.dump(cfg, f, indent=2)
+            server_config_store.save(target_name, cfg)
+        server_registry.add(target_name)
 
         return jsonify({'success': True, 'message': f"Server importato come '{target_name}'"})
     except Exception as e:
@@ -1690,10 +4750,13 @@ def create_server():
             'platform': platform,
             'status': 'stopped'
         }
+        # Tipo/versione del JAR se noti al client (download dalla creazione guidata)
+        for key in ('jar_type', 'jar_version'):
+            if isinstance(data.get(key), str) and data[key].strip():
+                config[key] = data[key].strip().lower() if key == 'jar_type' else data[key].strip()
         
-        config_file = os.path.join(server_path, 'server_config.json')
-        with open(config_file, 'w') as f:
-            json.dump(config, f, indent=2)
+        server_config_store.save(name, config)
+        server_registry.add(name)
         
         return jsonify({'success': True, 'message': 'Server creato con successo'})
         
@@ -1710,6 +4773,7 @@ def create_temp_server():
         temp_path = os.path.join(SERVER_DIR, temp_name)
         
         os.makedirs(temp_path, exist_ok=True)
+        server_registry.add(temp_name)
         
         return jsonify({'success': True, 'temp_name': temp_name, 'message': 'Cartella temporanea creata'})
         
@@ -1738,15 +4802,12 @@ def rename_temp_server():
         
         # Rinomina la cartella
         os.rename(temp_path, final_path)
+        server_registry.remove(temp_name)
+        server_registry.add(final_name)
         
         # Aggiorna il file di configurazione se esiste
-        config_file = os.path.join(final_path, 'server_config.json')
-        if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                config = json.load(f)
-            config['name'] = final_name
-            with open(config_file, 'w') as f:
-                json.dump(config, f, indent=2)
+        if server_config_store.exists(final_name):
+            server_config_store.update(final_name, lambda cfg: cfg.update(name=final_name))
         
         return jsonify({'success': True, 'message': 'Server rinominato con successo'})
         
@@ -1780,6 +4841,22 @@ def move_jar_from_temp():
         
         if os.path.exists(temp_jar_path):
             shutil.move(temp_jar_path, final_jar_path)
+            # Tipo/versione registrati da install_jar_job nella cartella temporanea
+            try:
+                with open(os.path.join(temp_path, JAR_WIZARD_INFO_FILE), 'r') as f:
+                    jar_info = json.load(f)
+            except (OSError, ValueError):
+                jar_info = None
+            if jar_info and jar_info.get('jar_file') == jar_filename and server_config_store.exists(final_name):
+                def apply(cfg):
+                    if cfg.get('jar_file') == jar_filename:
+                        cfg['jar_type'] = jar_info.get('jar_type')
+                        cfg['jar_version'] = jar_info.get('jar_version')
+                        if jar_info.get('jar_build'):
+                            cfg['jar_build'] = jar_info['jar_build']
+                        else:
+                            cfg.pop('jar_build', None)
+                server_config_store.update(final_name, apply)
             # Webhook: JAR aggiornato
             try:
                 send_discord_webhook(final_name, 'jar_updated', f"Eseguibile del server aggiornato: {jar_filename}")
@@ -1787,11 +4864,13 @@ def move_jar_from_temp():
                 print(f"Errore webhook jar_updated: {e}")
             # Pulisci la cartella temporanea
             shutil.rmtree(temp_path)
+            server_registry.remove(temp_name)
             
             return jsonify({'success': True, 'message': 'JAR spostato con successo'})
         else:
             # Se non c'è JAR da spostare, pulisci comunque la cartella temporanea
             shutil.rmtree(temp_path)
+            server_registry.remove(temp_name)
             return jsonify({'success': True, 'message': 'Cartella temporanea pulita'})
         
     except Exception as e:
@@ -1907,13 +4986,10 @@ def update_server_properties(server_name):
 @app.route('/api/servers/<server_name>/config', methods=['GET'])
 def get_server_config(server_name):
     """Ottiene la configurazione interna del server (server_config.json)"""
-    server_path = os.path.join(SERVER_DIR, server_name)
-    config_file = os.path.join(server_path, 'server_config.json')
-    if not os.path.exists(server_path) or not os.path.exists(config_file):
+    if not server_config_store.exists(server_name):
         return jsonify({'success': False, 'message': 'Server non trovato'}), 404
     try:
-        with open(config_file, 'r') as f:
-            cfg = json.load(f)
+        cfg = server_config_store.get(server_name)
         return jsonify({'success': True, 'config': cfg})
     except Exception as e:
         return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
@@ -1921,15 +4997,11 @@ def get_server_config(server_name):
 @app.route('/api/servers/<server_name>/config', methods=['POST'])
 def update_server_config(server_name):
     """Aggiorna parti della configurazione interna del server (es. max_memory)"""
-    server_path = os.path.join(SERVER_DIR, server_name)
-    config_file = os.path.join(server_path, 'server_config.json')
-    if not os.path.exists(server_path) or not os.path.exists(config_file):
+    if not server_config_store.exists(server_name):
         return jsonify({'success': False, 'message': 'Server non trovato'}), 404
-    try:
-        data = request.get_json() or {}
-        with open(config_file, 'r') as f:
-            cfg = json.load(f)
+    data = request.get_json() or {}
 
+    def apply(cfg):
         # Consenti aggiornare solo alcuni campi in modo sicuro
         if 'max_memory' in data:
             cfg['max_memory'] = str(data['max_memory']).strip()
@@ -1944,9 +5016,16 @@ def update_server_config(server_name):
             cfg['use_custom_start'] = bool(data['use_custom_start'])
         if 'custom_start_cmd' in data:
             cfg['custom_start_cmd'] = str(data['custom_start_cmd']).strip()
+        if 'gc_logging' in data:
+            cfg['gc_logging'] = bool(data['gc_logging'])
+        if 'disk_quota_mb' in data:
+            try:
+                cfg['disk_quota_mb'] = max(0, int(data['disk_quota_mb'] or 0))
+            except Exception:
+                pass
 
-        with open(config_file, 'w') as f:
-            json.dump(cfg, f, indent=2)
+    try:
+        cfg = server_config_store.update(server_name, apply)
         return jsonify({'success': True, 'message': 'Configurazione aggiornata', 'config': cfg})
     except Exception as e:
         return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
@@ -1985,27 +5064,30 @@ def check_eula(server_name):
     
     return jsonify({'success': True, 'eula_accepted': eula_accepted})
 
-@app.route('/api/servers/<server_name>/start', methods=['POST'])
-def start_server(server_name):
-    if not has_permission('servers_control'):
-        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
-    config_file = os.path.join(SERVER_DIR, server_name, 'server_config.json')
-    if not os.path.exists(config_file):
-        return jsonify({'success': False, 'message': 'Server non trovato'}), 404
-    
-    with open(config_file, 'r') as f:
-        config = json.load(f)
-    
-    server = MinecraftServer(
+def build_minecraft_server(config):
+    return MinecraftServer(
         config['name'],
         config['port'],
         config['jar_file'],
         config['max_memory'],
         config.get('platform', 'minecraft'),
         config.get('use_custom_start', False),
-        config.get('custom_start_cmd', '')
+        config.get('custom_start_cmd', ''),
+        config.get('gc_logging', False)
     )
+
+@app.route('/api/servers/<server_name>/start', methods=['POST'])
+def start_server(server_name):
+    if not has_permission('servers_control'):
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    if not server_config_store.exists(server_name):
+        return jsonify({'success': False, 'message': 'Server non trovato'}), 404
     
+    try:
+        config = server_config_store.get(server_name, strict=True)
+    except ServerConfigError as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    server = build_minecraft_server(config)
     success, message = server.start()
     
     if not success and message == "EULA_NOT_ACCEPTED":
@@ -2061,20 +5143,26 @@ def save_webhook_config(server_name):
         return jsonify({'success': False, 'message': 'Permesso negato'}), 403
     try:
         data = request.get_json() or {}
-        cfg = load_server_internal_config(server_name)
-        wb = cfg.get('webhook', {})
         url = (data.get('url') or '').strip()
         triggers = data.get('triggers') or {}
         player_match_username = (data.get('player_match_username') or '').strip()
-        if url is not None:
-            wb['url'] = url
-        wb.setdefault('triggers', {})
-        for key in ['server_started','server_stopped','server_crashed','backup_completed','jar_updated','command_received','server_terminated','player_join_match']:
-            if key in triggers:
-                wb['triggers'][key] = bool(triggers[key])
-        wb['player_match_username'] = player_match_username
-        cfg['webhook'] = wb
-        ok = save_server_internal_config(server_name, cfg)
+
+        def apply(cfg):
+            wb = cfg.get('webhook', {})
+            if url is not None:
+                wb['url'] = url
+            wb.setdefault('triggers', {})
+            for key in WEBHOOK_TRIGGERS:
+                if key in triggers:
+                    wb['triggers'][key] = bool(triggers[key])
+            wb['player_match_username'] = player_match_username
+            cfg['webhook'] = wb
+        try:
+            server_config_store.update(server_name, apply)
+            ok = True
+        except Exception as e:
+            print(f"Errore nel salvataggio config server {server_name}: {e}")
+            ok = False
         return jsonify({'success': ok, 'message': 'Configurazione webhook salvata' if ok else 'Salvataggio fallito'})
     except Exception as e:
         return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
@@ -2089,6 +5177,326 @@ def test_webhook(server_name):
     except Exception as e:
         return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
 
+# ===================== PAGED FILE READS =====================
+# Lettura a finestre per l'editor: per byte (offset/length, allineati a UTF-8)
+# o per righe (start_line/lines, negativo = dalla fine). Per le righe si tiene
+# un indice sparso con l'offset di una riga ogni FILE_LINE_INDEX_STEP, costruito
+# con mmap e aggiornato in modo incrementale se il file è cresciuto in coda
+# (log), così aprire la riga N di un file da 40 MB non rilegge tutto il file.
+EDITOR_MAX_PAGE_BYTES = 4 * 1024 * 1024
+EDITOR_MAX_PAGE_LINES = 20000
+FILE_LINE_INDEX_STEP = 1000
+FILE_LINE_INDEX_MAX = 64  # file indicizzati tenuti in memoria
+FILE_FINGERPRINT_BYTES = 4096
+
+file_line_index_lock = threading.Lock()
+file_line_indexes = {}  # percorso -> indice (vedi file_line_index)
+
+def decode_utf8_window(data, at_start):
+    """Decodifica data scartando i byte di un carattere UTF-8 tagliato ai bordi.
+
+    Ritorna (testo, byte saltati all'inizio, byte usati) o None se non è testo UTF-8.
+    """
+    skip = 0
+    if not at_start:
+        while skip < min(3, len(data)) and 0x80 <= data[skip] <= 0xBF:
+            skip += 1
+    for cut in range(0, min(4, len(data) - skip + 1)):
+        try:
+            return data[skip:len(data) - cut].decode('utf-8'), skip, len(data) - skip - cut
+        except UnicodeDecodeError as e:
+            # Solo un carattere incompleto in coda è accettabile
+            if e.end < len(data) - skip - cut:
+                return None
+    return None
+
+def read_file_window(path, offset, length):
+    """Finestra di byte [offset, offset+length) di path come testo."""
+    size = os.path.getsize(path)
+    offset = max(0, min(offset, size))
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    decoded = decode_utf8_window(data, offset == 0)
+    if decoded is None:
+        return None
+    text, skipped, used = decoded
+    start = offset + skipped
+    return {'content': text, 'offset': start, 'length': used, 'next_offset': start + used,
+            'size': size, 'eof': start + used >= size}
+
+def _file_fingerprint(f, end):
+    """Hash dei primi e degli ultimi FILE_FINGERPRINT_BYTES prima di end: riconosce un file cresciuto solo in coda."""
+    h = hashlib.sha1()
+    f.seek(0)
+    h.update(f.read(min(end, FILE_FINGERPRINT_BYTES)))
+    f.seek(max(0, end - FILE_FINGERPRINT_BYTES))
+    h.update(f.read(end - max(0, end - FILE_FINGERPRINT_BYTES)))
+    return h.hexdigest()
+
+def file_line_index(path):
+    """Indice sparso delle righe di path.
+
+    {'marks': offset delle righe 0, STEP, 2*STEP, ..., 'lines': righe concluse
+    da un a capo, 'scanned': byte fino all'ultimo a capo, 'size', 'mtime_ns', 'fingerprint'}.
+    """
+    import mmap
+    st = os.stat(path)
+    with file_line_index_lock:
+        idx = file_line_indexes.get(path)
+    if idx and idx['mtime_ns'] == st.st_mtime_ns and idx['size'] == st.st_size:
+        return idx
+    with open(path, 'rb') as f:
+        # Cresciuto solo in coda (log): si riparte dall'ultima riga conclusa
+        if idx and st.st_size >= idx['size'] and _file_fingerprint(f, idx['scanned']) == idx['fingerprint']:
+            idx = dict(idx, marks=list(idx['marks']))
+        else:
+            idx = {'marks': [0], 'lines': 0, 'scanned': 0}
+        if st.st_size > idx['scanned']:
+            with mmap.mmap(f.fileno(), st.st_size, access=mmap.ACCESS_READ) as mm:
+                pos, lines, marks = idx['scanned'], idx['lines'], idx['marks']
+                while True:
+                    nl = mm.find(b'\n', pos)
+                    if nl < 0:
+                        break
+                    lines += 1
+                    pos = nl + 1
+                    if lines % FILE_LINE_INDEX_STEP == 0:
+                        marks.append(pos)
+                idx['lines'], idx['scanned'] = lines, pos
+        idx.update(size=st.st_size, mtime_ns=st.st_mtime_ns, fingerprint=_file_fingerprint(f, idx['scanned']))
+    with file_line_index_lock:
+        file_line_indexes.pop(path, None)
+        file_line_indexes[path] = idx
+        while len(file_line_indexes) > FILE_LINE_INDEX_MAX:
+            file_line_indexes.pop(next(iter(file_line_indexes)))
+    return idx
+
+def read_file_lines(path, start_line, count):
+    """Righe [start_line, start_line+count) di path; start_line negativo conta dalla fine."""
+    idx = file_line_index(path)
+    size = idx['size']
+    total = idx['lines'] + (1 if size > idx['scanned'] else 0)
+    if start_line < 0:
+        start_line = max(0, total + start_line)
+    start_line = min(start_line, total)
+    with open(path, 'rb') as f:
+        # Un'ultima riga senza a capo non ha un mark proprio: si parte dall'ultimo noto
+        mark = min(start_line // FILE_LINE_INDEX_STEP, len(idx['marks']) - 1)
+        f.seek(idx['marks'][mark])
+        for _ in range(start_line - mark * FILE_LINE_INDEX_STEP):
+            f.readline()
+        begin = f.tell()
+        chunks, read_lines, read_bytes = [], 0, 0
+        while read_lines < count and read_bytes < EDITOR_MAX_PAGE_BYTES:
+            line = f.readline()
+            if not line:
+                break
+            chunks.append(line)
+            read_lines += 1
+            read_bytes += len(line)
+    try:
+        text = b''.join(chunks).decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    return {'content': text, 'start_line': start_line, 'lines': read_lines, 'total_lines': total,
+            'offset': begin, 'next_offset': begin + read_bytes, 'size': size,
+            'eof': start_line + read_lines >= total}
+
+# ===================== DIRECTORY LISTING =====================
+# Elenco cartelle per il file manager costruito con os.scandir (tipo dal
+# DirEntry, una sola stat per voce) e tenuto in cache per cartella. Una voce di
+# cache vale finché non cambia l'mtime della cartella (file creati, eliminati,
+# rinominati); le dimensioni dei file modificati sul posto si aggiornano con un
+# watch inotify sulla cartella o, senza inotify, dopo DIR_LISTING_TTL secondi.
+# Le pagine si chiedono con un cursore opaco (path dell'ultima voce restituita),
+# così le voci si convertono in JSON solo per la pagina richiesta.
+DIR_LISTING_CACHE_MAX = int(os.environ.get('MINEBOARD_DIR_LISTING_CACHE', '256'))  # cartelle in cache
+DIR_LISTING_TTL = 10.0        # età massima delle dimensioni senza inotify
+DIR_LISTING_MAX_PAGE = 5000
+DIR_LISTING_MAX_DEPTH = 8
+DIR_LISTING_RECURSIVE_MAX = 100000  # voci massime in modalità ricorsiva/albero
+DIR_LISTING_SORTS = ('name', 'size', 'modified', 'type')
+DIR_LISTING_WATCH_MASK = (InotifyWatcher.TREE_CHANGES | InotifyWatcher.IN_MODIFY
+                          | InotifyWatcher.IN_CLOSE_WRITE | InotifyWatcher.IN_ATTRIB)
+
+def scan_directory(path):
+    """Voci di path come tuple (nome, è_cartella, dimensione, mtime, è_cartella_reale).
+
+    è_cartella segue i symlink come faceva listdir+isdir; è_cartella_reale dice
+    se si può scendere nella voce in modalità ricorsiva senza rischiare cicli.
+    """
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                st = entry.stat()
+                is_dir = entry.is_dir()
+                entries.append((entry.name, is_dir, st.st_size, st.st_mtime,
+                                is_dir and not entry.is_symlink()))
+            except OSError:
+                continue  # symlink rotto o voce sparita durante la scansione
+    return entries
+
+def dir_listing_sort(entries, sort, reverse):
+    """Cartelle prima, poi file; entrambi ordinati per sort (nome come spareggio)."""
+    if sort == 'size':
+        key = lambda e: (e[2], e[0].lower())
+    elif sort == 'modified':
+        key = lambda e: (e[3], e[0].lower())
+    elif sort == 'type':
+        key = lambda e: (os.path.splitext(e[0])[1].lower(), e[0].lower())
+    else:
+        key = lambda e: e[0].lower()
+    dirs = sorted((e for e in entries if e[1]), key=key, reverse=reverse)
+    files = sorted((e for e in entries if not e[1]), key=key, reverse=reverse)
+    return dirs + files
+
+class DirectoryListingCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}  # percorso -> {'mtime_ns', 'scanned_at', 'watched', 'items', 'views'}
+        self.watcher = InotifyWatcher(self._on_event, name='dir-listing-inotify')
+        self.started = False
+
+    def _ensure_watcher(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        self.watcher.start()
+
+    def listing(self, path, sort='name', reverse=False):
+        """Voci di path ordinate; la lista ritornata è condivisa e non va modificata."""
+        mtime_ns = os.stat(path).st_mtime_ns
+        now = time.time()
+        with self.lock:
+            cached = self.entries.get(path)
+            if cached and cached['mtime_ns'] == mtime_ns and (cached['watched'] or now - cached['scanned_at'] < DIR_LISTING_TTL):
+                # Usata di recente: in fondo all'ordine di eviction
+                self.entries.pop(path)
+                self.entries[path] = cached
+                view = cached['views'].get((sort, reverse))
+                if view is not None:
+                    return view
+                items = cached['items']
+            else:
+                cached = None
+        if cached is None:
+            self._ensure_watcher()
+            # Watch prima della scansione: una modifica durante lo scan invalida la voce
+            watched = self.watcher.add_watch(path, DIR_LISTING_WATCH_MASK) is not None
+            items = scan_directory(path)
+            cached = {'mtime_ns': mtime_ns, 'scanned_at': now, 'watched': watched, 'items': items, 'views': {}}
+            with self.lock:
+                self.entries.pop(path, None)
+                self.entries[path] = cached
+                evicted = []
+                while len(self.entries) > DIR_LISTING_CACHE_MAX:
+                    old = next(iter(self.entries))
+                    evicted.append(old)
+                    del self.entries[old]
+            for old in evicted:
+                self.watcher.remove_watch(old)
+        view = dir_listing_sort(items, sort, reverse)
+        with self.lock:
+            cached['views'][(sort, reverse)] = view
+        return view
+
+    def invalidate(self, path):
+        with self.lock:
+            self.entries.pop(path, None)
+
+    def _on_event(self, dir_path, fname, mask):
+        if dir_path is None:
+            with self.lock:
+                self.entries.clear()
+            return
+        self.invalidate(dir_path)
+        if mask & (InotifyWatcher.IN_DELETE | InotifyWatcher.IN_MOVED_FROM) and fname:
+            self.invalidate(os.path.join(dir_path, fname))
+
+directory_listings = DirectoryListingCache()
+
+def encode_listing_cursor(index, path):
+    raw = f"{index}:{path}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_listing_cursor(cursor):
+    """(posizione, path) dell'ultima voce della pagina precedente; ValueError se il cursore non è valido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        index, path = raw.split(':', 1)
+        return int(index), path
+    except Exception:
+        raise ValueError('cursore non valido')
+
+def dir_listing_entry(item, rel_path):
+    name, is_dir, size, mtime, _ = item
+    return {
+        'name': name,
+        'type': 'directory' if is_dir else 'file',
+        'size': size,
+        'modified': datetime.fromtimestamp(mtime).isoformat(),
+        'path': rel_path,
+    }
+
+def walk_directory_listing(root, rel, sort, reverse, depth, limit=DIR_LISTING_RECURSIVE_MAX):
+    """Visita in profondità fino a depth livelli: ritorna ([(voce, path relativo, livello)], troncato).
+
+    Ogni cartella passa dalla cache, quindi riaprire un albero già visto non rifà le scansioni.
+    """
+    out = []
+    stack = [(root, rel, 0, iter(directory_listings.listing(root, sort, reverse)))]
+    while stack:
+        full, base, level, it = stack[-1]
+        item = next(it, None)
+        if item is None:
+            stack.pop()
+            continue
+        if len(out) >= limit:
+            return out, True
+        rel_path = item[0] if not base else f"{base}/{item[0]}"
+        out.append((item, rel_path, level))
+        if item[4] and level + 1 < depth:
+            child = os.path.join(full, item[0])
+            try:
+                stack.append((child, rel_path, level + 1, iter(directory_listings.listing(child, sort, reverse))))
+            except OSError:
+                continue
+    return out, False
+
+def build_listing_tree(walked):
+    """Converte la visita di walk_directory_listing in voci annidate con 'children'."""
+    roots, parents = [], []
+    for item, rel_path, level in walked:
+        node = dir_listing_entry(item, rel_path)
+        del parents[level:]
+        (parents[-1]['children'] if parents else roots).append(node)
+        if item[1]:
+            node['children'] = []
+            parents.append(node)
+    return roots
+
+def paginate_listing(items, path_of, cursor, limit):
+    """Applica cursore e limite a items (path_of(voce) è il path relativo della voce).
+
+    Ritorna (pagina, cursore successivo o None). Il cursore riprende dopo la
+    voce con quel path anche se nel frattempo la cartella è cambiata; se la
+    voce è sparita si riprende dalla stessa posizione.
+    """
+    start = 0
+    if cursor:
+        index, after = decode_listing_cursor(cursor)
+        if 0 <= index < len(items) and path_of(items[index]) == after:
+            start = index + 1
+        else:
+            start = next((i + 1 for i, item in enumerate(items) if path_of(item) == after),
+                         min(max(index, 0), len(items)))
+    end = len(items) if limit is None else min(len(items), start + limit)
+    next_cursor = encode_listing_cursor(end - 1, path_of(items[end - 1])) if start < end < len(items) else None
+    return items[start:end], next_cursor
+
 # Gestione errori
 # File Manager API Routes
 @app.route('/api/files/<server_name>/<path:filepath>')
@@ -2108,10 +5516,30 @@ def get_file_content(server_name, filepath):
     if os.path.isdir(full_path):
         return jsonify({'success': False, 'message': 'È una cartella, non un file'}), 400
     
+    # Lettura a pagine: ?offset=&length= (byte) oppure ?start_line=&lines= (righe, negativo = dalla fine)
+    by_bytes = 'offset' in request.args or 'length' in request.args
+    by_lines = not by_bytes and ('start_line' in request.args or 'lines' in request.args)
     try:
-        with open(full_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return jsonify({'success': True, 'content': content})
+        if by_bytes:
+            offset = max(0, int(request.args.get('offset', 0)))
+            length = max(1, min(EDITOR_MAX_PAGE_BYTES, int(request.args.get('length', EDITOR_MAX_PAGE_BYTES))))
+        elif by_lines:
+            start_line = int(request.args.get('start_line', 0))
+            count = max(1, min(EDITOR_MAX_PAGE_LINES, int(request.args.get('lines', 1000))))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parametri di lettura non validi'}), 400
+    try:
+        if by_bytes:
+            page = read_file_window(full_path, offset, length)
+        elif by_lines:
+            page = read_file_lines(full_path, start_line, count)
+        else:
+            with open(full_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            return jsonify({'success': True, 'content': content})
+        if page is None:
+            return jsonify({'success': False, 'message': 'File binario non supportato'}), 400
+        return jsonify({'success': True, **page})
     except UnicodeDecodeError:
         return jsonify({'success': False, 'message': 'File binario non supportato'}), 400
     except Exception as e:
@@ -2119,7 +5547,12 @@ def get_file_content(server_name, filepath):
 
 @app.route('/api/files/<server_name>', methods=['GET'])
 def list_files(server_name):
-    """Lista i contenuti della cartella del server. Facoltativamente ?path=subdir"""
+    """Lista i contenuti della cartella del server. Facoltativamente ?path=subdir
+
+    ?sort=name|size|modified|type&order=asc|desc, ?limit=N&cursor=... per le
+    pagine (next_cursor nella risposta), ?depth=N per un elenco ricorsivo piatto
+    e ?mode=tree per voci annidate (children) fino a depth livelli.
+    """
     if not has_permission('files_access'):
         return jsonify({'success': False, 'message': 'Permesso negato'}), 403
     server_path = os.path.join(SERVER_DIR, server_name)
@@ -2132,32 +5565,53 @@ def list_files(server_name):
         return jsonify({'success': False, 'message': 'Percorso non valido'}), 400
     if not os.path.exists(target):
         return jsonify({'success': False, 'message': 'Percorso non trovato'}), 404
+    sort = request.args.get('sort', 'name')
+    if sort not in DIR_LISTING_SORTS:
+        return jsonify({'success': False, 'message': 'Ordinamento non valido'}), 400
+    reverse = request.args.get('order', 'asc') == 'desc'
+    mode = request.args.get('mode', 'list')
     try:
-        entries = []
-        for name in os.listdir(target):
-            fp = os.path.join(target, name)
-            try:
-                st = os.stat(fp)
-                is_dir = os.path.isdir(fp)
-                # Costruisci path relativo da server root
-                rel_path = name if not rel else f"{rel}/{name}"
-                entries.append({
-                    'name': name,
-                    'type': 'directory' if is_dir else 'file',
-                    'size': st.st_size,
-                    'modified': datetime.fromtimestamp(st.st_mtime).isoformat(),
-                    'path': rel_path
-                })
-            except Exception:
-                continue
-        # Ordina: cartelle prima, poi file, entrambi alfabetici
-        entries.sort(key=lambda e: (e['type'] != 'directory', e['name'].lower()))
+        depth = int(request.args.get('depth', 1))
+        limit = request.args.get('limit')
+        limit = None if limit in (None, '') else int(limit)
+        if depth < 1 or depth > DIR_LISTING_MAX_DEPTH or (limit is not None and not 0 < limit <= DIR_LISTING_MAX_PAGE):
+            raise ValueError
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parametri di elenco non validi'}), 400
+    if not os.path.isdir(target):
+        return jsonify({'success': False, 'message': 'Percorso non valido'}), 400
+    rel = rel.strip('/')
+    try:
+        result = {'success': True, 'current_path': rel, 'sort': sort, 'order': 'desc' if reverse else 'asc'}
+        if mode == 'tree' or depth > 1:
+            walked, truncated = walk_directory_listing(target, rel, sort, reverse, depth)
+            result.update(depth=depth, truncated=truncated, total=len(walked))
+            if mode == 'tree':
+                result['files'] = build_listing_tree(walked)
+            else:
+                page, next_cursor = paginate_listing(walked, lambda w: w[1], request.args.get('cursor'), limit)
+                result['files'] = [dict(dir_listing_entry(item, rel_path), depth=level)
+                                   for item, rel_path, level in page]
+                result['next_cursor'] = next_cursor
+        else:
+            # Ordina: cartelle prima, poi file; le voci diventano dict solo per la pagina
+            items = directory_listings.listing(target, sort, reverse)
+            path_of = lambda item: item[0] if not rel else f"{rel}/{item[0]}"
+            page, next_cursor = paginate_listing(items, path_of, request.args.get('cursor'), limit)
+            result['files'] = [dir_listing_entry(item, path_of(item)) for item in page]
+            result.update(total=len(items), next_cursor=next_cursor)
+        # Dimensione totale delle cartelle di primo livello dall'indice uso disco
+        disk_usage = disk_usage_index.get(server_name)
+        if disk_usage and not rel:
+            for e in result['files']:
+                if e['type'] == 'directory' and e['name'] in disk_usage['folders']:
+                    e['total_size'] = disk_usage['folders'][e['name']]
         # Calcola parent_path per breadcrumb/back
-        parent_path = ''
-        if rel:
-            parts = rel.strip('/').split('/')
-            parent_path = '/'.join(parts[:-1])
-        return jsonify({'success': True, 'current_path': rel, 'parent_path': parent_path, 'files': entries})
+        result['parent_path'] = '/'.join(rel.split('/')[:-1]) if rel else ''
+        result['disk_usage'] = disk_usage
+        return jsonify(result)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Cursore non valido'}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
 
@@ -2176,6 +5630,7 @@ def save_file_content(server_name, filepath):
         data = request.get_json()
         content = data.get('content', '')
         
+        detach_hardlink(full_path)
         with open(full_path, 'w', encoding='utf-8') as f:
             f.write(content)
         
@@ -2238,6 +5693,251 @@ def rename_file(server_name, filepath):
     except Exception as e:
         return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
 
+# ===================== CHUNKED UPLOADS =====================
+# Upload riprendibili a blocchi per il file manager: init -> PUT dei blocchi
+# per offset (corpo grezzo, scritto su disco in streaming) -> complete.
+# Stato e dati parziali stanno in uploads/sessions/<id>.json|.part; alla fine
+# il file viene verificato (dimensione, SHA-256 se dichiarato) e spostato al
+# suo posto con un rename atomico. Con lo SHA-256 dichiarato all'init, un file
+# già presente nella cache artefatti viene installato senza caricarlo.
+UPLOAD_SESSIONS_DIR = os.path.join(UPLOAD_FOLDER, 'sessions')
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024      # dimensione consigliata ai client
+UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+UPLOAD_SESSION_MAX_AGE = 86400.0         # sessioni abbandonate più vecchie di così vengono rimosse
+UPLOAD_STREAM_BUFFER = 1024 * 1024
+
+upload_lock = threading.Lock()
+upload_locks = {}  # id sessione -> lock (un solo PUT alla volta per sessione)
+
+def upload_session_paths(upload_id):
+    base = os.path.join(UPLOAD_SESSIONS_DIR, upload_id)
+    return base + '.json', base + '.part'
+
+def load_upload_session(upload_id):
+    if not re.fullmatch(r'[0-9a-f]{32}', upload_id or ''):
+        return None
+    try:
+        with open(upload_session_paths(upload_id)[0], 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_upload_session(upload):
+    upload['updated_at'] = time.time()
+    write_json_atomic(upload_session_paths(upload['id'])[0], upload)
+
+def drop_upload_session(upload_id):
+    for path in upload_session_paths(upload_id):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    with upload_lock:
+        upload_locks.pop(upload_id, None)
+
+def cleanup_upload_sessions():
+    now = time.time()
+    try:
+        names = os.listdir(UPLOAD_SESSIONS_DIR)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        upload = load_upload_session(name[:-5])
+        if upload is None or now - upload.get('updated_at', 0) > UPLOAD_SESSION_MAX_AGE:
+            drop_upload_session(name[:-5])
+
+def upload_destination(server_name, base_path, filename):
+    """Percorso assoluto di destinazione (dentro la cartella del server) o None.
+
+    Come in upload_file, secure_filename si applica solo ai componenti di
+    filename (nome inviato dal client, anche con sottocartelle): base_path è la
+    cartella corrente del file manager e resta com'è.
+    """
+    server_path = os.path.join(SERVER_DIR, server_name)
+    base = [p for p in str(base_path or '').replace('\\', '/').split('/') if p.strip()]
+    parts = [secure_filename(p) for p in str(filename or '').replace('\\', '/').split('/') if p.strip()]
+    if not parts or not all(parts):
+        return None
+    dest = os.path.join(server_path, *base, *parts)
+    if os.path.commonpath([os.path.realpath(server_path), os.path.realpath(dest)]) != os.path.realpath(server_path):
+        return None
+    return dest
+
+def move_into_place(src, dest):
+    """Sposta src in dest in modo atomico, anche tra file system diversi (copia temporanea accanto a dest)."""
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    try:
+        os.replace(src, dest)
+        return
+    except OSError:
+        pass
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(dest)}.', suffix='.tmp', dir=os.path.dirname(dest))
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dest)
+        os.remove(src)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def upload_owned(upload, server_name):
+    return upload and upload['server'] == server_name and (upload['owner'] == session.get('user') or is_admin_user())
+
+def upload_status(upload):
+    return {'upload_id': upload['id'], 'path': upload['path'], 'size': upload['size'],
+            'offset': upload['received'], 'chunk_size': UPLOAD_CHUNK_SIZE}
+
+@app.route('/api/files/<server_name>/uploads', methods=['POST'])
+def init_upload(server_name):
+    """Apre (o riprende) un upload a blocchi.
+
+    JSON: path (cartella di destinazione), filename (nome del file, anche con
+    sottocartelle; se manca l'ultimo componente di path), size, sha256 opzionale.
+    """
+    if not has_permission('files_access'):
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    if not os.path.isdir(os.path.join(SERVER_DIR, server_name)):
+        return jsonify({'success': False, 'message': 'Server non trovato'}), 404
+    data = request.get_json(silent=True) or {}
+    path = (data.get('path') or '').strip().strip('/')
+    filename = (data.get('filename') or '').strip().strip('/')
+    if not filename:
+        path, _, filename = path.rpartition('/')
+    sha256 = (data.get('sha256') or '').strip().lower() or None
+    try:
+        size = int(data.get('size'))
+        if size < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Dimensione non valida'}), 400
+    if sha256 and not re.fullmatch(r'[0-9a-f]{64}', sha256):
+        return jsonify({'success': False, 'message': 'sha256 non valido'}), 400
+    dest = upload_destination(server_name, path, filename)
+    if not dest:
+        return jsonify({'success': False, 'message': 'Percorso non valido'}), 400
+    path = os.path.relpath(dest, os.path.join(SERVER_DIR, server_name)).replace(os.sep, '/')
+
+    # Contenuto già noto: nessun byte da trasferire
+    if sha256 and artifact_cache.has_blob(sha256, size):
+        artifact_cache.install(sha256, dest)
+        return jsonify({'success': True, 'complete': True, 'deduplicated': True, 'path': path,
+                        'message': f'File caricato: {path}'})
+
+    os.makedirs(UPLOAD_SESSIONS_DIR, exist_ok=True)
+    cleanup_upload_sessions()
+    owner = session.get('user')
+    # Stesso file dallo stesso utente: riprende la sessione esistente
+    for name in os.listdir(UPLOAD_SESSIONS_DIR):
+        upload = load_upload_session(name[:-5]) if name.endswith('.json') else None
+        if upload and upload['server'] == server_name and upload['path'] == path and upload['owner'] == owner \
+                and upload['size'] == size and upload.get('sha256') == sha256:
+            part_path = upload_session_paths(upload['id'])[1]
+            upload['received'] = min(upload['received'], os.path.getsize(part_path) if os.path.exists(part_path) else 0)
+            save_upload_session(upload)
+            return jsonify({'success': True, 'complete': False, 'resumed': True, **upload_status(upload)})
+
+    import uuid
+    upload = {'id': uuid.uuid4().hex, 'server': server_name, 'path': path, 'size': size, 'sha256': sha256,
+              'owner': owner, 'received': 0, 'created_at': time.time()}
+    open(upload_session_paths(upload['id'])[1], 'wb').close()
+    save_upload_session(upload)
+    return jsonify({'success': True, 'complete': False, 'resumed': False, **upload_status(upload)}), 201
+
+@app.route('/api/files/<server_name>/uploads/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+def upload_chunk(server_name, upload_id):
+    """GET: stato dell'upload. DELETE: annulla. PUT ?offset=N: scrive il corpo grezzo a partire da N
+    (header X-Chunk-SHA256 opzionale per verificare il blocco)."""
+    if not has_permission('files_access'):
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    upload = load_upload_session(upload_id)
+    if not upload_owned(upload, server_name):
+        return jsonify({'success': False, 'message': 'Upload non trovato'}), 404
+    if request.method == 'GET':
+        return jsonify({'success': True, **upload_status(upload)})
+    if request.method == 'DELETE':
+        drop_upload_session(upload_id)
+        return jsonify({'success': True, 'message': 'Upload annullato'})
+
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'offset richiesto'}), 400
+    length = request.content_length
+    if length is None or length > UPLOAD_MAX_CHUNK_SIZE:
+        return jsonify({'success': False, 'message': f'Content-Length richiesto (massimo {UPLOAD_MAX_CHUNK_SIZE} byte)'}), 400
+    expected_chunk_sha = (request.headers.get('X-Chunk-SHA256') or '').strip().lower() or None
+    with upload_lock:
+        lock = upload_locks.setdefault(upload_id, threading.Lock())
+    if not lock.acquire(blocking=False):
+        return jsonify({'success': False, 'message': 'Blocco già in scrittura per questo upload'}), 409
+    try:
+        upload = load_upload_session(upload_id) or upload
+        # Si può riscrivere un blocco già ricevuto, non lasciare buchi
+        if offset < 0 or offset > upload['received']:
+            return jsonify({'success': False, 'message': 'Offset non valido', **upload_status(upload)}), 409
+        if offset + length > upload['size']:
+            return jsonify({'success': False, 'message': 'Il blocco supera la dimensione dichiarata'}), 400
+        part_path = upload_session_paths(upload_id)[1]
+        h = hashlib.sha256()
+        written = 0
+        with open(part_path, 'r+b') as f:
+            f.seek(offset)
+            while written < length:
+                buf = request.stream.read(min(UPLOAD_STREAM_BUFFER, length - written))
+                if not buf:
+                    break
+                f.write(buf)
+                h.update(buf)
+                written += len(buf)
+            if written != length or (expected_chunk_sha and h.hexdigest() != expected_chunk_sha):
+                # Blocco incompleto o corrotto: si torna all'offset di partenza
+                f.truncate(offset)
+                upload['received'] = offset
+                save_upload_session(upload)
+                message = 'Blocco incompleto' if written != length else 'Checksum del blocco non valido'
+                return jsonify({'success': False, 'message': message, **upload_status(upload)}), 400
+            f.truncate(offset + length)
+        upload['received'] = offset + length
+        save_upload_session(upload)
+        return jsonify({'success': True, **upload_status(upload)})
+    finally:
+        lock.release()
+
+@app.route('/api/files/<server_name>/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(server_name, upload_id):
+    """Verifica l'upload e sposta il file nella destinazione in modo atomico."""
+    if not has_permission('files_access'):
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    upload = load_upload_session(upload_id)
+    if not upload_owned(upload, server_name):
+        return jsonify({'success': False, 'message': 'Upload non trovato'}), 404
+    part_path = upload_session_paths(upload_id)[1]
+    if upload['received'] != upload['size'] or os.path.getsize(part_path) != upload['size']:
+        return jsonify({'success': False, 'message': 'Upload incompleto', **upload_status(upload)}), 409
+    folder, _, filename = upload['path'].rpartition('/')
+    dest = upload_destination(server_name, folder, filename)
+    if not dest:
+        return jsonify({'success': False, 'message': 'Percorso non valido'}), 400
+    try:
+        sha = file_sha256(part_path)
+        if upload.get('sha256') and sha != upload['sha256']:
+            drop_upload_session(upload_id)
+            return jsonify({'success': False, 'message': 'Checksum del file non valido, ricaricare'}), 422
+        if dest.lower().endswith('.jar'):
+            # I JAR passano dalla cache artefatti: un nuovo upload dello stesso file sarà deduplicato
+            artifact_cache.ingest(part_path, sha)
+            artifact_cache.install(sha, dest)
+        else:
+            move_into_place(part_path, dest)
+        drop_upload_session(upload_id)
+        return jsonify({'success': True, 'path': upload['path'], 'sha256': sha,
+                        'message': f"File caricato: {upload['path']}"})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
+
 @app.route('/api/files/<server_name>/upload-blob', methods=['POST'])
 def upload_blob(server_name):
     """Carica un file (base64) nella cartella del server specificato."""
@@ -2262,6 +5962,7 @@ def upload_blob(server_name):
             raw = base64.b64decode(file_data)
         except Exception:
             return jsonify({'success': False, 'message': 'Base64 non valido'}), 400
+        detach_hardlink(out_path)
         with open(out_path, 'wb') as f:
             f.write(raw)
         return jsonify({'success': True, 'message': f'File caricato: {safe_name}'})
@@ -2301,6 +6002,7 @@ def upload_file(server_name):
             dest_dir = os.path.dirname(full_dest_path)
             os.makedirs(dest_dir, exist_ok=True)
 
+            detach_hardlink(full_dest_path)
             file.save(full_dest_path)
             uploaded_count += 1
 
@@ -2355,10 +6057,382 @@ def download_file(server_name, filepath):
         return jsonify({'success': False, 'message': 'È una cartella, non un file'}), 400
     
     try:
-        return send_file(full_path, as_attachment=True)
+        # conditional: Range/If-Range (206) con ETag e Last-Modified, così i download interrotti riprendono
+        return send_file(full_path, as_attachment=True, conditional=True, etag=True)
     except Exception as e:
         return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
 
+# ===================== STREAMING ZIP =====================
+# Zip di cartelle o selezioni generato mentre viene inviato, senza file
+# temporanei: ZipFile scrive su una destinazione non seekable (dimensioni e CRC
+# nei data descriptor dopo ogni file) e il generatore la svuota a ogni blocco,
+# quindi la memoria resta costante qualunque sia la selezione. I formati già
+# compressi (regioni, jar, archivi, immagini) vengono solo archiviati.
+ZIP_STREAM_CHUNK = 256 * 1024
+ZIP_STORED_EXTENSIONS = {'.mca', '.mcr', '.mcc', '.jar', '.zip', '.gz', '.tgz', '.xz', '.bz2', '.zst',
+                         '.7z', '.png', '.jpg', '.jpeg', '.ogg'}
+
+class ZipStreamSink:
+    """Destinazione write-only per ZipFile: i byte restano qui finché il generatore non li preleva."""
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+def zip_stream_entries(server_path, rel_paths, root_name):
+    """Genera (percorso assoluto, nome nell'archivio, è_cartella) per la selezione.
+
+    Ogni voce selezionata finisce nell'archivio col proprio nome (la root del
+    server come root_name); i symlink vengono inclusi solo se puntano dentro il server.
+    """
+    real_root = os.path.realpath(server_path)
+    def inside(path):
+        return os.path.commonpath([real_root, os.path.realpath(path)]) == real_root
+    for rel in rel_paths:
+        full = os.path.join(server_path, rel) if rel else server_path
+        base = os.path.basename(rel) if rel else root_name
+        if not os.path.isdir(full):
+            yield full, base, False
+            continue
+        for dirpath, dirnames, filenames in os.walk(full):
+            dirnames[:] = [d for d in dirnames if not os.path.islink(os.path.join(dirpath, d))]
+            arc_dir = base if dirpath == full else f"{base}/{os.path.relpath(dirpath, full).replace(os.sep, '/')}"
+            yield dirpath, arc_dir, True
+            for name in filenames:
+                fp = os.path.join(dirpath, name)
+                if os.path.islink(fp) and not inside(fp):
+                    continue
+                yield fp, f"{arc_dir}/{name}", False
+
+def generate_zip_stream(entries, label):
+    sink = ZipStreamSink()
+    try:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+            for full, arcname, is_dir in entries:
+                try:
+                    if is_dir:
+                        zf.writestr(zipfile.ZipInfo.from_file(full, arcname), b'')
+                        continue
+                    info = zipfile.ZipInfo.from_file(full, arcname)
+                    src = open(full, 'rb')
+                except OSError:
+                    continue  # sparito o illeggibile nel frattempo
+                if os.path.splitext(arcname)[1].lower() in ZIP_STORED_EXTENSIONS:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                with src, zf.open(info, 'w') as dest:
+                    while True:
+                        chunk = src.read(ZIP_STREAM_CHUNK)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        if len(sink.buffer) >= ZIP_STREAM_CHUNK:
+                            yield sink.drain()
+                if sink.buffer:
+                    yield sink.drain()
+        yield sink.drain()
+    except Exception as e:
+        # Gli header sono già partiti: il client riceve uno zip troncato
+        print(f"Errore generazione zip '{label}': {e}")
+
+@app.route('/api/files/<server_name>/download-zip')
+def download_zip(server_name):
+    """Scarica come zip una cartella o più voci (?path=a&path=b; path vuoto = tutto il server)"""
+    if not has_permission('files_access'):
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    server_path = os.path.join(SERVER_DIR, server_name)
+    if not os.path.isdir(server_path):
+        return jsonify({'success': False, 'message': 'Server non trovato'}), 404
+    paths = request.args.getlist('path')
+    if not paths:
+        return jsonify({'success': False, 'message': 'Nessun percorso selezionato'}), 400
+    real_root = os.path.realpath(server_path)
+    rel_paths = []
+    for p in paths:
+        rel = os.path.normpath(p.replace('\\', '/').strip('/')) if p.strip('/') else ''
+        rel = '' if rel == '.' else rel
+        full = os.path.join(server_path, rel)
+        # Evita traversal
+        if os.path.commonpath([real_root, os.path.realpath(full)]) != real_root:
+            return jsonify({'success': False, 'message': 'Percorso non valido'}), 400
+        if not os.path.exists(full):
+            return jsonify({'success': False, 'message': f'Percorso non trovato: {p}'}), 404
+        if rel not in rel_paths:
+            rel_paths.append(rel)
+    if len(rel_paths) == 1:
+        name = os.path.basename(rel_paths[0]) or server_name
+    else:
+        name = f"{server_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    filename = secure_filename(f"{name}.zip") or 'download.zip'
+    entries = zip_stream_entries(server_path, rel_paths, server_name)
+    return app.response_class(generate_zip_stream(entries, f"{server_name}/{name}"), mimetype='application/zip', headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no',  # niente buffering nei reverse proxy
+    })
+
+# ===================== FILE SEARCH =====================
+# Ricerca nei file di un server: glob sul nome, regex sul contenuto, glob di
+# inclusione/esclusione sul percorso e limite di dimensione. La visita delle
+# cartelle (os.scandir) alimenta un pool di thread che scansiona ogni file via
+# mmap con una regex su bytes: la regex gira sull'intero buffer e i numeri di
+# riga si calcolano solo attorno ai risultati. I file binari (NUL nei primi
+# byte) vengono saltati. I risultati tornano come NDJSON man mano che arrivano.
+# Una regex non si può interrompere a metà: quelle con quantificatori annidati
+# (backtracking catastrofico) vengono rifiutate, e ogni file viene scansionato a
+# blocchi di SEARCH_WINDOW controllando il tempo tra un blocco e l'altro.
+SEARCH_WORKERS = int(os.environ.get('MINEBOARD_SEARCH_WORKERS', str(min(8, (os.cpu_count() or 2) * 2))))
+SEARCH_DEFAULT_MAX_SIZE = 8 * 1024 * 1024
+SEARCH_MAX_FILE_SIZE = 256 * 1024 * 1024
+SEARCH_DEFAULT_MAX_RESULTS = 1000
+SEARCH_MAX_RESULTS = 10000
+SEARCH_MAX_MATCHES_PER_FILE = 100
+SEARCH_TIMEOUT = 60.0
+SEARCH_FILE_TIMEOUT = 10.0          # secondi massimi di regex per file
+SEARCH_WINDOW = 4 * 1024 * 1024     # blocco di scansione (allineato a fine riga)
+SEARCH_BINARY_SNIFF = 8192
+SEARCH_PREVIEW_CHARS = 200
+
+def search_path_matches(rel_path, globs):
+    """True se rel_path (o il suo nome) corrisponde a uno dei glob."""
+    name = rel_path.rsplit('/', 1)[-1]
+    return any(fnmatch.fnmatch(rel_path, g) or fnmatch.fnmatch(name, g) for g in globs)
+
+def search_candidate_files(root, rel, name_globs, include, exclude, max_size):
+    """Genera (percorso assoluto, path relativo, dimensione) dei file da cercare. Non segue i symlink a cartelle."""
+    stack = [(root, rel)]
+    while stack:
+        d, base = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                rel_path = entry.name if not base else f"{base}/{entry.name}"
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not (exclude and search_path_matches(rel_path, exclude)):
+                            stack.append((entry.path, rel_path))
+                        continue
+                    if not entry.is_file():
+                        continue
+                    if name_globs and not any(fnmatch.fnmatch(entry.name, g) for g in name_globs):
+                        continue
+                    if include and not search_path_matches(rel_path, include):
+                        continue
+                    if exclude and search_path_matches(rel_path, exclude):
+                        continue
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                if size <= max_size:
+                    yield entry.path, rel_path, size
+
+def search_pattern_risky(pattern):
+    """True se la regex compilata ha un quantificatore dentro un altro e almeno uno è illimitato.
+
+    Forme come (a+)+, (.*)* o (\\w+\\s?){20} possono impiegare un tempo esponenziale
+    su una sola riga e bloccare un thread di ricerca.
+    """
+    try:
+        import re._parser as sre_parse
+    except ImportError:  # Python < 3.11
+        import sre_parse
+    repeats = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+    def walk(items, outer):
+        # outer: None fuori da ripetizioni, altrimenti True se una ripetizione esterna è illimitata
+        for op, av in items:
+            if op in repeats:
+                lo, hi, sub = av
+                if hi > 1:
+                    unbounded = hi == sre_parse.MAXREPEAT
+                    if outer is not None and (outer or unbounded):
+                        return True
+                    if walk(sub, unbounded or bool(outer)):
+                        return True
+                elif walk(sub, outer):
+                    return True
+            elif op == sre_parse.SUBPATTERN:
+                if walk(av[-1], outer):
+                    return True
+            elif op == sre_parse.BRANCH:
+                if any(walk(branch, outer) for branch in av[1]):
+                    return True
+            elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+                if walk(av[1], outer):
+                    return True
+        return False
+
+    return walk(sre_parse.parse(pattern.pattern, pattern.flags), None)
+
+def search_file_content(path, pattern, max_matches, timeout=SEARCH_FILE_TIMEOUT):
+    """Risultati {'line', 'column', 'preview'} di pattern (regex bytes) in path; None se il file è binario.
+
+    Solleva TimeoutError se la scansione supera timeout secondi (controllato tra un blocco e l'altro).
+    """
+    import mmap
+    with open(path, 'rb') as f:
+        if b'\0' in f.read(SEARCH_BINARY_SNIFF):
+            return None
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return []  # file vuoto
+    with mm:
+        matches = []
+        line, counted = 1, 0
+        deadline = time.monotonic() + timeout
+        pos, size = 0, len(mm)
+        while pos < size and len(matches) < max_matches:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'Ricerca oltre {timeout:.0f}s')
+            end = size if size - pos <= SEARCH_WINDOW else (mm.find(b'\n', pos + SEARCH_WINDOW) + 1 or size)
+            for m in pattern.finditer(mm, pos, end):
+                start = m.start()
+                line += mm[counted:start].count(b'\n')
+                counted = start
+                line_start = mm.rfind(b'\n', 0, start) + 1
+                line_end = mm.find(b'\n', start)
+                if line_end < 0:
+                    line_end = len(mm)
+                raw = mm[line_start:min(line_end, line_start + SEARCH_PREVIEW_CHARS * 4)]
+                matches.append({
+                    'line': line,
+                    'column': len(mm[line_start:start].decode('utf-8', 'replace')) + 1,
+                    'preview': raw.decode('utf-8', 'replace').rstrip('\r')[:SEARCH_PREVIEW_CHARS],
+                })
+                if len(matches) >= max_matches:
+                    break
+            pos = end
+        return matches
+
+def generate_search_results(candidates, pattern, max_results):
+    """Genera righe NDJSON: un oggetto per file con risultati, poi un riepilogo finale."""
+    started = time.time()
+    stats = {'files_scanned': 0, 'files_matched': 0, 'matches': 0, 'skipped_binary': 0, 'skipped_timeout': 0,
+             'skipped_error': 0, 'truncated': False}
+    pool = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix='file-search')
+
+    def remaining():
+        return SEARCH_TIMEOUT - (time.time() - started)
+
+    def scan(path, rel_path, size):
+        if pattern is None:
+            return rel_path, size, []
+        timeout = max(0.0, min(SEARCH_FILE_TIMEOUT, remaining()))
+        return rel_path, size, search_file_content(path, pattern, SEARCH_MAX_MATCHES_PER_FILE, timeout)
+
+    def collect(done):
+        lines = []
+        for fut in done:
+            try:
+                rel_path, size, matches = fut.result()
+            except TimeoutError:
+                stats['skipped_timeout'] += 1
+                continue
+            except Exception:
+                # File sparito, non leggibile, ...: non deve fermare la ricerca
+                stats['skipped_error'] += 1
+                continue
+            stats['files_scanned'] += 1
+            if matches is None:
+                stats['skipped_binary'] += 1
+                continue
+            if pattern is not None and not matches:
+                continue
+            if stats['matches'] >= max_results:
+                stats['truncated'] = True
+                continue
+            matches = matches[:max_results - stats['matches']]
+            stats['files_matched'] += 1
+            # Ricerca solo per nome: ogni file conta come un risultato
+            stats['matches'] += len(matches) if pattern is not None else 1
+            lines.append(json.dumps({'type': 'file', 'path': rel_path, 'size': size, 'matches': matches}) + '\n')
+        return lines
+
+    pending = set()
+    try:
+        for path, rel_path, size in candidates:
+            if stats['truncated'] or stats['matches'] >= max_results or remaining() <= 0:
+                stats['truncated'] = True
+                break
+            pending.add(pool.submit(scan, path, rel_path, size))
+            # Poche richieste in volo: la memoria non cresce con il numero di file
+            if len(pending) >= SEARCH_WORKERS * 4:
+                done, pending = wait(pending, timeout=max(0.0, remaining()), return_when=FIRST_COMPLETED)
+                yield from collect(done)
+        while pending and remaining() > 0:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            yield from collect(done)
+        if pending:
+            # Tempo scaduto: i file ancora in scansione non entrano nel riepilogo
+            stats['truncated'] = True
+        stats['elapsed_ms'] = round((time.time() - started) * 1000)
+        yield json.dumps({'type': 'done', **stats}) + '\n'
+    finally:
+        # Anche se il client chiude la connessione a metà
+        pool.shutdown(wait=False, cancel_futures=True)
+
+@app.route('/api/files/<server_name>/search')
+def search_files(server_name):
+    """Cerca nei file del server; risposta NDJSON (application/x-ndjson).
+
+    ?q=regex sul contenuto (literal=1 per testo semplice, case=1 per distinguere
+    maiuscole), ?name=glob sul nome, ?include=/?exclude= glob sul percorso
+    (ripetibili), ?path=sottocartella, ?max_size=byte per file, ?max_results=N.
+    """
+    if not has_permission('files_access'):
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    server_path = os.path.join(SERVER_DIR, server_name)
+    if not os.path.isdir(server_path):
+        return jsonify({'success': False, 'message': 'Server non trovato'}), 404
+    rel = (request.args.get('path') or '').strip().strip('/')
+    target = os.path.normpath(os.path.join(server_path, rel))
+    # Evita traversal
+    if os.path.commonpath([os.path.realpath(server_path), os.path.realpath(target)]) != os.path.realpath(server_path):
+        return jsonify({'success': False, 'message': 'Percorso non valido'}), 400
+    if not os.path.isdir(target):
+        return jsonify({'success': False, 'message': 'Percorso non trovato'}), 404
+    query = request.args.get('q', '')
+    name_globs = [g for g in request.args.getlist('name') if g]
+    if not query and not name_globs:
+        return jsonify({'success': False, 'message': 'Specifica q (contenuto) o name (nome file)'}), 400
+    try:
+        max_size = min(int(request.args.get('max_size', SEARCH_DEFAULT_MAX_SIZE)), SEARCH_MAX_FILE_SIZE)
+        max_results = min(int(request.args.get('max_results', SEARCH_DEFAULT_MAX_RESULTS)), SEARCH_MAX_RESULTS)
+        if max_size < 0 or max_results < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parametri di ricerca non validi'}), 400
+    pattern = None
+    if query:
+        source = re.escape(query) if request.args.get('literal') == '1' else query
+        flags = re.MULTILINE | (0 if request.args.get('case') == '1' else re.IGNORECASE)
+        try:
+            pattern = re.compile(source.encode('utf-8'), flags)
+        except re.error as e:
+            return jsonify({'success': False, 'message': f'Espressione regolare non valida: {e}'}), 400
+        if search_pattern_risky(pattern):
+            return jsonify({'success': False, 'message': 'Espressione regolare troppo costosa: evita quantificatori '
+                                                         'annidati come (a+)+ o (.*)*'}), 400
+    candidates = search_candidate_files(target, rel if rel != '.' else '', name_globs,
+                                        [g for g in request.args.getlist('include') if g],
+                                        [g for g in request.args.getlist('exclude') if g], max_size)
+    return app.response_class(generate_search_results(candidates, pattern, max_results),
+                              mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
 @app.route('/api/servers/<server_name>/logs')
 def get_logs(server_name):
     """Ritorna gli ultimi log del server se disponibile."""
@@ -2432,6 +6506,22 @@ def get_server_stats(server_name):
     except Exception as e:
         return jsonify({'success': True, 'stats': {'tps': tps, 'players': players, 'status': status, 'pid': pid}})
 
+@app.route('/api/servers/<server_name>/gc')
+def get_server_gc_stats(server_name):
+    """Statistiche GC (pause, allocation rate, heap dopo GC) lette dal GC log del server."""
+    if not has_permission('server_stats_access'):
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    server_path = os.path.join(SERVER_DIR, server_name)
+    if not os.path.isdir(server_path):
+        return jsonify({'success': False, 'message': 'Server non trovato'}), 404
+    cfg = load_server_internal_config(server_name)
+    gc_path = os.path.join(server_path, GC_LOG_RELATIVE_PATH)
+    if not os.path.exists(gc_path):
+        return jsonify({'success': True, 'enabled': bool(cfg.get('gc_logging')), 'available': False, 'gc': None})
+    tailer = get_gc_tailer(server_name)
+    tailer.poll()
+    return jsonify({'success': True, 'enabled': bool(cfg.get('gc_logging')), 'available': True, 'gc': tailer.snapshot()})
+
 @app.route('/api/servers/<server_name>', methods=['DELETE'])
 def delete_server(server_name):
     """Elimina definitivamente il server specificato (cartella, log e backup opzionale)."""
@@ -2449,6 +6539,10 @@ def delete_server(server_name):
                 pass
         # Rimuovi cartella server
         shutil.rmtree(server_path)
+        with gc_tailers_lock:
+            gc_tailers.pop(server_name, None)
+        disk_usage_index.forget(server_name)
+        server_registry.remove(server_name)
         # Rimuovi file log se presente
         log_file = os.path.join(LOG_DIR, f'{server_name}.log')
         if os.path.exists(log_file):
@@ -2513,6 +6607,7 @@ def create_backup(server_name):
         
         # Crea file zip
         backup_file = os.path.join(server_backup_dir, f"{backup_name}.zip")
+        backup_started = time.monotonic()
         
         with zipfile.ZipFile(backup_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
             for root, dirs, files in os.walk(server_path):
@@ -2533,6 +6628,12 @@ def create_backup(server_name):
                         print(f"Errore nel backup di {file_path}: {e}")
                         continue  # Continua con gli altri file
         
+        metrics_observe('mineboard_backup_duration_seconds', time.monotonic() - backup_started,
+                        {'server': server_name}, buckets=METRICS_BACKUP_BUCKETS)
+        try:
+            metrics_set('mineboard_backup_last_size_bytes', os.path.getsize(backup_file), {'server': server_name})
+        except OSError:
+            pass
         # Webhook su backup completato
         try:
             send_discord_webhook(server_name, 'backup_completed', f"Backup '{backup_name}' completato")
@@ -2628,6 +6729,860 @@ def system_stats():
     except Exception as e:
         return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
 
+# ===================== PLUGIN INVENTORY =====================
+# Inventario di plugins/*.jar di ogni server: il descrittore (plugin.yml,
+# paper-plugin.yml, bungee.yml, velocity-plugin.json) viene letto direttamente
+# dallo zip e memorizzato per (percorso, dimensione, mtime), così una nuova
+# scansione apre solo i JAR cambiati. Nome e versione installati vengono
+# confrontati con l'ultima versione su Spiget; le ricerche avvengono in un
+# thread, una alla volta a distanza di PLUGIN_LOOKUP_INTERVAL secondi, e il
+# risultato resta valido per PLUGIN_LOOKUP_TTL secondi.
+PLUGIN_INVENTORY_FILE = os.path.join(os.getcwd(), 'cache', 'plugin_inventory.json')
+PLUGIN_DESCRIPTORS = ('paper-plugin.yml', 'plugin.yml', 'bungee.yml', 'velocity-plugin.json')
+PLUGIN_LOOKUP_TTL = float(os.environ.get('MINEBOARD_PLUGIN_CHECK_TTL', '43200'))
+PLUGIN_LOOKUP_MISS_TTL = 86400.0 * 3  # plugin non trovati su Spiget: si riprova di rado
+PLUGIN_LOOKUP_INTERVAL = float(os.environ.get('MINEBOARD_PLUGIN_CHECK_INTERVAL', '1.0'))
+PLUGIN_LOOKUP_BATCH = 100  # ricerche per giro
+_SPIGOT_RESOURCE_RE = re.compile(r'spigotmc\.org/resources/(?:[^/]*\.)?(\d+)', re.IGNORECASE)
+
+def parse_plugin_yml(text):
+    """Chiavi di primo livello di un plugin.yml (scalari e liste semplici), senza dipendenze YAML."""
+    result = {}
+    current_list = None
+    for raw in text.splitlines():
+        line = raw.split(' #', 1)[0].rstrip()
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        if not line[0].isspace():
+            current_list = None
+            if ':' not in line:
+                continue
+            key, value = line.split(':', 1)
+            key, value = key.strip(), value.strip()
+            if not value:
+                current_list = result[key] = []
+            elif value.startswith('[') and value.endswith(']'):
+                result[key] = [v.strip().strip('\'"') for v in value[1:-1].split(',') if v.strip()]
+            else:
+                result[key] = value.strip('\'"')
+        elif current_list is not None and line.strip().startswith('- '):
+            current_list.append(line.strip()[2:].strip().strip('\'"'))
+    return result
+
+def read_plugin_descriptor(jar_path):
+    """Nome/versione/dipendenze dal descrittore dentro il JAR, o None se non è un plugin."""
+    try:
+        with zipfile.ZipFile(jar_path) as zf:
+            names = set(zf.namelist())
+            for descriptor in PLUGIN_DESCRIPTORS:
+                if descriptor not in names:
+                    continue
+                text = zf.read(descriptor).decode('utf-8', errors='replace')
+                meta = json.loads(text) if descriptor.endswith('.json') else parse_plugin_yml(text)
+                if not isinstance(meta, dict) or not meta.get('name') and not meta.get('id'):
+                    continue
+                def as_list(value):
+                    if isinstance(value, list):
+                        return [v.get('id') if isinstance(v, dict) else str(v) for v in value]
+                    return [value] if value else []
+                return {
+                    'name': str(meta.get('name') or meta.get('id')),
+                    'version': str(meta.get('version') or ''),
+                    'main': meta.get('main'),
+                    'website': meta.get('website') or meta.get('url'),
+                    'authors': as_list(meta.get('authors') or meta.get('author')),
+                    'api_version': meta.get('api-version'),
+                    'depend': as_list(meta.get('depend') or meta.get('dependencies')),
+                    'softdepend': as_list(meta.get('softdepend')),
+                    'descriptor': descriptor,
+                }
+    except (zipfile.BadZipFile, OSError, ValueError, KeyError) as e:
+        print(f"Descrittore plugin non leggibile {jar_path}: {e}")
+    return None
+
+def plugin_name_key(name):
+    return re.sub(r'[\s_-]+', '', str(name or '').lower())
+
+def plugin_lookup_key(plugin):
+    m = _SPIGOT_RESOURCE_RE.search(str(plugin.get('website') or ''))
+    if m:
+        return f'id:{m.group(1)}'
+    return 'name:' + plugin_name_key(plugin['name'])
+
+def _plugin_version_key(v):
+    # Solo il prefisso numerico: i suffissi dei plugin (-b131, -SNAPSHOT, +build) non sono confrontabili
+    return version_sort_key(re.sub(r'^[vV](?=\d)', '', str(v or '').strip()))[:2]
+
+def plugin_update_status(installed, latest):
+    """'up_to_date', 'outdated' o 'unknown' confrontando il prefisso numerico delle versioni."""
+    if not latest or not installed:
+        return 'unknown'
+    if installed.strip().lower() == latest.strip().lower():
+        return 'up_to_date'
+    a, b = _plugin_version_key(installed), _plugin_version_key(latest)
+    if a[0] == 0 or b[0] == 0:
+        return 'unknown'
+    return 'outdated' if b > a else 'up_to_date'
+
+def _spiget_name_matches(resource_name, wanted):
+    """Il titolo Spiget ("WorldEdit for Bukkit", "LuckPerms | ...") corrisponde al nome del plugin?"""
+    title = str(resource_name or '').strip()
+    candidates = (title, re.split(r'\s*[|:(\[–—]|\s-\s', title)[0], (title.split() or [''])[0])
+    return any(plugin_name_key(c) == wanted for c in candidates)
+
+def spiget_find_plugin(plugin, key):
+    """{'resource_id', 'resource_name', 'latest_version'} da Spiget, o None se non trovato."""
+    if key.startswith('id:'):
+        resource_id = int(key[3:])
+        resource_name = plugin['name']
+    else:
+        r = http_get(f"{SPIGET_BASE}/search/resources/{urllib.parse.quote(plugin['name'])}", timeout=SPIGET_TIMEOUT,
+                     params={'field': 'name', 'size': 10, 'sort': '-downloads', 'fields': 'id,name,downloads'})
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        match = next((res for res in r.json() if _spiget_name_matches(res.get('name'), key[5:])), None)
+        if not match:
+            return None
+        resource_id, resource_name = match['id'], match.get('name')
+    r = http_get(f"{SPIGET_BASE}/resources/{resource_id}/versions/latest", timeout=SPIGET_TIMEOUT)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    return {'resource_id': resource_id, 'resource_name': resource_name, 'latest_version': r.json().get('name')}
+
+class PluginInventory:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = None  # {'jars': {percorso: {'size', 'mtime_ns', 'plugin'}}, 'lookups': {chiave: {...}}}
+        self.dirty = False
+        self.checking = False
+
+    def _load(self):
+        if self.data is not None:
+            return
+        self.data = {'jars': {}, 'lookups': {}}
+        try:
+            with open(self.path, 'r') as f:
+                saved = json.load(f)
+            self.data['jars'].update(saved.get('jars') or {})
+            self.data['lookups'].update(saved.get('lookups') or {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Inventario plugin non leggibile, ricostruito: {e}")
+
+    def _save(self):
+        if not self.dirty:
+            return
+        try:
+            write_json_atomic(self.path, self.data)
+            self.dirty = False
+        except Exception as e:
+            print(f"Errore salvataggio inventario plugin: {e}")
+
+    def scan_server(self, server_name):
+        """Plugin in servers/<nome>/plugins/*.jar; rilegge solo i JAR nuovi o modificati."""
+        plugins_dir = os.path.join(SERVER_DIR, server_name, 'plugins')
+        found = []
+        try:
+            entries = [e for e in os.scandir(plugins_dir) if e.is_file() and e.name.lower().endswith('.jar')]
+        except OSError:
+            entries = []
+        seen = set()
+        for entry in sorted(entries, key=lambda e: e.name.lower()):
+            st = entry.stat()
+            with self.lock:
+                self._load()
+                cached = self.data['jars'].get(entry.path)
+            if cached and cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+                plugin = cached['plugin']
+            else:
+                plugin = read_plugin_descriptor(entry.path)
+                with self.lock:
+                    self.data['jars'][entry.path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'plugin': plugin}
+                    self.dirty = True
+            seen.add(entry.path)
+            found.append({'file': entry.name, 'size': st.st_size, 'plugin': plugin})
+        prefix = plugins_dir + os.sep
+        with self.lock:
+            self._load()
+            for path in [p for p in self.data['jars'] if p.startswith(prefix) and p not in seen]:
+                del self.data['jars'][path]
+                self.dirty = True
+            self._save()
+        return found
+
+    def lookup(self, key):
+        with self.lock:
+            self._load()
+            return self.data['lookups'].get(key)
+
+    def needs_lookup(self, key):
+        entry = self.lookup(key)
+        if not entry:
+            return True
+        ttl = PLUGIN_LOOKUP_MISS_TTL if entry.get('missing') else PLUGIN_LOOKUP_TTL
+        return time.time() - entry.get('checked_at', 0) > ttl
+
+    def check_updates(self, plugins):
+        """Cerca su Spiget i plugin (chiave -> descrittore) da verificare, uno per volta."""
+        for key, plugin in list(plugins.items())[:PLUGIN_LOOKUP_BATCH]:
+            try:
+                found = spiget_find_plugin(plugin, key)
+                entry = dict(found, checked_at=time.time()) if found else {'missing': True, 'checked_at': time.time()}
+            except Exception as e:
+                print(f"Ricerca Spiget per {plugin['name']} fallita: {e}")
+                entry = None
+            if entry:
+                with self.lock:
+                    self.data['lookups'][key] = entry
+                    self.dirty = True
+            time.sleep(PLUGIN_LOOKUP_INTERVAL)
+        with self.lock:
+            self._save()
+
+    def start_update_check(self, plugins):
+        """Avvia check_updates in background se non è già in corso; ritorna True se avviato."""
+        with self.lock:
+            if self.checking or not plugins:
+                return False
+            self.checking = True
+
+        def worker():
+            try:
+                self.check_updates(plugins)
+            finally:
+                with self.lock:
+                    self.checking = False
+        threading.Thread(target=worker, daemon=True, name='plugin-update-check').start()
+        return True
+
+    def report(self, server_names):
+        """Inventario con stato aggiornamento per i server indicati; avvia le ricerche mancanti."""
+        servers = {}
+        pending = {}
+        for name in server_names:
+            rows = []
+            for item in self.scan_server(name):
+                plugin = item['plugin']
+                row = {'file': item['file'], 'size': item['size'], 'plugin': plugin, 'status': 'unknown'}
+                if plugin:
+                    key = plugin_lookup_key(plugin)
+                    if self.needs_lookup(key):
+                        pending.setdefault(key, plugin)
+                    found = self.lookup(key) or {}
+                    row.update(resource_id=found.get('resource_id'), latest_version=found.get('latest_version'),
+                               status=plugin_update_status(plugin['version'], found.get('latest_version')))
+                rows.append(row)
+            servers[name] = rows
+        started = self.start_update_check(pending)
+        outdated = [{'server': name, 'file': r['file'], 'name': r['plugin']['name'],
+                     'version': r['plugin']['version'], 'latest_version': r['latest_version'],
+                     'resource_id': r['resource_id']}
+                    for name, rows in servers.items() for r in rows if r['status'] == 'outdated']
+        return {
+            'servers': servers,
+            'outdated': outdated,
+            'pending_lookups': len(pending),
+            'checking': started or self.checking,
+        }
+
+plugin_inventory = PluginInventory(PLUGIN_INVENTORY_FILE)
+
+PLUGIN_INSTALL_CONCURRENCY = max(1, int(os.environ.get('MINEBOARD_PLUGIN_INSTALL_CONCURRENCY', '4')))
+PLUGIN_BULK_MAX = 100  # risorse per operazione, dipendenze incluse
+
+def bulk_install_plugins_job(job_id, resource_ids, server_names, with_dependencies=True):
+    """Job: scarica in parallelo le risorse e le loro dipendenze (una volta sola) e le installa nei server.
+
+    Le dipendenze (depend del plugin.yml) vengono cercate su Spiget per nome e
+    installate solo nei server che non hanno già un plugin con quel nome. Un
+    JAR installato sostituisce quelli con lo stesso nome plugin e file diverso.
+    """
+    plugins = {rid: {'status': 'pending', 'required_by': None} for rid in resource_ids}
+    unresolved = []
+
+    def report():
+        update_job(job_id, plugins={str(k): dict(v) for k, v in plugins.items()}, unresolved=list(unresolved))
+
+    def fetch(rid):
+        try:
+            info = fetch_spiget_plugin(rid)
+            info['plugin'] = read_plugin_descriptor(artifact_cache.blob_path(info['sha256'])) or {}
+            return rid, info, None
+        except requests.HTTPError as he:
+            code = he.response.status_code if getattr(he, 'response', None) is not None else 502
+            return rid, None, f'Errore download: HTTP {code}'
+        except Exception as e:
+            return rid, None, str(e)
+
+    def find_dependency(name):
+        try:
+            return name, spiget_find_plugin({'name': name}, 'name:' + plugin_name_key(name))
+        except Exception as e:
+            print(f"Ricerca dipendenza {name} fallita: {e}")
+            return name, None
+
+    installed = {name: {plugin_name_key(i['plugin']['name']): i['file']
+                        for i in plugin_inventory.scan_server(name) if i['plugin']}
+                 for name in server_names}
+    fetched = {}
+    update_job(job_id, phase='downloading')
+    report()
+    wave = list(resource_ids)
+    with ThreadPoolExecutor(max_workers=PLUGIN_INSTALL_CONCURRENCY) as pool:
+        while wave:
+            for rid, info, error in pool.map(fetch, wave):
+                if error:
+                    plugins[rid].update(status='failed', message=error)
+                else:
+                    fetched[rid] = info
+                    plugins[rid].update(status='downloaded', name=info['plugin'].get('name') or info['name'],
+                                        filename=info['filename'])
+            report()
+            if not with_dependencies:
+                break
+            provided = {plugin_name_key(i['plugin'].get('name') or i['name']) for i in fetched.values()}
+            wanted = {}
+            for rid in wave:
+                for dep in (fetched.get(rid) or {}).get('plugin', {}).get('depend') or []:
+                    key = plugin_name_key(dep)
+                    # Già presente ovunque o già nel set: niente da scaricare
+                    if key in provided or all(key in inst for inst in installed.values()):
+                        continue
+                    wanted.setdefault(dep, plugins[rid].get('name'))
+            wave = []
+            for dep, found in pool.map(find_dependency, list(wanted)):
+                if not found:
+                    unresolved.append({'name': dep, 'required_by': wanted[dep]})
+                    continue
+                rid = found['resource_id']
+                if rid in plugins or len(plugins) >= PLUGIN_BULK_MAX:
+                    continue
+                plugins[rid] = {'status': 'pending', 'required_by': wanted[dep], 'name': dep}
+                wave.append(rid)
+            report()
+
+    update_job(job_id, phase='installing')
+    results = {}
+    for server_name in server_names:
+        plugins_dir = os.path.join(SERVER_DIR, server_name, 'plugins')
+        os.makedirs(plugins_dir, exist_ok=True)
+        done = {'installed': [], 'skipped': [], 'replaced': []}
+        for rid, info in fetched.items():
+            key = plugin_name_key(info['plugin'].get('name') or info['name'])
+            existing = installed[server_name].get(key)
+            if plugins[rid]['required_by'] and existing:
+                done['skipped'].append(existing)
+                continue
+            artifact_cache.install(info['sha256'], os.path.join(plugins_dir, info['filename']))
+            done['installed'].append(info['filename'])
+            if existing and existing != info['filename']:
+                try:
+                    os.remove(os.path.join(plugins_dir, existing))
+                    done['replaced'].append(existing)
+                except OSError as e:
+                    print(f"Impossibile rimuovere {existing} da {server_name}: {e}")
+        results[server_name] = done
+    for rid in fetched:
+        plugins[rid]['status'] = 'installed'
+    report()
+    update_job(job_id, phase='done')
+    failed = [rid for rid, p in plugins.items() if p['status'] == 'failed']
+    if failed and not fetched:
+        raise RuntimeError('Nessun plugin scaricato')
+    return {'servers': results, 'failed': failed, 'unresolved': unresolved}
+
+@app.route('/api/servers/<server_name>/plugins/inventory')
+def get_plugin_inventory(server_name):
+    """Plugin installati nel server con versione e stato aggiornamento (da Spiget, in background)."""
+    if not has_permission('files_access'):
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    if not os.path.isdir(os.path.join(SERVER_DIR, server_name)):
+        return jsonify({'success': False, 'message': 'Server non trovato'}), 404
+    try:
+        report = plugin_inventory.report([server_name])
+        return jsonify({'success': True, 'plugins': report['servers'][server_name],
+                        'pending_lookups': report['pending_lookups'], 'checking': report['checking']})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
+
+@app.route('/api/plugins/outdated')
+def get_outdated_plugins():
+    """Report dei plugin non aggiornati su tutti i server. Solo admin.
+    ?full=1 include l'inventario completo per server."""
+    if not is_admin_user():
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    try:
+        report = plugin_inventory.report(server_registry.names())
+        if request.args.get('full') not in ('1', 'true', 'yes'):
+            report.pop('servers')
+        return jsonify({'success': True, **report})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
+
+@app.route('/api/plugins/bulk-install', methods=['POST'])
+def bulk_install_plugins():
+    """Installa più risorse Spiget (con le dipendenze dichiarate) su uno o più server; risponde con il job.
+
+    JSON: resource_ids (lista), servers (lista di nomi), dependencies (default true).
+    """
+    if not has_permission('files_access'):
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    data = request.get_json(silent=True) or {}
+    resource_ids = data.get('resource_ids') or []
+    server_names = data.get('servers') or []
+    if not isinstance(resource_ids, list) or not isinstance(server_names, list):
+        return jsonify({'success': False, 'message': 'resource_ids e servers devono essere liste'}), 400
+    try:
+        resource_ids = list(dict.fromkeys(int(r) for r in resource_ids))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'resource_ids non validi'}), 400
+    if not resource_ids or not server_names:
+        return jsonify({'success': False, 'message': 'resource_ids e servers richiesti'}), 400
+    if len(resource_ids) > PLUGIN_BULK_MAX:
+        return jsonify({'success': False, 'message': f'Al massimo {PLUGIN_BULK_MAX} risorse per richiesta'}), 400
+    # Solo nomi di server registrati: niente percorsi assoluti o '..' fuori da SERVER_DIR
+    if not all(isinstance(n, str) for n in server_names):
+        return jsonify({'success': False, 'message': 'servers deve contenere nomi di server'}), 400
+    server_names = list(dict.fromkeys(server_names))
+    known = set(server_registry.names())
+    missing = [n for n in server_names if n not in known]
+    if missing:
+        return jsonify({'success': False, 'message': f"Server non validi: {', '.join(missing)}"}), 400
+    job = create_job('plugin-bulk-install', session.get('user'), servers=server_names, resource_ids=resource_ids)
+    run_job(job, bulk_install_plugins_job, resource_ids, server_names, data.get('dependencies', True) is not False)
+    return jsonify({'success': True, 'job_id': job['id'], 'job': job}), 202
+
+# ===================== DASHBOARD SNAPSHOT =====================
+# Un unico snapshot condiviso (host + stato di tutti i server) ricalcolato da un
+# thread in background solo finché qualcuno lo sta guardando. I client fanno
+# long-poll con ?wait_for_change=<version> invece di interrogare ogni 2 secondi.
+# La versione cambia solo per modifiche significative: le metriche dell'host e
+# lo spazio su disco entrano nel confronto arrotondate a scaglioni, mentre lo
+# snapshot servito riporta sempre i valori più recenti.
+DASHBOARD_REFRESH_INTERVAL = float(os.environ.get('MINEBOARD_DASHBOARD_INTERVAL', '2'))
+DASHBOARD_LONGPOLL_MAX = 30.0
+DASHBOARD_IDLE_AFTER = 60.0  # secondi senza richieste dopo cui il refresher si ferma
+DASHBOARD_HOST_STEP = 5.0    # punti percentuali per scaglione (cpu, memoria, disco)
+DASHBOARD_DISK_STEP = 64 * 1024 * 1024
+
+dashboard_state = {
+    'version': 0,
+    'snapshot': None,
+    'digest': None,
+    'last_request': 0.0,
+}
+dashboard_cond = threading.Condition()
+dashboard_wake = threading.Event()
+
+def build_dashboard_snapshot():
+    mem = psutil.virtual_memory()
+    disk = psutil.disk_usage('/')
+    host = {
+        'cpu_percent': round(float(psutil.cpu_percent(interval=None)), 1),
+        'memory_percent': round(float(mem.percent), 1),
+        'disk_percent': round(float(disk.percent), 1),
+    }
+    servers = []
+    for cfg in list_server_configs():
+        srv = running_servers.get(cfg['name'])
+        usage = cfg.get('disk_usage') or {}
+        servers.append({
+            'name': cfg['name'],
+            'port': cfg.get('port'),
+            'max_memory': cfg.get('max_memory'),
+            'jar_file': cfg.get('jar_file'),
+            'platform': cfg.get('platform', 'minecraft'),
+            'status': cfg.get('status', 'stopped'),
+            'players': len(getattr(srv, 'online_players', ()) or ()) if srv else 0,
+            'disk_bytes': usage.get('total_bytes'),
+            'over_quota': usage.get('over_quota', False),
+        })
+    servers.sort(key=lambda s: s['name'].lower())
+    return {'host': host, 'servers': servers}
+
+def dashboard_digest(snapshot):
+    """Impronta dello snapshot con i valori che oscillano a ogni lettura ridotti a scaglioni."""
+    host = {k: int(v // DASHBOARD_HOST_STEP) for k, v in snapshot['host'].items()}
+    servers = [dict(s, disk_bytes=None if s['disk_bytes'] is None else s['disk_bytes'] // DASHBOARD_DISK_STEP)
+               for s in snapshot['servers']]
+    return json.dumps({'host': host, 'servers': servers}, sort_keys=True)
+
+def refresh_dashboard_snapshot():
+    snapshot = build_dashboard_snapshot()
+    digest = dashboard_digest(snapshot)
+    with dashboard_cond:
+        changed = digest != dashboard_state['digest']
+        if changed:
+            dashboard_state['version'] += 1
+            dashboard_state['digest'] = digest
+        # Valori aggiornati anche a versione invariata: li riceve chi fa polling o scade il long-poll
+        dashboard_state['snapshot'] = dict(snapshot, version=dashboard_state['version'],
+                                           generated_at=datetime.now(timezone.utc).isoformat())
+        if changed:
+            dashboard_cond.notify_all()
+        return dashboard_state['snapshot']
+
+def notify_dashboard_change():
+    """Richiede un ricalcolo immediato (es. avvio/arresto server)."""
+    dashboard_wake.set()
+
+def background_dashboard_refresher():
+    while True:
+        dashboard_wake.wait(DASHBOARD_REFRESH_INTERVAL)
+        dashboard_wake.clear()
+        if time.time() - dashboard_state['last_request'] > DASHBOARD_IDLE_AFTER:
+            continue  # nessuna dashboard aperta: niente lavoro
+        try:
+            refresh_dashboard_snapshot()
+        except Exception as e:
+            print(f"Errore snapshot dashboard: {e}")
+
+@app.route('/api/dashboard/snapshot')
+def dashboard_snapshot():
+    """Host + stato di tutti i server. Con ?wait_for_change=<version> attende (long-poll) una modifica."""
+    try:
+        wait_for = request.args.get('wait_for_change', type=int)
+        timeout = min(max(request.args.get('timeout', 25, type=float), 0), DASHBOARD_LONGPOLL_MAX)
+        now = time.time()
+        idle = now - dashboard_state['last_request'] > DASHBOARD_IDLE_AFTER
+        dashboard_state['last_request'] = now
+        snapshot = dashboard_state['snapshot']
+        if snapshot is None or idle:
+            # Primo accesso o refresher fermo per inattività: ricalcola subito
+            snapshot = refresh_dashboard_snapshot()
+        if wait_for is not None and snapshot['version'] == wait_for:
+            request.environ['mineboard.long_poll'] = True
+            with dashboard_cond:
+                dashboard_cond.wait_for(lambda: dashboard_state['version'] != wait_for, timeout)
+                snapshot = dashboard_state['snapshot']
+        return jsonify(dict(snapshot, success=True))
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
+
+def _histogram_quantile(bounds, buckets, count, q):
+    """Stima il quantile come limite superiore del bucket che lo contiene."""
+    if not count:
+        return None
+    target = q * count
+    cumulative = 0
+    for bound, n in zip(bounds, buckets):
+        cumulative += n
+        if cumulative >= target:
+            return bound
+    return float('inf')
+
+@app.route('/api/system/artifact-cache', methods=['GET', 'POST'])
+def system_artifact_cache():
+    """Contenuto della cache artefatti (GET, ?verify=1 ricalcola gli hash) o garbage collection (POST). Solo admin."""
+    if not is_admin_user():
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    try:
+        if request.method == 'POST':
+            removed = artifact_cache.gc()
+            return jsonify({'success': True, 'removed': removed})
+        verify = request.args.get('verify') in ('1', 'true', 'yes')
+        return jsonify({'success': True, **artifact_cache.stats(verify=verify)})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Errore: {str(e)}'}), 500
+
+@app.route('/api/system/requests')
+def system_request_stats():
+    """Statistiche per route (latenze, status, dimensioni) e richieste lente recenti. Solo admin."""
+    if not is_admin_user():
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    routes = {}
+    with metrics_lock:
+        histograms = [(k, dict(h, buckets=list(h['buckets']))) for k, h in metrics_histograms.items()]
+        counters = list(metrics_counters.items())
+    for (name, labels), h in histograms:
+        if name not in ('mineboard_http_request_duration_seconds', 'mineboard_http_response_size_bytes'):
+            continue
+        lbl = dict(labels)
+        entry = routes.setdefault((lbl['method'], lbl['endpoint']), {
+            'method': lbl['method'], 'route': lbl['endpoint'], 'count': 0, 'status': {}})
+        if name == 'mineboard_http_request_duration_seconds':
+            entry['count'] = h['count']
+            entry['avg_ms'] = round(h['sum'] * 1000 / h['count'], 2) if h['count'] else None
+            for q in (0.5, 0.95, 0.99):
+                v = _histogram_quantile(h['bounds'], h['buckets'], h['count'], q)
+                entry[f'p{int(q * 100)}_ms'] = None if v is None or v == float('inf') else v * 1000
+        else:
+            entry['bytes_total'] = h['sum']
+            entry['avg_bytes'] = round(h['sum'] / h['count']) if h['count'] else None
+    for (name, labels), value in counters:
+        if name != 'mineboard_http_requests_total':
+            continue
+        lbl = dict(labels)
+        entry = routes.get((lbl['method'], lbl['endpoint']))
+        if entry is not None:
+            entry['status'][lbl['status']] = value
+    return jsonify({
+        'success': True,
+        'in_flight': request_metrics.in_flight,
+        'in_flight_peak': request_metrics.in_flight_peak,
+        'slow_threshold_ms': round(request_metrics.slow_threshold * 1000),
+        'routes': sorted(routes.values(), key=lambda e: e['count'], reverse=True),
+        'slow_requests': list(request_metrics.slow_requests)[::-1],
+    })
+
+# ===================== ON-DEMAND PROFILER =====================
+PROFILE_MAX_SECONDS = float(os.environ.get('MINEBOARD_PROFILE_MAX_SECONDS', '60'))
+profile_lock = threading.Lock()  # un solo profilo alla volta
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def sample_thread_stacks(duration, interval):
+    """Campiona gli stack di tutti i thread e ritorna {stack_collassato: conteggio}."""
+    own = threading.get_ident()
+    stacks = {}
+    samples = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f'thread-{ident}'))
+            key = ';'.join(reversed(labels))
+            stacks[key] = stacks.get(key, 0) + 1
+        samples += 1
+        time.sleep(interval)
+    return stacks, samples
+
+def tracemalloc_diff(duration, limit, frames):
+    """Differenza tra due snapshot tracemalloc presi a distanza di `duration` secondi."""
+    import tracemalloc
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(frames)
+    try:
+        exclude = (tracemalloc.Filter(False, tracemalloc.__file__),)
+        before = tracemalloc.take_snapshot().filter_traces(exclude)
+        time.sleep(duration)
+        after = tracemalloc.take_snapshot().filter_traces(exclude)
+        stats = after.compare_to(before, 'traceback')
+        traced, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+    top = []
+    for stat in stats[:limit]:
+        top.append({
+            'size_diff': stat.size_diff,
+            'count_diff': stat.count_diff,
+            'size': stat.size,
+            'count': stat.count,
+            # Frame più recente per primo
+            'traceback': [f"{f.filename}:{f.lineno}" for f in reversed(stat.traceback)],
+        })
+    return {'traced_bytes': traced, 'peak_bytes': peak, 'top': top}
+
+@app.route('/api/system/profile', methods=['POST'])
+def system_profile():
+    """Profilo on-demand del processo MineBoard. Solo admin.
+
+    mode=cpu (default): stack campionati di tutti i thread in formato collassato
+    (compatibile con flamegraph.pl/speedscope). mode=memory: diff tracemalloc.
+    """
+    if not is_admin_user():
+        return jsonify({'success': False, 'message': 'Permesso negato'}), 403
+    params = request.get_json(silent=True) or request.args
+    mode = (params.get('mode') or 'cpu').lower()
+    try:
+        duration = min(max(float(params.get('duration', 10)), 0.1), PROFILE_MAX_SECONDS)
+        interval = min(max(float(params.get('interval_ms', 10)), 1.0), 1000.0) / 1000.0
+        limit = min(max(int(params.get('limit', 30)), 1), 500)
+        frames = min(max(int(params.get('frames', 10)), 1), 50)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Parametri non validi'}), 400
+    if mode not in ('cpu', 'memory'):
+        return jsonify({'success': False, 'message': 'mode deve essere cpu o memory'}), 400
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({'success': False, 'message': 'Un profilo è già in esecuzione'}), 409
+    try:
+        if mode == 'memory':
+            result = tracemalloc_diff(duration, limit, frames)
+            return jsonify({'success': True, 'mode': 'memory', 'duration': duration, **result})
+        stacks, samples = sample_thread_stacks(duration, interval)
+        body = ''.join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+        return app.response_class(body, mimetype='text/plain', headers={
+            'X-Profile-Samples': str(samples),
+            'X-Profile-Duration': str(duration),
+            'Content-Disposition': f'attachment; filename="mineboard-{int(time.time())}.collapsed"',
+        })
+    finally:
+        profile_lock.release()
+
+# ===================== METRICS SAMPLER + /metrics =====================
+# Le metriche per server vengono raccolte da un thread in background: lo scrape
+# serializza solo l'ultimo campione, quindi il costo non cresce con le richieste.
+metrics_samples = {
+    'servers': {},       # nome -> dict campione
+    'sampled_at': None,
+    'duration': 0.0,
+}
+_metrics_processes = {}  # pid -> psutil.Process (riusati per cpu_percent tra un campione e l'altro)
+
+def _sample_process_tree(pid):
+    """Ritorna (cpu_percent, rss, n_processi) per il processo e i suoi figli."""
+    procs = []
+    try:
+        root = _metrics_processes.get(pid) or psutil.Process(pid)
+        procs.append(root)
+        procs.extend(root.children(recursive=True))
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None, None, 0
+    cpu, rss, alive = 0.0, 0, 0
+    for proc in procs:
+        cached = _metrics_processes.setdefault(proc.pid, proc)
+        try:
+            with cached.oneshot():
+                cpu += cached.cpu_percent(None)
+                rss += cached.memory_info().rss
+            alive += 1
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            _metrics_processes.pop(proc.pid, None)
+    return cpu, rss, alive
+
+def collect_metrics_sample():
+    started = time.monotonic()
+    servers = {}
+    try:
+        names = server_registry.names()
+    except OSError:
+        names = []
+    for name in names:
+        sample = {'up': 0, 'uptime': 0.0, 'players': 0, 'cpu': 0.0, 'rss': 0, 'processes': 0}
+        srv = running_servers.get(name)
+        proc = srv.process if srv else None
+        if srv and srv.status == 'running' and proc:
+            sample['up'] = 1
+            sample['uptime'] = time.time() - srv.started_at if srv.started_at else 0.0
+            sample['players'] = len(getattr(srv, 'online_players', ()) or ())
+            cpu, rss, count = _sample_process_tree(proc.pid)
+            sample['cpu'] = cpu or 0.0
+            sample['rss'] = rss or 0
+            sample['processes'] = count
+        gc_path = os.path.join(SERVER_DIR, name, GC_LOG_RELATIVE_PATH)
+        if name in gc_tailers or (sample['up'] and os.path.exists(gc_path)):
+            tailer = get_gc_tailer(name)
+            tailer.poll()
+            sample['gc'] = tailer.snapshot()
+        servers[name] = sample
+    # Dimentica i processi non più vivi per non far crescere la cache
+    for pid in list(_metrics_processes):
+        try:
+            if not _metrics_processes[pid].is_running():
+                _metrics_processes.pop(pid, None)
+        except Exception:
+            _metrics_processes.pop(pid, None)
+    metrics_samples['servers'] = servers
+    metrics_samples['sampled_at'] = time.time()
+    metrics_samples['duration'] = time.monotonic() - started
+
+def background_metrics_sampler():
+    while True:
+        try:
+            collect_metrics_sample()
+        except Exception as e:
+            print(f"Errore raccolta metriche: {e}")
+        time.sleep(METRICS_SAMPLE_INTERVAL)
+
+def _format_metric_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for k, v in labels:
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{k}="{v}"')
+    return '{' + ','.join(parts) + '}'
+
+def _format_metric_value(v):
+    if isinstance(v, float):
+        return repr(round(v, 6))
+    return str(v)
+
+def render_metrics():
+    """Serializza campioni e registro nel formato di esposizione testuale Prometheus."""
+    series = {}  # nome -> lista di righe
+    for name, sample in sorted(metrics_samples['servers'].items()):
+        labels = (('server', name),)
+        for metric, field in (('mineboard_server_up', 'up'),
+                              ('mineboard_server_uptime_seconds', 'uptime'),
+                              ('mineboard_server_players_online', 'players'),
+                              ('mineboard_server_cpu_percent', 'cpu'),
+                              ('mineboard_server_rss_bytes', 'rss'),
+                              ('mineboard_server_processes', 'processes')):
+            series.setdefault(metric, []).append(
+                f"{metric}{_format_metric_labels(labels)} {_format_metric_value(sample[field])}")
+        gc = sample.get('gc')
+        if gc:
+            lines = series.setdefault('mineboard_jvm_gc_pause_seconds', [])
+            for q, key in (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99'), ('1', 'max')):
+                value = gc['pause_ms'][key] / 1000.0 if gc['pause_ms'] else 'NaN'
+                lines.append(f"mineboard_jvm_gc_pause_seconds{_format_metric_labels(labels + (('quantile', q),))} "
+                             f"{_format_metric_value(value)}")
+            lines.append(f"mineboard_jvm_gc_pause_seconds_sum{_format_metric_labels(labels)} "
+                         f"{_format_metric_value(gc['pause_time_total_ms'] / 1000.0)}")
+            lines.append(f"mineboard_jvm_gc_pause_seconds_count{_format_metric_labels(labels)} {gc['pause_count_total']}")
+            for metric, field in (('mineboard_jvm_gc_collections_total', 'collections_total'),
+                                  ('mineboard_jvm_gc_allocation_rate_bytes_per_second', 'allocation_rate_bytes_per_second'),
+                                  ('mineboard_jvm_gc_per_minute', 'gc_per_minute'),
+                                  ('mineboard_jvm_heap_after_gc_bytes', 'heap_after_gc_bytes')):
+                if gc[field] is not None:
+                    series.setdefault(metric, []).append(
+                        f"{metric}{_format_metric_labels(labels)} {_format_metric_value(gc[field])}")
+    if metrics_samples['sampled_at'] is not None:
+        series['mineboard_metrics_sample_duration_seconds'] = [
+            f"mineboard_metrics_sample_duration_seconds {_format_metric_value(metrics_samples['duration'])}"]
+        series['mineboard_metrics_last_sample_timestamp_seconds'] = [
+            f"mineboard_metrics_last_sample_timestamp_seconds {_format_metric_value(metrics_samples['sampled_at'])}"]
+    with metrics_lock:
+        counters = list(metrics_counters.items())
+        gauges = list(metrics_gauges.items())
+        histograms = [(k, dict(h, buckets=list(h['buckets']))) for k, h in metrics_histograms.items()]
+    for (name, labels), value in sorted(counters + gauges):
+        series.setdefault(name, []).append(f"{name}{_format_metric_labels(labels)} {_format_metric_value(value)}")
+    for (name, labels), h in sorted(histograms, key=lambda item: item[0]):
+        lines = series.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(h['bounds'], h['buckets']):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_metric_labels(labels + (('le', str(bound)),))} {cumulative}")
+        lines.append(f"{name}_bucket{_format_metric_labels(labels + (('le', '+Inf'),))} {h['count']}")
+        lines.append(f"{name}_sum{_format_metric_labels(labels)} {_format_metric_value(h['sum'])}")
+        lines.append(f"{name}_count{_format_metric_labels(labels)} {h['count']}")
+    out = []
+    for name in sorted(series):
+        kind, help_text = METRICS_HELP.get(name, ('untyped', name))
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(series[name])
+    return '\n'.join(out) + '\n'
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Endpoint Prometheus, autenticato con MINEBOARD_METRICS_TOKEN (Bearer o ?token=)."""
+    if not METRICS_TOKEN:
+        abort(404)
+    import hmac
+    auth = request.headers.get('Authorization', '')
+    token = auth[7:].strip() if auth.lower().startswith('bearer ') else (request.args.get('token') or '')
+    if not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        return 'Unauthorized\n', 401, {'Content-Type': 'text/plain; charset=utf-8',
+                                      'WWW-Authenticate': 'Bearer realm="mineboard-metrics"'}
+    return app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.errorhandler(404)
 def not_found(error):
     # Rispondi in JSON per le API, HTML per il resto
@@ -2648,10 +7603,48 @@ if __name__ == '__main__':
     print("🌐 Server disponibile su: http://localhost:8999")
     # Avvia il checker versione in background (ogni 2 minuti)
     try:
-        t = threading.Thread(target=background_version_checker, daemon=True)
+        t = threading.Thread(target=background_version_checker, daemon=True, name='version-checker')
         t.start()
     except Exception:
         pass
+    # Registro server in memoria per /api/servers
+    try:
+        server_registry.start()
+    except Exception as e:
+        print(f"Errore avvio registro server: {e}")
+    # Indice uso disco per server (inotify o riscansioni periodiche)
+    try:
+        disk_usage_index.start()
+    except Exception as e:
+        print(f"Errore avvio indice uso disco: {e}")
+    # Aggiornamento opzionale delle liste versions/ da upstream
+    if VERSIONS_UPSTREAM_URL:
+        try:
+            threading.Thread(target=background_versions_refresher, daemon=True, name='versions-refresher').start()
+        except Exception:
+            pass
+    # Prefetch opzionale dei JAR nelle ore di bassa attività
+    if PREFETCH_ENABLED:
+        try:
+            threading.Thread(target=background_jar_prefetcher, daemon=True, name='jar-prefetcher').start()
+        except Exception:
+            pass
+    # Indice locale opzionale delle risorse Spiget più popolari
+    if SPIGET_INDEX_ENABLED:
+        try:
+            threading.Thread(target=background_spiget_indexer, daemon=True, name='spiget-indexer').start()
+        except Exception:
+            pass
+    # Snapshot condiviso per le dashboard (long-poll)
+    try:
+        threading.Thread(target=background_dashboard_refresher, daemon=True, name='dashboard-refresher').start()
+    except Exception:
+        pass
+    # Campionamento metriche per /metrics
+    try:
+        threading.Thread(target=background_metrics_sampler, daemon=True, name='metrics-sampler').start()
+    except Exception:
+        pass
     # Quick version check at startup (non-bloccante)
     try:
         latest = fetch_latest_version()
@@ -2662,7 +7655,8 @@ if __name__ == '__main__':
     # Usa un server WSGI di produzione per evitare l'avviso del dev server
     try:
         from waitress import serve
-        serve(app, host='0.0.0.0', port=8999)
+        # Più thread del default (4): le dashboard in long-poll ne tengono occupato uno ciascuna
+        serve(app, host='0.0.0.0', port=8999, threads=int(os.environ.get('MINEBOARD_THREADS', '16')))
     except ImportError:
         # Fallback se waitress non è installato
         app.run(host='0.0.0.0', port=8999, debug=False)
@@ -113,6 +113,83 @@ async function apiCall(url, options = {}) {
     }
 }
 
+// Job lato server: attende la fine facendo polling su /api/jobs/<id>
+async function waitForJob(jobId, onProgress, intervalMs = 1000) {
+    while (true) {
+        await new Promise(r => setTimeout(r, intervalMs));
+        const res = await fetch(`/api/jobs/${jobId}`);
+        const data = await res.json();
+        if (!data.success) throw new Error(data.message || 'Job non trovato');
+        const job = data.job;
+        if (onProgress) onProgress(job);
+        if (job.status === 'completed') return job;
+        if (job.status === 'failed') throw new Error(job.message || 'Operazione fallita');
+    }
+}
+
+// Installa un JAR direttamente nella cartella del server (nessun passaggio dal browser)
+async function installJarJob(serverName, category, version, filename, onProgress) {
+    const start = await apiCall(`/api/servers/${encodeURIComponent(serverName)}/install-jar`, {
+        method: 'POST',
+        body: JSON.stringify({ type: category, version: version, filename: filename })
+    });
+    if (!start.success) throw new Error(start.message || 'Installazione non avviata');
+    return waitForJob(start.job_id, onProgress);
+}
+
+// Upload a blocchi riprendibile: init, PUT dei blocchi per offset, complete.
+// Se la sessione esiste già (stesso file e percorso) riparte dall'offset ricevuto.
+// Per i JAR si invia anche lo SHA-256: se il server lo ha già in cache non si carica nulla.
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const UPLOAD_HASH_MAX_SIZE = 256 * 1024 * 1024;  // crypto.subtle legge tutto il file in memoria
+
+async function uploadFileSha256(file) {
+    // crypto.subtle esiste solo in contesti sicuri (https o localhost)
+    if (!window.crypto || !crypto.subtle || !file.name.toLowerCase().endsWith('.jar') || file.size > UPLOAD_HASH_MAX_SIZE) {
+        return null;
+    }
+    const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function uploadFileChunked(serverName, folder, filename, file, onProgress) {
+    const base = `/api/files/${encodeURIComponent(serverName)}/uploads`;
+    const init = await apiCall(base, {
+        method: 'POST',
+        body: JSON.stringify({ path: folder, filename: filename, size: file.size, sha256: await uploadFileSha256(file) })
+    });
+    if (!init.success) throw new Error(init.message || 'Upload non avviato');
+    if (init.complete) return init;
+    let offset = init.offset;
+    let retries = 0;
+    while (offset < file.size) {
+        const chunk = await file.slice(offset, offset + init.chunk_size).arrayBuffer();
+        const headers = { 'Content-Type': 'application/octet-stream' };
+        // crypto.subtle esiste solo in contesti sicuri (https o localhost)
+        if (window.crypto && crypto.subtle) {
+            const digest = await crypto.subtle.digest('SHA-256', chunk);
+            headers['X-Chunk-SHA256'] = Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+        }
+        let data;
+        try {
+            const res = await fetch(`${base}/${init.upload_id}?offset=${offset}`, { method: 'PUT', headers: headers, body: chunk });
+            data = await res.json();
+        } catch (e) {
+            data = { success: false, message: e.message };
+        }
+        if (!data.success) {
+            if (++retries > 3) throw new Error(data.message || 'Errore nel caricamento');
+            await new Promise(r => setTimeout(r, 1000 * retries));
+            if (typeof data.offset === 'number') offset = data.offset;
+            continue;
+        }
+        retries = 0;
+        offset = data.offset;
+        if (onProgress) onProgress(offset, file.size);
+    }
+    return apiCall(`${base}/${init.upload_id}/complete`, { method: 'POST' });
+}
+
 // Gestione tab
 function initTabs() {
     const tabs = document.querySelectorAll('.nav-tab');
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def mineboard(tmp_path_factory):
+    """Modulo app importato in una cartella di lavoro temporanea.
+
+    app.py crea servers/, backups/, users.json, ... nella cartella corrente:
+    i test non devono toccare quella del repository.
+    """
+    os.chdir(tmp_path_factory.mktemp('mineboard'))
+    import app
+    return app
+
+
+@pytest.fixture
+def fixture_path():
+    return lambda name: os.path.join(FIXTURES, name)
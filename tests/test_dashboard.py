@@ -0,0 +1,32 @@
+import pytest
+
+
+@pytest.fixture
+def snapshots(mineboard, monkeypatch):
+    current = {}
+    monkeypatch.setattr(mineboard, 'build_dashboard_snapshot', lambda: current['value'])
+    monkeypatch.setitem(mineboard.dashboard_state, 'digest', None)
+
+    def refresh(cpu, status='running', disk_bytes=100 * 1024 ** 2):
+        current['value'] = {
+            'host': {'cpu_percent': cpu, 'memory_percent': 40.0, 'disk_percent': 70.0},
+            'servers': [{'name': 's1', 'status': status, 'players': 0, 'disk_bytes': disk_bytes}],
+        }
+        return mineboard.refresh_dashboard_snapshot()
+    return refresh
+
+
+def test_host_jitter_keeps_version(snapshots):
+    version = snapshots(12.3)['version']
+    snap = snapshots(13.9, disk_bytes=101 * 1024 ** 2)
+    assert snap['version'] == version
+    # I valori serviti restano quelli più recenti
+    assert snap['host']['cpu_percent'] == 13.9
+    assert snap['servers'][0]['disk_bytes'] == 101 * 1024 ** 2
+
+
+def test_significant_changes_bump_version(snapshots):
+    version = snapshots(12.3)['version']
+    assert snapshots(35.0)['version'] == version + 1
+    assert snapshots(35.0, status='stopped')['version'] == version + 2
+    assert snapshots(35.0, status='stopped', disk_bytes=900 * 1024 ** 2)['version'] == version + 3
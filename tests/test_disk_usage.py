@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def index(mineboard, tmp_path, monkeypatch):
+    monkeypatch.setattr(mineboard, 'SERVER_DIR', str(tmp_path))
+    idx = mineboard.DiskUsageIndex()
+    # Come se inotify fosse attivo, senza thread né watch reali
+    idx.watcher.available = True
+    monkeypatch.setattr(idx.watcher, 'add_tree', lambda root, mask: True)
+    server = tmp_path / 's1'
+    (server / 'world' / 'region').mkdir(parents=True)
+    (server / 'world' / 'region' / 'r.0.0.mca').write_bytes(b'x' * 4096)
+    (server / 'server.jar').write_bytes(b'j' * 1000)
+    idx.scan_server('s1')
+    return idx
+
+
+def flush(idx):
+    changed, idx.changed = idx.changed, {}
+    for name, paths in changed.items():
+        idx.apply_file_changes(name, paths)
+
+
+def event(mineboard, idx, path, mask):
+    idx._on_event(os.path.dirname(str(path)), os.path.basename(str(path)), mask)
+
+
+def test_file_events_apply_deltas_without_rescan(mineboard, index, tmp_path, monkeypatch):
+    W = mineboard.InotifyWatcher
+    assert index.get('s1')['folders'] == {'.': 1000, 'world': 4096}
+
+    def no_rescan(*args, **kwargs):
+        raise AssertionError('riscansione non attesa')
+    monkeypatch.setattr(mineboard, 'scan_tree_size', no_rescan)
+
+    region = tmp_path / 's1' / 'world' / 'region'
+    with open(region / 'r.0.0.mca', 'ab') as f:
+        f.write(b'x' * 4096)
+    event(mineboard, index, region / 'r.0.0.mca', W.IN_MODIFY)
+    event(mineboard, index, region / 'r.0.0.mca', W.IN_MODIFY)
+    (region / 'r.0.1.mca').write_bytes(b'y' * 100)
+    event(mineboard, index, region / 'r.0.1.mca', W.IN_CREATE)
+    (tmp_path / 's1' / 'server.jar').unlink()
+    event(mineboard, index, tmp_path / 's1' / 'server.jar', W.IN_DELETE)
+    assert not index.dirty
+    flush(index)
+
+    usage = index.get('s1')
+    assert usage['folders'] == {'.': 0, 'world': 8192 + 100}
+    assert usage['files'] == 2
+
+
+def test_directory_events_rescan_folder(mineboard, index, tmp_path):
+    W = mineboard.InotifyWatcher
+    plugins = tmp_path / 's1' / 'plugins'
+    plugins.mkdir()
+    (plugins / 'a.jar').write_bytes(b'a' * 300)
+    event(mineboard, index, plugins, W.IN_CREATE | W.IN_ISDIR)
+    assert index.dirty == {'s1': {'plugins'}}
+    index.dirty.clear()  # come fa _run prima di riscansionare
+    index.rescan_folder('s1', 'plugins')
+    assert index.get('s1')['folders']['plugins'] == 300
+
+    # Dopo la riscansione i file della cartella sono seguiti con le stat
+    (plugins / 'a.jar').write_bytes(b'a' * 500)
+    event(mineboard, index, plugins / 'a.jar', W.IN_CLOSE_WRITE)
+    flush(index)
+    assert index.get('s1')['folders']['plugins'] == 500
+
+
+def test_queue_overflow_rescans_everything(mineboard, index):
+    index._on_event(None, '', 0)
+    assert index.dirty == {'s1': None}
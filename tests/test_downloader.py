@@ -0,0 +1,165 @@
+import hashlib
+import http.server
+import json
+import os
+import re
+import threading
+import time
+
+import pytest
+
+PAYLOAD = os.urandom(600 * 1024)
+SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Serve PAYLOAD su /file.jar con supporto a Range; /download redirige lì."""
+
+    requests_seen = []
+    truncate_at = None  # se impostato, le risposte parziali si interrompono dopo tanti byte
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        type(self).requests_seen.append('HEAD ' + self.path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/java-archive')
+        self.send_header('Content-Length', str(len(PAYLOAD)))
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == '/download':
+            self.send_response(302)
+            self.send_header('Location', '/file.jar')
+            self.end_headers()
+            return
+        rng = self.headers.get('Range')
+        type(self).requests_seen.append(rng)
+        start, end = 0, len(PAYLOAD) - 1
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', rng or '')
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), end) if match.group(2) else end
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(PAYLOAD)}')
+        else:
+            self.send_response(200)
+        body = PAYLOAD[start:end + 1]
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Disposition', 'attachment; filename="plugin-1.0.jar"')
+        self.end_headers()
+        limit = type(self).truncate_at
+        if limit and len(body) > limit:
+            # Connessione chiusa a metà: il client vede una risposta incompleta
+            self.wfile.write(body[:limit])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    RangeHandler.requests_seen = []
+    RangeHandler.truncate_at = None
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def small_segments(mineboard, monkeypatch):
+    # Soglie ridotte: il payload di test viene scaricato in 4 segmenti
+    monkeypatch.setattr(mineboard, 'DOWNLOAD_PARALLEL_MIN_BYTES', 64 * 1024)
+    monkeypatch.setattr(mineboard, 'DOWNLOAD_BUFFER_SIZE', 16 * 1024)
+    monkeypatch.setattr(mineboard, 'DOWNLOAD_CHUNK_SIZE', 4 * 1024)
+    monkeypatch.setattr(mineboard, 'DOWNLOAD_STATE_INTERVAL', 0.05)
+    monkeypatch.setattr(mineboard, 'DOWNLOAD_RETRIES', 0)
+    return mineboard
+
+
+def test_segmented_download(small_segments, server, tmp_path):
+    part = str(tmp_path / 'file.part')
+    result = small_segments.fetch_to_file(server + '/download', part, expected_sha256=SHA256, segments=4)
+    assert result['sha256'] == SHA256
+    assert result['url'] == server + '/file.jar'
+    assert result['filename'] == 'plugin-1.0.jar'
+    with open(part, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(part + '.json')
+    # Richiesta di prova + un GET per segmento, ognuno con il proprio Range
+    step = -(-len(PAYLOAD) // 4)
+    assert RangeHandler.requests_seen[0] == 'bytes=0-0'
+    assert sorted(RangeHandler.requests_seen[1:]) == sorted(
+        f'bytes={s}-{min(s + step, len(PAYLOAD)) - 1}' for s in range(0, len(PAYLOAD), step))
+
+
+def test_interrupted_download_resumes(small_segments, server, tmp_path):
+    part = str(tmp_path / 'file.part')
+    RangeHandler.truncate_at = 40 * 1024
+    with pytest.raises(small_segments.DownloadError, match='riprendibile'):
+        small_segments.fetch_to_file(server + '/file.jar', part, expected_sha256=SHA256, segments=4)
+    with open(part + '.json') as f:
+        state = json.load(f)
+    done = [seg[2] for seg in state['segments']]
+    assert all(0 < d < len(PAYLOAD) // 4 for d in done)
+
+    RangeHandler.truncate_at = None
+    RangeHandler.requests_seen = []
+    result = small_segments.fetch_to_file(server + '/file.jar', part, expected_sha256=SHA256, segments=4)
+    assert result['sha256'] == SHA256
+    # Ogni segmento riparte dal byte in cui si era fermato
+    resumed = sorted(int(r.split('=')[1].split('-')[0]) for r in RangeHandler.requests_seen[1:])
+    assert resumed == sorted(seg[0] + seg[2] for seg in state['segments'])
+
+
+def test_changed_remote_file_restarts(small_segments, server, tmp_path):
+    part = str(tmp_path / 'file.part')
+    with open(part, 'wb') as f:
+        f.write(b'x' * 1024)
+    with open(part + '.json', 'w') as f:
+        json.dump({'identity': [server + '/file.jar', len(PAYLOAD), '"old"'], 'segments': [[0, 1023, 1024]]}, f)
+    result = small_segments.fetch_to_file(server + '/file.jar', part, expected_sha256=SHA256, segments=4)
+    assert result['sha256'] == SHA256
+    assert len(RangeHandler.requests_seen) == 5
+
+
+def test_artifact_cache_fetch_releases_lock(mineboard, small_segments, server, tmp_path):
+    cache = mineboard.ArtifactCache(str(tmp_path / 'artifacts'))
+    sha, result = cache.fetch(server + '/download', key='test/plugin', kind='plugin')
+    assert sha == SHA256
+    assert result['filename'] == 'plugin-1.0.jar'
+    assert cache.fetch_locks == {}
+    # Già in cache: nessuna richiesta in più
+    seen = len(RangeHandler.requests_seen)
+    assert cache.fetch(server + '/download', key='test/plugin')[0] == SHA256
+    assert len(RangeHandler.requests_seen) == seen
+    assert cache.fetch_locks == {}
+
+
+def test_resolve_jar_url_without_body(mineboard, server, monkeypatch):
+    monkeypatch.setattr(mineboard, 'get_url_from_versions', lambda jar_type, version: server + '/file.jar')
+    assert mineboard._resolve_jar_url_upstream('paper', '1.0') == server + '/file.jar'
+    # Solo HEAD: nessun GET del JAR per sapere l'URL
+    assert RangeHandler.requests_seen == ['HEAD /file.jar']
+
+
+def test_interactive_fetch_lifts_prefetch_rate_cap(small_segments, server, tmp_path):
+    cache = small_segments.ArtifactCache(str(tmp_path / 'artifacts'))
+    url = server + '/file.jar'
+    results = {}
+    # A 20 KB/s il payload richiederebbe ~30 s
+    prefetch = threading.Thread(target=lambda: results.update(prefetch=cache.fetch(url, 'jar/test', max_rate=20 * 1024)))
+    prefetch.start()
+    while not RangeHandler.requests_seen[1:]:
+        time.sleep(0.01)
+    started = time.monotonic()
+    assert cache.fetch(url, 'jar/test')[0] == SHA256
+    prefetch.join(10)
+    assert time.monotonic() - started < 10
+    assert results['prefetch'][0] == SHA256
+    assert cache.fetch_locks == {}
@@ -0,0 +1,31 @@
+import pytest
+
+
+@pytest.fixture
+def partial_last_line(mineboard, tmp_path):
+    # STEP - 1 righe concluse da a capo più un'ultima senza: STEP righe, un solo mark
+    step = mineboard.FILE_LINE_INDEX_STEP
+    path = tmp_path / 'latest.log'
+    path.write_bytes(b''.join(b'line %d\n' % i for i in range(step - 1)) + b'tail')
+    return str(path)
+
+
+def test_pages_up_to_partial_last_line(mineboard, partial_last_line):
+    step = mineboard.FILE_LINE_INDEX_STEP
+    page = mineboard.read_file_lines(partial_last_line, step - 2, 10)
+    assert page['total_lines'] == step
+    assert page['content'] == f'line {step - 2}\ntail'
+    assert page['eof']
+
+
+@pytest.mark.parametrize('start', [1000, 1001, 5000])
+def test_start_past_end_is_empty_eof(mineboard, partial_last_line, start):
+    page = mineboard.read_file_lines(partial_last_line, start, 10)
+    assert page['content'] == ''
+    assert page['lines'] == 0
+    assert page['eof']
+
+
+def test_tail_from_end(mineboard, partial_last_line):
+    page = mineboard.read_file_lines(partial_last_line, -2, 10)
+    assert page['content'] == f'line {mineboard.FILE_LINE_INDEX_STEP - 2}\ntail'
@@ -0,0 +1,43 @@
+import json
+import re
+
+import pytest
+
+
+def run(mineboard, candidates, pattern, max_results=100):
+    lines = [json.loads(line) for line in mineboard.generate_search_results(iter(candidates), pattern, max_results)]
+    return lines[:-1], lines[-1]
+
+
+def test_nested_quantifiers_are_risky(mineboard):
+    risky = [r'(a+)+$', r'(.*)*', r'(\w+\s?){20}', r'(?:x|y+)*']
+    safe = [r'foo.*bar', r'(ab)+c', r'\d{1,3}(\.\d{1,3}){3}', r'ERROR.*(timeout|refused)']
+    assert all(mineboard.search_pattern_risky(re.compile(p.encode())) for p in risky)
+    assert not any(mineboard.search_pattern_risky(re.compile(p.encode())) for p in safe)
+
+
+def test_matches_across_windows(mineboard, tmp_path, monkeypatch):
+    monkeypatch.setattr(mineboard, 'SEARCH_WINDOW', 64)
+    path = tmp_path / 'latest.log'
+    path.write_bytes(b''.join(b'line %d %s\n' % (i, b'ERROR' if i % 7 == 0 else b'ok') for i in range(1, 200)))
+    matches = mineboard.search_file_content(str(path), re.compile(b'ERROR'), 100)
+    assert [m['line'] for m in matches] == list(range(7, 200, 7))
+    assert matches[0]['column'] == 8
+
+
+def test_file_time_cap(mineboard, tmp_path, monkeypatch):
+    monkeypatch.setattr(mineboard, 'SEARCH_WINDOW', 64)
+    path = tmp_path / 'big.log'
+    path.write_bytes(b'x' * 1000 + b'\n')
+    with pytest.raises(TimeoutError):
+        mineboard.search_file_content(str(path), re.compile(b'y'), 100, timeout=-1)
+
+
+def test_failed_files_do_not_stop_search(mineboard, tmp_path):
+    good = tmp_path / 'a.txt'
+    good.write_bytes(b'hello\n')
+    candidates = [(str(tmp_path / 'gone.txt'), 'gone.txt', 6), (str(good), 'a.txt', 6)]
+    files, done = run(mineboard, candidates, re.compile(b'hello'))
+    assert [f['path'] for f in files] == ['a.txt']
+    assert done['skipped_error'] == 1
+    assert done['files_scanned'] == 1
@@ -0,0 +1,73 @@
+import shutil
+
+import pytest
+
+
+def tail(mineboard, tmp_path, fixture):
+    path = tmp_path / 'gc.log'
+    shutil.copyfile(fixture, path)
+    tailer = mineboard.GcLogTailer(str(path))
+    tailer.poll()
+    return tailer.snapshot()
+
+
+def test_g1_pauses_and_heap(mineboard, tmp_path, fixture_path):
+    snap = tail(mineboard, tmp_path, fixture_path('gc_g1.log'))
+    # 4 pause Young + Remark + Cleanup; le righe gc+phases e Concurrent non sono pause
+    assert snap['pause_count_total'] == 6
+    assert snap['pause_time_total_ms'] == pytest.approx(15.856)
+    assert snap['pause_ms']['max'] == 5.0
+    # Remark e Cleanup del ciclo GC(3) sono pause ma non raccolte: restano le 4 Young
+    assert snap['collections_total'] == 4
+    assert snap['heap_after_gc_bytes'] == 10 * 1024 ** 2
+    assert snap['heap_capacity_bytes'] == 256 * 1024 ** 2
+    assert snap['jvm_uptime_seconds'] == 13.202
+    # Allocato tra le Young: (30-4) + (60-6) + (84-20) = 144M in 12 s
+    assert snap['allocation_rate_bytes_per_second'] == round(144 * 1024 ** 2 / 12.0)
+    assert snap['gc_per_minute'] == pytest.approx(15.0)
+
+
+def test_zgc_pauses_and_cycles(mineboard, tmp_path, fixture_path):
+    snap = tail(mineboard, tmp_path, fixture_path('gc_zgc.log'))
+    assert snap['pause_count_total'] == 6
+    assert snap['pause_ms']['max'] == 0.03
+    assert snap['collections_total'] == 2
+    assert snap['heap_after_gc_bytes'] == 150 * 1024 ** 2
+    assert snap['allocation_rate_bytes_per_second'] == round((712 - 102) * 1024 ** 2 / 6.0)
+
+
+def test_generational_zgc_prefixes(mineboard, tmp_path, fixture_path):
+    snap = tail(mineboard, tmp_path, fixture_path('gc_zgc_generational.log'))
+    # Y:/O: maiuscoli (anche con suffisso "(Major)") e y: minuscolo
+    assert snap['pause_count_total'] == 8
+    assert snap['pause_time_total_ms'] == pytest.approx(0.104)
+    assert snap['collections_total'] == 2
+    assert snap['heap_after_gc_bytes'] == 90 * 1024 ** 2
+
+
+def test_incremental_reads_keep_partial_lines(mineboard, tmp_path, fixture_path):
+    with open(fixture_path('gc_g1.log'), 'rb') as f:
+        data = f.read()
+    path = tmp_path / 'gc.log'
+    cut = data.index(b'GC(1) Pause Young') + 10  # a metà riga
+    path.write_bytes(data[:cut])
+    tailer = mineboard.GcLogTailer(str(path))
+    tailer.poll()
+    assert tailer.snapshot()['pause_count_total'] == 1
+    with open(path, 'ab') as f:
+        f.write(data[cut:])
+    tailer.poll()
+    assert tailer.snapshot()['pause_count_total'] == 6
+
+
+def test_restarted_jvm_resets_window(mineboard, tmp_path, fixture_path):
+    path = tmp_path / 'gc.log'
+    shutil.copyfile(fixture_path('gc_g1.log'), path)
+    tailer = mineboard.GcLogTailer(str(path))
+    tailer.poll()
+    with open(path, 'a') as f:
+        f.write('[0.500s][info][gc          ] GC(0) Pause Young (Normal) (G1 Evacuation Pause) 8M->2M(128M) 1.000ms\n')
+    tailer.poll()
+    snap = tailer.snapshot()
+    assert snap['pause_ms']['window'] == 1
+    assert snap['pause_count_total'] == 7
@@ -0,0 +1,52 @@
+import pytest
+
+
+def resource(i, tested):
+    return {'id': i, 'name': f'plugin-{i}', 'testedVersions': tested}
+
+
+@pytest.fixture
+def upstream(mineboard, monkeypatch):
+    # 250 risorse: una su cinque testata su 1.21, una su dieci senza versioni dichiarate
+    resources = [resource(i, ['1.21'] if i % 5 == 0 else [] if i % 10 == 1 else ['1.8', '1.12'])
+                 for i in range(250)]
+    calls = []
+
+    def get(path, params=None):
+        calls.append((params['size'], params['page']))
+        start = (params['page'] - 1) * params['size']
+        return resources[start:start + params['size']]
+    monkeypatch.setattr(mineboard.spiget_cache, 'get', get)
+    return calls
+
+
+def test_mc_filter(mineboard):
+    assert mineboard.spiget_mc_filter('1.21.8') == '1.21'
+    assert mineboard.spiget_mc_filter('1.21.8', 'paper') == '1.21'
+    # Proxy e versioni non Minecraft: nessun filtro
+    assert mineboard.spiget_mc_filter('3.4.0-SNAPSHOT', 'velocity') is None
+    assert mineboard.spiget_mc_filter('1.21', 'bungeecord') is None
+    assert mineboard.spiget_mc_filter('3.4.0-SNAPSHOT') is None
+    assert mineboard.spiget_mc_filter('') is None
+
+
+def test_tested_for_keeps_undeclared(mineboard):
+    assert mineboard.spiget_tested_for(resource(1, []), '1.21')
+    assert mineboard.spiget_tested_for(resource(1, ['1.21.4']), '1.21')
+    assert not mineboard.spiget_tested_for(resource(1, ['1.2']), '1.21')
+    assert not mineboard.spiget_tested_for(resource(1, ['1.8']), '1.21')
+
+
+def test_filtered_pages_are_full(mineboard, upstream):
+    page1 = mineboard.spiget_filtered_page('/resources', {}, '1.21', 24, 1)
+    page2 = mineboard.spiget_filtered_page('/resources', {}, '1.21', 24, 2)
+    assert len(page1) == 24 and len(page2) == 24
+    ids = [r['id'] for r in page1 + page2]
+    assert len(set(ids)) == 48
+    assert all(i % 5 == 0 or i % 10 == 1 for i in ids)
+    assert upstream[0] == (mineboard.SPIGET_FILTER_PAGE_SIZE, 1)
+
+
+def test_unfiltered_passes_pagination_through(mineboard, upstream):
+    assert len(mineboard.spiget_filtered_page('/resources', {}, None, 24, 3)) == 24
+    assert upstream == [(24, 3)]
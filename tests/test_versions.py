@@ -0,0 +1,21 @@
+def entry(mineboard, versions):
+    return mineboard.VersionsCatalog.build_entry({v: f'https://example.invalid/{v}.jar' for v in versions})
+
+
+def test_latest_stable_skips_prereleases(mineboard):
+    e = entry(mineboard, ['1.21.4', '1.21.5-pre1', '1.21.5-rc1', '25w14a', '1.21.3'])
+    assert e['latest'] == '1.21.5-rc1'
+    assert e['latest_stable'] == '1.21.4'
+    # Anche una nuova linea solo in pre-release non conta come stabile
+    e = entry(mineboard, ['1.21.4', '1.22-pre1'])
+    assert e['latest_stable'] == '1.21.4'
+
+
+def test_snapshot_only_current_line_is_stable(mineboard):
+    # Velocity pubblica la linea corrente solo come -SNAPSHOT
+    e = entry(mineboard, ['3.4.0-SNAPSHOT', '3.3.0-SNAPSHOT', '3.1.2-SNAPSHOT', '3.1.1', '3.1.0'])
+    assert e['latest_stable'] == '3.4.0-SNAPSHOT'
+    assert e['stable'] == ['3.4.0-SNAPSHOT', '3.1.1', '3.1.0']
+    # Appena la linea ha una release finale si torna alle sole release
+    e = entry(mineboard, ['3.4.1-SNAPSHOT', '3.4.0', '3.3.0-SNAPSHOT'])
+    assert e['latest_stable'] == '3.4.0'